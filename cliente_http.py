@@ -0,0 +1,484 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from collections import deque
+from urllib.parse import urlencode, urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401  (httpx solo negocia HTTP/2 con el paquete h2)
+    HTTP2_DISPONIBLE = httpx is not None
+except ImportError:
+    HTTP2_DISPONIBLE = False
+
+# Configuración común de los desafíos
+BASE_URL = "https://makers-challenge.altscore.ai/v1/"
+API_KEY = os.environ.get("ALTSCORE_API_KEY", "4c2212c16e7a4570aa9652b3ffa82681")
+
+# Respuestas que se reintentan: límite de tasa y errores transitorios del servidor
+ESTADOS_REINTENTABLES = {429, 500, 502, 503, 504}
+# Métodos que se pueden repetir sin efectos duplicados (un POST de turno o de solución no)
+METODOS_IDEMPOTENTES = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+
+class EstadisticasEndpoint:
+    """Conteo de solicitudes, reintentos, errores y latencias (ms) de un endpoint."""
+
+    def __init__(self, capacidad=10_000):
+        self.solicitudes = 0
+        self.reintentos = 0
+        self.errores = 0
+        self.latencias = deque(maxlen=capacidad)
+
+    def resumen(self):
+        latencias = sorted(self.latencias)
+        percentil = lambda q: latencias[min(int(q * len(latencias)), len(latencias) - 1)] if latencias else None
+        return {
+            "solicitudes": self.solicitudes,
+            "reintentos": self.reintentos,
+            "errores": self.errores,
+            "latencia_media_ms": sum(latencias) / len(latencias) if latencias else None,
+            "latencia_p50_ms": percentil(0.50),
+            "latencia_p95_ms": percentil(0.95),
+            "latencia_max_ms": latencias[-1] if latencias else None,
+        }
+
+
+class CubetaTokens:
+    """
+    Limitador de tasa asíncrono: la cubeta se llena a `tasa` tokens por segundo
+    hasta `capacidad` (la ráfaga permitida) y cada solicitud consume uno.
+    """
+
+    def __init__(self, tasa, capacidad=None):
+        if tasa <= 0:
+            raise ValueError("tasa debe ser positiva")
+        self.tasa = tasa
+        self.capacidad = capacidad if capacidad is not None else max(tasa, 1)
+        self._tokens = self.capacidad
+        self._ultimo = time.monotonic()
+        self._candado = None
+
+    async def adquirir(self):
+        if self._candado is None:
+            self._candado = asyncio.Lock()
+        async with self._candado:  # en orden de llegada
+            while True:
+                ahora = time.monotonic()
+                self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.tasa)
+
+
+class CacheDisco:
+    """
+    Caché persistente en sqlite de respuestas JSON, por clave y con vencimiento
+    (`ttl` en segundos), para no volver a consultar las APIs al repetir un script.
+    """
+
+    def __init__(self, ruta, ttl=24 * 3600, reloj=time.time):
+        if os.path.dirname(ruta):
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        self.ttl = ttl
+        self.reloj = reloj
+        self.aciertos = 0
+        self.fallos = 0
+        self._conexion = sqlite3.connect(ruta)
+        self._conexion.execute("CREATE TABLE IF NOT EXISTS respuestas "
+                               "(clave TEXT PRIMARY KEY, valor TEXT NOT NULL, vence REAL NOT NULL)")
+        self._conexion.commit()
+
+    def obtener(self, clave):
+        """Valor guardado en `clave`, o None si no está o ya venció."""
+        fila = self._conexion.execute("SELECT valor, vence FROM respuestas WHERE clave = ?", (clave,)).fetchone()
+        if fila is None or fila[1] <= self.reloj():
+            self.fallos += 1
+            return None
+        self.aciertos += 1
+        return json.loads(fila[0])
+
+    def guardar(self, clave, valor, ttl=None):
+        vence = self.reloj() + (self.ttl if ttl is None else ttl)
+        with self._conexion:
+            self._conexion.execute("INSERT OR REPLACE INTO respuestas VALUES (?, ?, ?)",
+                                   (clave, json.dumps(valor), vence))
+
+    def purgar(self):
+        """Borra las entradas vencidas y devuelve cuántas eran."""
+        with self._conexion:
+            return self._conexion.execute("DELETE FROM respuestas WHERE vence <= ?", (self.reloj(),)).rowcount
+
+    def cerrar(self):
+        self._conexion.close()
+
+
+class CacheContenido:
+    """
+    Caché en disco (sqlite) direccionada por contenido: cada URL apunta a la
+    huella SHA-256 de su cuerpo, y cada cuerpo distinto se guarda una sola vez
+    (comprimido). Una entrada vale sin consultar durante `ttl` segundos; luego
+    se revalida con una solicitud condicional (ETag / Last-Modified), y un 304
+    la renueva sin volver a descargar el cuerpo.
+    """
+
+    def __init__(self, ruta, ttl=24 * 3600, reloj=time.time):
+        if os.path.dirname(ruta):
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        self.ttl = ttl
+        self.reloj = reloj
+        self.aciertos = 0
+        self.revalidadas = 0
+        self.descargas = 0
+        self._conexion = sqlite3.connect(ruta)
+        with self._conexion:
+            self._conexion.execute("CREATE TABLE IF NOT EXISTS contenidos "
+                                   "(huella TEXT PRIMARY KEY, cuerpo BLOB NOT NULL)")
+            self._conexion.execute("CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, huella TEXT NOT NULL, "
+                                   "etag TEXT, modificado TEXT, validado REAL NOT NULL)")
+
+    def entrada(self, url):
+        """Dict con cuerpo (bytes), etag, modificado y si sigue fresca, o None si la URL no está."""
+        fila = self._conexion.execute(
+            "SELECT c.cuerpo, u.etag, u.modificado, u.validado FROM urls u JOIN contenidos c USING (huella) "
+            "WHERE u.url = ?", (url,)).fetchone()
+        if fila is None:
+            return None
+        return {'cuerpo': zlib.decompress(fila[0]), 'etag': fila[1], 'modificado': fila[2],
+                'fresca': fila[3] + self.ttl > self.reloj()}
+
+    def guardar(self, url, cuerpo, etag=None, modificado=None):
+        """Guarda el cuerpo descargado de `url` y devuelve su huella."""
+        huella = hashlib.sha256(cuerpo).hexdigest()
+        with self._conexion:
+            self._conexion.execute("INSERT OR IGNORE INTO contenidos VALUES (?, ?)", (huella, zlib.compress(cuerpo)))
+            self._conexion.execute("INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?, ?)",
+                                   (url, huella, etag, modificado, self.reloj()))
+        self.descargas += 1
+        return huella
+
+    def renovar(self, url):
+        """Marca la entrada como recién validada (respuesta 304)."""
+        with self._conexion:
+            self._conexion.execute("UPDATE urls SET validado = ? WHERE url = ?", (self.reloj(), url))
+        self.revalidadas += 1
+
+    def purgar_huerfanos(self):
+        """Borra los cuerpos a los que ya no apunta ninguna URL y devuelve cuántos eran."""
+        with self._conexion:
+            return self._conexion.execute(
+                "DELETE FROM contenidos WHERE huella NOT IN (SELECT huella FROM urls)").rowcount
+
+    def cerrar(self):
+        self._conexion.close()
+
+
+def clave_solicitud(url, params=None):
+    """Clave de caché de un GET: la URL con los parámetros ordenados."""
+    return url + ('?' + urlencode(sorted(params.items())) if params else '')
+
+
+class _ClienteBase:
+    """Configuración, encabezados, backoff y estadísticas comunes a los clientes síncrono y asíncrono."""
+
+    def __init__(self, base_url=BASE_URL, api_key=API_KEY, timeout_conexion=5.0, timeout_lectura=30.0,
+                 reintentos=4, espera_base=0.5, espera_maxima=8.0, semilla=None):
+        self.base_url = base_url if base_url.endswith('/') else base_url + '/'
+        self.host_api = urlsplit(self.base_url).netloc
+        self.api_key = api_key
+        self.timeout_conexion = timeout_conexion
+        self.timeout_lectura = timeout_lectura
+        self.reintentos = reintentos
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self._aleatorio = random.Random(semilla)
+        self._estadisticas = {}
+        self._candado = threading.Lock()
+
+    def _url(self, ruta):
+        return ruta if urlsplit(ruta).scheme else urljoin(self.base_url, ruta.lstrip('/'))
+
+    def _encabezados(self, url, encabezados):
+        resultado = {'accept': 'application/json'}
+        if self.api_key and urlsplit(url).netloc == self.host_api:
+            resultado['API-KEY'] = self.api_key
+        resultado.update(encabezados or {})
+        return resultado
+
+    def espera(self, intento, respuesta=None):
+        """Segundos antes del reintento `intento` (desde 0): Retry-After si lo hay, si no backoff con jitter completo."""
+        if respuesta is not None:
+            retry_after = respuesta.headers.get('retry-after')
+            if retry_after and retry_after.replace('.', '', 1).isdigit():
+                return min(float(retry_after), self.espera_maxima)
+        return self._aleatorio.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** intento))
+
+    def _registrar(self, endpoint, segundos, reintento, error):
+        with self._candado:
+            estadisticas = self._estadisticas.setdefault(endpoint, EstadisticasEndpoint())
+            estadisticas.solicitudes += 1
+            estadisticas.reintentos += reintento
+            estadisticas.errores += error
+            estadisticas.latencias.append(segundos * 1000)
+
+    def _preparar(self, metodo, ruta, encabezados, idempotente):
+        if idempotente is None:
+            idempotente = metodo.upper() in METODOS_IDEMPOTENTES
+        url = self._url(ruta)
+        endpoint = f"{metodo.upper()} {urlsplit(url).netloc}{urlsplit(url).path}"
+        return url, endpoint, self._encabezados(url, encabezados), self.reintentos if idempotente else 0
+
+    @staticmethod
+    def _fallida(respuesta, reintentar_si):
+        return respuesta.status_code in ESTADOS_REINTENTABLES or \
+            (reintentar_si is not None and respuesta.status_code < 400 and reintentar_si(respuesta))
+
+    def estadisticas(self):
+        with self._candado:
+            return {endpoint: e.resumen() for endpoint, e in self._estadisticas.items()}
+
+    def reporte(self):
+        """Tabla de texto con las estadísticas por endpoint."""
+        lineas = []
+        for endpoint, e in sorted(self.estadisticas().items()):
+            lineas.append(f"{endpoint}: {e['solicitudes']} solicitudes, {e['reintentos']} reintentos, "
+                          f"{e['errores']} errores, media {e['latencia_media_ms']:.1f} ms, "
+                          f"p95 {e['latencia_p95_ms']:.1f} ms")
+        return "\n".join(lineas)
+
+
+class ClienteHTTP(_ClienteBase):
+    """
+    Cliente HTTP compartido por los scripts de los desafíos: una sola sesión
+    con pool de conexiones keep-alive (HTTP/2 con httpx si está instalado el
+    paquete h2; si no, requests), timeouts de conexión y lectura, reintentos con
+    espera exponencial con jitter ante 429/5xx, errores de red o respuestas que
+    `reintentar_si` marque como fallidas (solo en solicitudes idempotentes), y
+    estadísticas por endpoint.
+
+    Las rutas relativas se resuelven contra `base_url` y llevan el encabezado
+    API-KEY; las URL absolutas de otros hosts (SWAPI, PokéAPI) no lo reciben.
+    """
+
+    def __init__(self, base_url=BASE_URL, api_key=API_KEY, timeout_conexion=5.0, timeout_lectura=30.0,
+                 reintentos=4, espera_base=0.5, espera_maxima=8.0, tamano_pool=10, http2=True, semilla=None):
+        super().__init__(base_url, api_key, timeout_conexion, timeout_lectura, reintentos, espera_base,
+                         espera_maxima, semilla)
+        self.usa_httpx = http2 and HTTP2_DISPONIBLE
+        if self.usa_httpx:
+            self._sesion = httpx.Client(http2=True, timeout=httpx.Timeout(timeout_lectura, connect=timeout_conexion),
+                                        limits=httpx.Limits(max_connections=tamano_pool,
+                                                            max_keepalive_connections=tamano_pool))
+            self._errores_transitorios = (httpx.TransportError,)
+        else:
+            self._sesion = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=tamano_pool, pool_maxsize=tamano_pool)
+            self._sesion.mount('https://', adaptador)
+            self._sesion.mount('http://', adaptador)
+            self._errores_transitorios = (requests.ConnectionError, requests.Timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def cerrar(self):
+        self._sesion.close()
+
+    def solicitud(self, metodo, ruta, reintentar_si=None, encabezados=None, idempotente=None, **kwargs):
+        """
+        Envía la solicitud y la reintenta ante errores transitorios, solo si es
+        `idempotente` (por defecto, según el método). Devuelve la última
+        respuesta (aunque sea un error HTTP, para que el script decida); si todos
+        los intentos fallan por la red, relanza el último error.
+        """
+        url, endpoint, encabezados, reintentos = self._preparar(metodo, ruta, encabezados, idempotente)
+        if self.usa_httpx and 'data' in kwargs and not isinstance(kwargs['data'], (dict, list)):
+            kwargs['content'] = kwargs.pop('data')
+        if not self.usa_httpx:
+            # requests no tiene timeout por defecto: sin esto un servidor mudo bloquea para siempre.
+            # ConnectTimeout/ReadTimeout se reintentan y relanzan como los errores de red
+            kwargs.setdefault('timeout', (self.timeout_conexion, self.timeout_lectura))
+        for intento in range(reintentos + 1):
+            inicio = time.perf_counter()
+            try:
+                respuesta = self._sesion.request(metodo, url, headers=encabezados, **kwargs)
+            except self._errores_transitorios:
+                self._registrar(endpoint, time.perf_counter() - inicio, intento > 0, True)
+                if intento == reintentos:
+                    raise
+                time.sleep(self.espera(intento))
+                continue
+            fallida = self._fallida(respuesta, reintentar_si)
+            self._registrar(endpoint, time.perf_counter() - inicio, intento > 0,
+                            respuesta.status_code >= 400 or fallida)
+            if not fallida or intento == reintentos:
+                return respuesta
+            time.sleep(self.espera(intento, respuesta))
+        return respuesta
+
+    def get(self, ruta, **kwargs):
+        return self.solicitud('GET', ruta, **kwargs)
+
+    def post(self, ruta, **kwargs):
+        return self.solicitud('POST', ruta, **kwargs)
+
+
+class ClienteHTTPAsync(_ClienteBase):
+    """
+    Versión asíncrona (httpx.AsyncClient) del cliente, con los mismos
+    reintentos, encabezados y estadísticas, para lanzar muchas solicitudes
+    concurrentes: `concurrencia` acota las que están en vuelo a la vez y
+    `cubeta` (un CubetaTokens) la tasa con que se envían, reintentos incluidos.
+    """
+
+    def __init__(self, base_url=BASE_URL, api_key=API_KEY, timeout_conexion=5.0, timeout_lectura=30.0,
+                 reintentos=4, espera_base=0.5, espera_maxima=8.0, concurrencia=8, cubeta=None, http2=True,
+                 semilla=None):
+        if httpx is None:
+            raise ImportError("ClienteHTTPAsync necesita el paquete httpx")
+        super().__init__(base_url, api_key, timeout_conexion, timeout_lectura, reintentos, espera_base,
+                         espera_maxima, semilla)
+        self.concurrencia = concurrencia
+        self.cubeta = cubeta
+        self._semaforo = None
+        self._sesion = httpx.AsyncClient(http2=http2 and HTTP2_DISPONIBLE,
+                                         timeout=httpx.Timeout(timeout_lectura, connect=timeout_conexion),
+                                         limits=httpx.Limits(max_connections=concurrencia,
+                                                             max_keepalive_connections=concurrencia))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.cerrar()
+
+    async def cerrar(self):
+        await self._sesion.aclose()
+
+    async def _enviar(self, metodo, url, encabezados, kwargs):
+        if self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(self.concurrencia)
+        async with self._semaforo:
+            if self.cubeta is not None:
+                await self.cubeta.adquirir()
+            return await self._sesion.request(metodo, url, headers=encabezados, **kwargs)
+
+    async def solicitud(self, metodo, ruta, reintentar_si=None, encabezados=None, idempotente=None, **kwargs):
+        """Como ClienteHTTP.solicitud; las esperas entre reintentos no ocupan un lugar de concurrencia."""
+        url, endpoint, encabezados, reintentos = self._preparar(metodo, ruta, encabezados, idempotente)
+        for intento in range(reintentos + 1):
+            inicio = time.perf_counter()
+            try:
+                respuesta = await self._enviar(metodo, url, encabezados, kwargs)
+            except httpx.TransportError:
+                self._registrar(endpoint, time.perf_counter() - inicio, intento > 0, True)
+                if intento == reintentos:
+                    raise
+                await asyncio.sleep(self.espera(intento))
+                continue
+            fallida = self._fallida(respuesta, reintentar_si)
+            self._registrar(endpoint, time.perf_counter() - inicio, intento > 0,
+                            respuesta.status_code >= 400 or fallida)
+            if not fallida or intento == reintentos:
+                return respuesta
+            await asyncio.sleep(self.espera(intento, respuesta))
+        return respuesta
+
+    async def get(self, ruta, **kwargs):
+        return await self.solicitud('GET', ruta, **kwargs)
+
+    async def post(self, ruta, **kwargs):
+        return await self.solicitud('POST', ruta, **kwargs)
+
+    async def get_json(self, ruta, params=None, cache=None, ttl=None, **kwargs):
+        """
+        JSON de un GET, leído de `cache` (un CacheDisco) si está vigente; si no,
+        lo pide y lo guarda. Las respuestas con error no se guardan: lanza
+        httpx.HTTPStatusError.
+        """
+        clave = clave_solicitud(self._url(ruta), params)
+        if cache is not None:
+            datos = cache.obtener(clave)
+            if datos is not None:
+                return datos
+        respuesta = await self.get(ruta, params=params, **kwargs)
+        respuesta.raise_for_status()
+        datos = respuesta.json()
+        if cache is not None:
+            cache.guardar(clave, datos, ttl)
+        return datos
+
+    async def get_json_revalidado(self, ruta, cache, params=None, **kwargs):
+        """
+        JSON de un GET a través de un CacheContenido: si la entrada está fresca
+        no hay solicitud; si venció, se pide de forma condicional y un 304 reusa
+        el cuerpo guardado. Las respuestas con error lanzan httpx.HTTPStatusError.
+        """
+        url = clave_solicitud(self._url(ruta), params)
+        entrada = cache.entrada(url)
+        if entrada is not None and entrada['fresca']:
+            cache.aciertos += 1
+            return json.loads(entrada['cuerpo'])
+        encabezados = {}
+        if entrada is not None and entrada['etag']:
+            encabezados['If-None-Match'] = entrada['etag']
+        if entrada is not None and entrada['modificado']:
+            encabezados['If-Modified-Since'] = entrada['modificado']
+        respuesta = await self.get(url, encabezados=encabezados, **kwargs)
+        if respuesta.status_code == 304 and entrada is not None:
+            cache.renovar(url)
+            return json.loads(entrada['cuerpo'])
+        respuesta.raise_for_status()
+        cache.guardar(url, respuesta.content, respuesta.headers.get('etag'), respuesta.headers.get('last-modified'))
+        return respuesta.json()
+
+
+async def paginas(cliente_async, ruta, params=None, parametro_pagina='page', encabezado_total='x-total-count'):
+    """
+    Generador asíncrono de las páginas (JSON) de un recurso paginado. Lee la
+    primera para conocer el total (`encabezado_total`) y el tamaño de página, y
+    pide todas las demás a la vez (acotadas por la concurrencia y la cubeta del
+    cliente); las entrega a medida que llegan, no en orden.
+    """
+    params = dict(params or {})
+    primera = await cliente_async.get(ruta, params={**params, parametro_pagina: 1})
+    primera.raise_for_status()
+    datos = primera.json()
+    yield 1, datos
+    total = int(primera.headers.get(encabezado_total, 0))
+    if not datos or total <= len(datos):
+        return
+
+    async def pagina(numero):
+        respuesta = await cliente_async.get(ruta, params={**params, parametro_pagina: numero})
+        respuesta.raise_for_status()
+        return numero, respuesta.json()
+
+    tareas = [asyncio.ensure_future(pagina(n)) for n in range(2, -(-total // len(datos)) + 1)]
+    try:
+        for siguiente in asyncio.as_completed(tareas):
+            yield await siguiente
+    finally:
+        for tarea in tareas:
+            tarea.cancel()
+
+
+# Cliente compartido por los scripts de los desafíos
+cliente = ClienteHTTP()
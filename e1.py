@@ -1,15 +1,9 @@
-import requests
 import time as t
+from cliente_http import cliente
 
-# API-KEY para autenticación
-api_key = "4c2212c16e7a4570aa9652b3ffa82681"
-
-# Configuración de la URL y el encabezado de autenticación
-get_url = 'https://makers-challenge.altscore.ai/v1/s1/e1/resources/measurement'
-post_url = 'https://makers-challenge.altscore.ai/v1/s1/e1/solution'
-headers = {
-    "API-KEY": api_key
-}
+# Rutas relativas a la API (el cliente agrega la API-KEY)
+get_url = 's1/e1/resources/measurement'
+post_url = 's1/e1/solution'
 
 # Funciones de conversión de unidades
 def convert_distance(distance, unit):
@@ -30,10 +24,18 @@ def convert_time(time, unit):
     else:
         raise ValueError(f"Unidad de tiempo desconocida: {unit}")
 
+def medicion_fallida(response):
+    """El instrumento a veces responde 200 con 'failed to measure'; el cliente lo reintenta."""
+    try:
+        data = response.json()
+    except ValueError:
+        return True
+    return any("failed to measure" in str(data.get(campo, "")) for campo in ('distance', 'time'))
+
 # Función para obtener una medición válida
 def get_measurement():
     while True:
-        response = requests.get(get_url, headers=headers)
+        response = cliente.get(get_url, reintentar_si=medicion_fallida)
         if response.status_code == 200:
             data = response.json()
             print("Datos obtenidos:", data)  # Mostrar datos obtenidos para depuración
@@ -72,7 +74,7 @@ def calculate_velocity(distance, time_observed):
 
 # Función para enviar la solución
 def send_solution(velocity):
-    response = requests.post(post_url, json={'speed': velocity}, headers=headers)
+    response = cliente.post(post_url, json={'speed': velocity})
     if response.status_code == 200:
         print("Solución enviada con éxito. Respuesta:", response.json())
     else:
@@ -85,4 +87,5 @@ distance, time_observed = get_measurement()
 # Calcular la velocidad y enviar la solución
 velocity = calculate_velocity(distance, time_observed)
 send_solution(velocity)
+print(cliente.reporte())
 
@@ -1,60 +1,68 @@
-import requests
+import asyncio
+import httpx
+from cliente_http import CacheDisco, ClienteHTTPAsync, cliente
 
-API_KEY = '4c2212c16e7a4570aa9652b3ffa82681'
-HEADERS = {
-    'accept': 'application/json',
-    'API-KEY': API_KEY,
-    'Content-Type': 'application/json'
-}
-BASE_URL = "https://makers-challenge.altscore.ai/v1/s1/e3/resources/"
+BASE_URL = "s1/e3/resources/"
 SWAPI_BASE_URL = "https://swapi.dev/api/"
+# Caché en disco de SWAPI y del oráculo: repetir el script no vuelve a consultar las APIs
+RUTA_CACHE = "./data/cache_http.sqlite"
+TTL_SWAPI = 7 * 24 * 3600
+TTL_ORACULO = 24 * 3600
+CONCURRENCIA = 16
 
-# Función para obtener personajes y planetas
-def obtener_datos_star_wars():
-    personajes = []
-    planetas = {}
 
-    # Obtener datos de personajes
-    response = requests.get(SWAPI_BASE_URL + "people/")
-    data = response.json()
-    
-    for personaje in data['results']:
-        nombre = personaje['name']
-        planeta_url = personaje['homeworld']
-        personajes.append({"nombre": nombre, "planeta_url": planeta_url})
+# Función para recorrer todas las páginas de un recurso de SWAPI: la primera da
+# el total (count) y las demás se piden en paralelo; si al final todavía hay un
+# enlace `next` (el total cambió), se sigue de a una
+async def recorrer_swapi(cliente_async, recurso, cache):
+    url = SWAPI_BASE_URL + recurso
+    data = await cliente_async.get_json(url, cache=cache, ttl=TTL_SWAPI)
+    resultados = list(data['results'])
+    if data.get('next') and data['results']:
+        total_paginas = -(-data['count'] // len(data['results']))
+        paginas = await asyncio.gather(*(cliente_async.get_json(url, params={'page': n}, cache=cache, ttl=TTL_SWAPI)
+                                         for n in range(2, total_paginas + 1)))
+        for data in paginas:
+            resultados.extend(data['results'])
+    while data.get('next'):
+        data = await cliente_async.get_json(data['next'], cache=cache, ttl=TTL_SWAPI)
+        resultados.extend(data['results'])
+    return resultados
 
-    # Obtener datos de planetas
-    response = requests.get(SWAPI_BASE_URL + "planets/")
-    data = response.json()
-    
-    for planeta in data['results']:
-        nombre = planeta['name']
-        url = planeta['url']
-        planetas[url] = nombre
-    
+# Función para obtener personajes y planetas (todas las páginas, ambos recursos a la vez)
+async def obtener_datos_star_wars(cliente_async, cache):
+    datos_personajes, datos_planetas = await asyncio.gather(recorrer_swapi(cliente_async, "people/", cache),
+                                                            recorrer_swapi(cliente_async, "planets/", cache))
+    personajes = [{"nombre": p['name'], "planeta_url": p['homeworld']} for p in datos_personajes]
+    planetas = {p['url']: p['name'] for p in datos_planetas}
     return personajes, planetas
 
 # Función para consultar al oráculo sobre el lado de la fuerza de un personaje
-def obtener_afiliacion_oraculo(nombre_personaje):
-    response = requests.get(BASE_URL + "oracle-rolodex", headers=HEADERS, params={'name': nombre_personaje})
-    
-    if response.status_code == 200:
-        data = response.json()
-        oracle_notes = data.get("oracle_notes", "").lower()
-        
-        # Decodificar la afiliación del personaje según oracle_notes
-        if "luminoso" in oracle_notes:
-            return "luminoso"
-        elif "oscuro" in oracle_notes:
-            return "oscuro"
-        else:
-            return None  # Afiliación no especificada en los notas del oráculo
-    else:
-        print(f"Error al consultar el oráculo para {nombre_personaje}: {response.status_code}")
+async def obtener_afiliacion_oraculo(cliente_async, nombre_personaje, cache):
+    try:
+        data = await cliente_async.get_json(BASE_URL + "oracle-rolodex", params={'name': nombre_personaje},
+                                            cache=cache, ttl=TTL_ORACULO)
+    except httpx.HTTPStatusError as error:
+        print(f"Error al consultar el oráculo para {nombre_personaje}: {error.response.status_code}")
         return None
+    oracle_notes = data.get("oracle_notes", "").lower()
+
+    # Decodificar la afiliación del personaje según oracle_notes
+    if "luminoso" in oracle_notes:
+        return "luminoso"
+    elif "oscuro" in oracle_notes:
+        return "oscuro"
+    else:
+        return None  # Afiliación no especificada en los notas del oráculo
+
+# Afiliación de todos los personajes, consultando al oráculo en paralelo (concurrencia acotada por el cliente)
+async def obtener_afiliaciones(cliente_async, personajes, cache):
+    nombres = list(dict.fromkeys(p['nombre'] for p in personajes))
+    afiliaciones = await asyncio.gather(*(obtener_afiliacion_oraculo(cliente_async, n, cache) for n in nombres))
+    return dict(zip(nombres, afiliaciones))
 
 # Cálculo del IBF para los planetas
-def calcular_ibf(planetas, personajes):
+def calcular_ibf(planetas, personajes, afiliaciones):
     planetas_ibf = {}
 
     # Organizar personajes por planeta
@@ -62,7 +70,7 @@ def calcular_ibf(planetas, personajes):
         planeta_url = personaje['planeta_url']
         nombre = personaje['nombre']
         
-        afiliacion = obtener_afiliacion_oraculo(nombre)
+        afiliacion = afiliaciones.get(nombre)
         
         # Contar afiliaciones para cada planeta
         if planeta_url not in planetas_ibf:
@@ -90,9 +98,9 @@ def calcular_ibf(planetas, personajes):
 
 # Envío de la solución
 def enviar_solucion(planeta_equilibrado):
-    solution_url = "https://makers-challenge.altscore.ai/v1/s1/e3/solution"
+    solution_url = "s1/e3/solution"
     data = {"planet": planeta_equilibrado}
-    response = requests.post(solution_url, headers=HEADERS, json=data)
+    response = cliente.post(solution_url, json=data)
     if response.status_code == 200:
         print("Solución enviada correctamente. Respuesta:", response.json())
     else:
@@ -100,10 +108,21 @@ def enviar_solucion(planeta_equilibrado):
         print("Encabezados de la respuesta:", response.headers)
 
 # Ejecución del flujo principal
-personajes, planetas = obtener_datos_star_wars()
-planeta_equilibrado = calcular_ibf(planetas, personajes)
+async def principal():
+    cache = CacheDisco(RUTA_CACHE)
+    try:
+        async with ClienteHTTPAsync(concurrencia=CONCURRENCIA) as cliente_async:
+            personajes, planetas = await obtener_datos_star_wars(cliente_async, cache)
+            afiliaciones = await obtener_afiliaciones(cliente_async, personajes, cache)
+            print(cliente_async.reporte())
+        print(f"Caché: {cache.aciertos} aciertos, {cache.fallos} fallos")
+    finally:
+        cache.cerrar()
+    return calcular_ibf(planetas, personajes, afiliaciones)
+
+planeta_equilibrado = asyncio.run(principal())
 if planeta_equilibrado:
     enviar_solucion(planeta_equilibrado)
 else:
     print("No se encontró un planeta con equilibrio en la Fuerza.")
-
+print(cliente.reporte())
@@ -1,12 +1,6 @@
-import requests
+from cliente_http import cliente
 
-API_KEY = '4c2212c16e7a4570aa9652b3ffa82681'
-HEADERS = {
-    'accept': 'application/json',
-    'API-KEY': API_KEY,
-    'Content-Type': 'application/json'
-}
-URL = "https://makers-challenge.altscore.ai/v1/s1/e4/solution"
+URL = "s1/e4/solution"
 
 # Datos obtenidos de la página
 usuario = "Not all those who wander"
@@ -14,7 +8,7 @@ contrasena = "are lost"
 
 # Enviar la solución con los datos obtenidos
 data = {"username": usuario, "password": contrasena}
-response = requests.post(URL, headers=HEADERS, json=data)
+response = cliente.post(URL, json=data)
 
 if response.status_code == 200:
     print(f"Solución enviada correctamente. Usuario: '{usuario}', Contraseña: '{contrasena}', Respuesta: {response.json()}")
@@ -1,13 +1,7 @@
-import requests
 import time
+from cliente_http import cliente
 # Configuración de la API
-API_URL = "https://makers-challenge.altscore.ai/v1/s1/e5/actions/"
-API_KEY = '4c2212c16e7a4570aa9652b3ffa82681'
-HEADERS = {
-    'accept': 'application/json',
-    'API-KEY': API_KEY,
-    'Content-Type': 'application/json'
-}
+API_URL = "s1/e5/actions/"
 
 # Última posición registrada (de la bitácora)
 def parse_radar_data(data):
@@ -36,7 +30,7 @@ def analizar_posiciones():
 
 # Iniciar la misión
 def iniciar_mision():
-    response = requests.post(API_URL + "start", headers=HEADERS)
+    response = cliente.post(API_URL + "start")
     if response.status_code == 200:
         print("Misión iniciada:", response.json())
     else:
@@ -50,7 +44,7 @@ def realizar_turno(action, x=None, y=None):
     if action == "attack":
         data["attack_position"] = {"x": x, "y": y}
     
-    response = requests.post(API_URL + "perform-turn", headers=HEADERS, json=data)
+    response = cliente.post(API_URL + "perform-turn", json=data)
     if response.status_code == 200:
         resultado = response.json()
         print(f"Acción '{action}' realizada:", resultado)
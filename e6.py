@@ -1,44 +1,49 @@
-import requests
+import asyncio
 from statistics import mean
+from cliente_http import CacheContenido, ClienteHTTPAsync, cliente
 
 # URL de la PokéAPI
 POKEAPI_BASE_URL = "https://pokeapi.co/api/v2/"
 TYPE_URL = POKEAPI_BASE_URL + "type/"
-POST_URL = "https://makers-challenge.altscore.ai/v1/s1/e6/solution"
-API_KEY = "4c2212c16e7a4570aa9652b3ffa82681"  # Reemplaza con tu clave de API
+POST_URL = "s1/e6/solution"
+# Caché de respuestas de la PokéAPI (se revalida con solicitudes condicionales pasado un día)
+RUTA_CACHE = "./data/cache_pokeapi.sqlite"
+CONCURRENCIA = 32
 
-HEADERS = {
-    'accept': 'application/json',
-    'API-KEY': API_KEY,
-    'Content-Type': 'application/json'
-}
 
-def obtener_pokemons_por_tipo():
+async def obtener_pokemons_por_tipo(cliente_async, cache):
     # Obtener tipos de Pokémon
-    response = requests.get(TYPE_URL)
-    tipos_data = response.json()['results']
-    
-    # Diccionario para almacenar alturas
-    alturas_por_tipo = {}
-    
-    for tipo in sorted(tipos_data, key=lambda x: x['name']):
-        nombre_tipo = tipo['name']
-        if nombre_tipo in {"shadow", "unknown"}:
-            continue  # Excluimos tipos "shadow" y "unknown"
-        
-        tipo_response = requests.get(tipo['url']).json()
-        alturas = []
-        
-        # Obtener altura de cada Pokémon del tipo
-        for pokemon in tipo_response['pokemon']:
-            pokemon_data = requests.get(pokemon['pokemon']['url']).json()
-            altura = pokemon_data['height']
-            alturas.append(altura)
-        
-        # Calcular la altura promedio
-        altura_promedio = round(mean(alturas), 3) if alturas else 0
-        alturas_por_tipo[nombre_tipo] = altura_promedio
+    tipos_data = (await cliente_async.get_json_revalidado(TYPE_URL, cache))['results']
+    # Excluimos tipos "shadow" y "unknown"
+    tipos_data = sorted((t for t in tipos_data if t['name'] not in {"shadow", "unknown"}), key=lambda x: x['name'])
 
+    # Pokémon de cada tipo, todos los tipos a la vez
+    tipos = await asyncio.gather(*(cliente_async.get_json_revalidado(t['url'], cache) for t in tipos_data))
+    urls_por_tipo = {t['name']: [p['pokemon']['url'] for p in tipo['pokemon']] for t, tipo in zip(tipos_data, tipos)}
+
+    # Un mismo Pokémon aparece en varios tipos: cada URL se descarga una sola vez
+    urls = list(dict.fromkeys(url for urls_tipo in urls_por_tipo.values() for url in urls_tipo))
+
+    async def altura(url):
+        return (await cliente_async.get_json_revalidado(url, cache))['height']
+
+    # Índice URL -> altura
+    alturas = dict(zip(urls, await asyncio.gather(*(altura(url) for url in urls))))
+    print(f"{len(urls)} Pokémon únicos en {sum(map(len, urls_por_tipo.values()))} entradas de tipo")
+
+    # Calcular la altura promedio de cada tipo desde el índice
+    return {tipo: round(mean(alturas[url] for url in urls_tipo), 3) if urls_tipo else 0
+            for tipo, urls_tipo in urls_por_tipo.items()}
+
+async def principal():
+    cache = CacheContenido(RUTA_CACHE)
+    try:
+        async with ClienteHTTPAsync(concurrencia=CONCURRENCIA) as cliente_async:
+            alturas_por_tipo = await obtener_pokemons_por_tipo(cliente_async, cache)
+            print(cliente_async.reporte())
+        print(f"Caché: {cache.aciertos} aciertos, {cache.revalidadas} revalidadas, {cache.descargas} descargas")
+    finally:
+        cache.cerrar()
     return alturas_por_tipo
 
 def enviar_respuesta(alturas_por_tipo):
@@ -48,13 +53,14 @@ def enviar_respuesta(alturas_por_tipo):
     }
 
     # Enviar respuesta
-    response = requests.post(POST_URL, headers=HEADERS, json=data)
+    response = cliente.post(POST_URL, json=data)
     if response.status_code == 200:
         print("Respuesta enviada correctamente:", response.json())
     else:
         print(f"Error en el envío de la respuesta: {response.status_code}", response.json())
 
 # Ejecutar flujo de datos
-alturas_por_tipo = obtener_pokemons_por_tipo()
+alturas_por_tipo = asyncio.run(principal())
 enviar_respuesta(alturas_por_tipo)
+print(cliente.reporte())
 
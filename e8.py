@@ -1,14 +1,10 @@
-import requests
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
+from cliente_http import cliente
+from planificador_preciso import PlanificadorPreciso, RegistroJSONL
 
-# Configuración de la URL base y API KEY
-BASE_URL = "https://makers-challenge.altscore.ai/v1/s1/e8/actions/door"
-API_KEY = "4c2212c16e7a4570aa9652b3ffa82681"
-HEADERS = {
-    'accept': 'application/json',
-    'API-KEY': API_KEY
-}
+# Ruta de la puerta (los POST no se reintentan: cada intento debe caer en su segundo exacto)
+BASE_URL = "s1/e8/actions/door"
 
 # Lista extensa de palabras a probar
 sequence = ["expelliarmus", "reparo", "Altwarts", "expecto patronum", "accio", "lumos", 
@@ -16,69 +12,78 @@ sequence = ["expelliarmus", "reparo", "Altwarts", "expecto patronum", "accio", "
             "morsmordre", "riddikulus", "sectumsempra", "colloshoo", "expulso", 
             "piertotum locomotor"]
 
-log_file_path = "door_attempts.log"
+# Registro estructurado de intentos (una línea JSON por intento)
+log_file_path = "door_attempts.jsonl"
+# Las solicitudes deben llegar en el primer segundo de cada minuto: se apunta
+# 100 ms dentro de él para que el jitter de red no las adelante al segundo 59
+DESFASE_OBJETIVO = 0.1
 
-def log_message(word, log_time, message):
-    """Guardar el intento en el archivo de log."""
-    with open(log_file_path, "a") as log_file:
-        log_file.write(f"Palabra: {word}, Tiempo: {log_time}, Mensaje: {message}\n")
 
-def attempt_door(word):
-    """Intento de abrir la puerta usando POST en el segundo exacto."""
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    response = requests.post(BASE_URL, headers=HEADERS, json={"spell_word": word})
-    
-    if response.status_code == 200:
-        message = response.json().get("response", "")
-        print(f"¡Éxito! POST con la palabra: {word} en {current_time}")
-        log_message(word, current_time, message)
-        return True  # Indica éxito en la palabra actual
+def warm_up():
+    """Solicitud liviana que mantiene viva la conexión del pool y mide el RTT (sin reintentos)."""
+    cliente.solicitud("HEAD", BASE_URL, idempotente=False)
+
+def door_post(word):
+    response = cliente.post(BASE_URL, json={"spell_word": word})
+    try:
+        body = response.json()
+    except ValueError:
+        body = {}
+    return response.status_code, body
+
+def attempt_door(planificador, log, word):
+    """Intento de abrir la puerta: el POST llega en el segundo 0 del próximo minuto."""
+    resultado, detalle = planificador.ejecutar_en_proximo(lambda: door_post(word), periodo=60,
+                                                          desfase=DESFASE_OBJETIVO)
+    if resultado is None:
+        print(f"Error de red con POST {word}: {detalle['error']}")
+        log.escribir(palabra=word, estado=None, mensaje=None, **detalle)
+        return False
+    status_code, body = resultado
+    current_time = datetime.fromtimestamp(detalle['envio']).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    if status_code == 200:
+        message = body.get("response", "")
+        print(f"¡Éxito! POST con la palabra: {word} en {current_time} "
+              f"(error de llegada estimado {detalle['error_llegada_ms']:.1f} ms)")
     else:
-        hidden_message = response.json().get('hidden_message', 'Sin mensaje de error')
-        print(f"Error {response.status_code} con POST {word}. Mensaje: {hidden_message}")
-        log_message(word, current_time, hidden_message)
-        return False  # Indica fallo
+        message = body.get('hidden_message', 'Sin mensaje de error')
+        print(f"Error {status_code} con POST {word}. Mensaje: {message}")
+    log.escribir(palabra=word, estado=status_code, mensaje=message, **detalle)
+    return status_code == 200  # Indica éxito en la palabra actual
 
-def attempt_revelio():
+def attempt_revelio(log):
     """Prueba el hechizo Revelio para ver si revela algo."""
-    response = requests.post(BASE_URL, headers=HEADERS, json={"spell_word": "Revelio"})
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    if response.status_code == 200:
-        message = response.json().get("response", "")
+    envio = time.time()
+    status_code, body = door_post("Revelio")
+    current_time = datetime.fromtimestamp(envio).strftime("%Y-%m-%d %H:%M:%S")
+    if status_code == 200:
+        message = body.get("response", "")
         print(f"Revelio reveló en {current_time}: {message}")
-        log_message("Revelio", current_time, message)
     else:
-        hidden_message = response.json().get('hidden_message', 'Sin mensaje de error')
-        print(f"Error {response.status_code} con Revelio. Mensaje: {hidden_message}")
-        log_message("Revelio", current_time, hidden_message)
-
-def wait_until_next_minute():
-    """Espera hasta el primer segundo del siguiente minuto."""
-    now = datetime.now()
-    next_minute = (now + timedelta(minutes=1)).replace(second=0, microsecond=0)
-    time_to_wait = (next_minute - now).total_seconds()
-    time.sleep(time_to_wait)
+        message = body.get('hidden_message', 'Sin mensaje de error')
+        print(f"Error {status_code} con Revelio. Mensaje: {message}")
+    log.escribir(palabra="Revelio", estado=status_code, mensaje=message, envio=envio)
 
 def continuous_sequence_with_revelio():
     """Intenta continuamente la secuencia con Revelio tras cada palabra."""
-    while True:
-        for word in sequence:
-            # Espera al primer segundo del próximo minuto
-            wait_until_next_minute()
+    planificador = PlanificadorPreciso(calentar=warm_up)
+    with RegistroJSONL(log_file_path) as log:
+        while True:
+            for word in sequence:
+                # Intenta la palabra en el segundo exacto del próximo minuto
+                success = attempt_door(planificador, log, word)
 
-            # Intenta la palabra en el segundo exacto
-            success = attempt_door(word)
-            
-            # Intenta Revelio después de cada palabra exitosa
-            if success:
-                attempt_revelio()
-            else:
-                print(f"Error en la palabra {word}. Continuando con la siguiente palabra...")
-        
-        # Probar Revelio al final de la secuencia completa
-        print("Intentando Revelio después de la secuencia completa...")
-        attempt_revelio()
+                # Intenta Revelio después de cada palabra exitosa
+                if success:
+                    attempt_revelio(log)
+                else:
+                    print(f"Error en la palabra {word}. Continuando con la siguiente palabra...")
+                # Fuera del segundo crítico: los intentos quedan en disco aunque se corte el script
+                log.volcar()
+
+            # Probar Revelio al final de la secuencia completa
+            print("Intentando Revelio después de la secuencia completa...")
+            attempt_revelio(log)
 
 # Ejecuta el intento continuo de secuencia con Revelio
 continuous_sequence_with_revelio()
-
@@ -1,18 +1,13 @@
-import requests
+from cliente_http import cliente
 
 # Enviar la respuesta final
-solution_url = "https://makers-challenge.altscore.ai/v1/s1/e8/solution"
-API_KEY = "4c2212c16e7a4570aa9652b3ffa82681"
-HEADERS = {
-    'accept': 'application/json',
-    'API-KEY': API_KEY
-}
+solution_url = "s1/e8/solution"
 # Mensaje recibido tras usar `Revelio`
 solution_data = {
     "hidden_message": ""
 }
 
-response = requests.post(solution_url, headers=HEADERS, json=solution_data)
+response = cliente.post(solution_url, json=solution_data)
 
 if response.status_code == 200:
     print("¡Solución enviada correctamente! Respuesta:", response.json())
@@ -0,0 +1,156 @@
+import json
+import math
+import time
+
+
+class RelojSistema:
+    """Reloj real: pared (time.time) para ubicar los límites y monotónico para esperar."""
+
+    def pared(self):
+        return time.time()
+
+    def monotonico(self):
+        return time.monotonic()
+
+    def dormir(self, segundos):
+        time.sleep(max(segundos, 0))
+
+
+class RelojFalso:
+    """Reloj para pruebas: solo avanza al dormir (o con `avanzar`), al menos `paso` por llamada."""
+
+    def __init__(self, pared=0.0, paso=1e-4):
+        self._pared = pared
+        self._monotonico = 0.0
+        self.paso = paso
+
+    def pared(self):
+        return self._pared
+
+    def monotonico(self):
+        return self._monotonico
+
+    def avanzar(self, segundos):
+        self._pared += segundos
+        self._monotonico += segundos
+
+    def dormir(self, segundos):
+        self.avanzar(max(segundos, self.paso))
+
+
+class RegistroJSONL:
+    """
+    Log estructurado de intentos: una línea JSON por registro, en un archivo
+    abierto una sola vez con búfer; se vuelca cada `volcar_cada` registros y al
+    cerrar, nunca en medio de un intento cronometrado.
+    """
+
+    def __init__(self, ruta, volcar_cada=20):
+        self.ruta = ruta
+        self.volcar_cada = volcar_cada
+        self._archivo = open(ruta, 'a', buffering=1 << 16, encoding='utf-8')
+        self._pendientes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def escribir(self, **campos):
+        self._archivo.write(json.dumps(campos, ensure_ascii=False, default=str) + '\n')
+        self._pendientes += 1
+        if self._pendientes >= self.volcar_cada:
+            self.volcar()
+
+    def volcar(self):
+        self._archivo.flush()
+        self._pendientes = 0
+
+    def cerrar(self):
+        if not self._archivo.closed:
+            self._archivo.close()
+
+
+class PlanificadorPreciso:
+    """
+    Ejecuta solicitudes para que lleguen al servidor en un instante de reloj de
+    pared (p. ej. el segundo 0 de cada minuto). El objetivo se convierte una
+    vez a reloj monotónico (inmune a ajustes del reloj del sistema) y se espera
+    durmiendo hasta `margen_giro` antes y luego en espera activa, con precisión
+    de milisegundos. Antes de cada objetivo se calienta la conexión del pool con
+    `calentar` (la solicitud crítica no paga DNS ni TLS) y se mide el RTT; la
+    solicitud se envía medio RTT (promedio móvil) antes de que deba llegar.
+    """
+
+    def __init__(self, reloj=None, calentar=None, anticipo_calentamiento=3.0, margen_giro=0.005, suavizado=0.3):
+        self.reloj = reloj or RelojSistema()
+        self.calentar = calentar
+        self.anticipo_calentamiento = anticipo_calentamiento
+        self.margen_giro = margen_giro
+        self.suavizado = suavizado
+        self.rtt = None  # segundos, promedio móvil exponencial
+
+    @staticmethod
+    def proximo_limite(pared, periodo=60.0, desfase=0.0):
+        """Próximo instante de pared `k * periodo + desfase` estrictamente posterior a `pared`."""
+        limite = math.floor((pared - desfase) / periodo) * periodo + desfase
+        return limite + periodo if limite <= pared else limite
+
+    def registrar_rtt(self, segundos):
+        self.rtt = segundos if self.rtt is None else (1 - self.suavizado) * self.rtt + self.suavizado * segundos
+
+    def a_monotonico(self, objetivo_pared):
+        return self.reloj.monotonico() + (objetivo_pared - self.reloj.pared())
+
+    def esperar_hasta(self, objetivo_monotonico):
+        """Duerme hasta poco antes del objetivo y termina en espera activa; devuelve el atraso (s)."""
+        while True:
+            restante = objetivo_monotonico - self.reloj.monotonico()
+            if restante <= 0:
+                return -restante
+            self.reloj.dormir(restante - self.margen_giro if restante > self.margen_giro else 0)
+
+    def _medir(self, funcion):
+        inicio = self.reloj.monotonico()
+        try:
+            return funcion(), None, self.reloj.monotonico() - inicio
+        except Exception as error:  # el intento falla, el calendario sigue
+            return None, error, self.reloj.monotonico() - inicio
+
+    def ejecutar_en(self, objetivo_pared, funcion):
+        """
+        Ejecuta `funcion()` para que su solicitud llegue en `objetivo_pared` y
+        devuelve (resultado, detalle); `detalle` tiene los tiempos del intento y
+        el error de la función si lo hubo.
+        """
+        objetivo = self.a_monotonico(objetivo_pared)
+        if self.calentar is not None:
+            self.esperar_hasta(objetivo - self.anticipo_calentamiento)
+            _, error, rtt = self._medir(self.calentar)
+            if error is None:
+                self.registrar_rtt(rtt)
+        compensacion = self.rtt / 2 if self.rtt is not None else 0.0
+        atraso = self.esperar_hasta(objetivo - compensacion)
+        envio_pared = self.reloj.pared()
+        resultado, error, rtt = self._medir(funcion)
+        if error is None:
+            self.registrar_rtt(rtt)
+        detalle = {
+            'objetivo': objetivo_pared,
+            'envio': envio_pared,
+            'compensacion_ms': compensacion * 1000,
+            'atraso_envio_ms': atraso * 1000,
+            'rtt_ms': rtt * 1000,
+            # Llegada estimada al servidor: medio RTT después del envío
+            'error_llegada_ms': (envio_pared + rtt / 2 - objetivo_pared) * 1000,
+            'error': None if error is None else repr(error),
+        }
+        return resultado, detalle
+
+    def ejecutar_en_proximo(self, funcion, periodo=60.0, desfase=0.0):
+        """Ejecuta `funcion` en el próximo límite de `periodo` segundos (más `desfase`) del reloj de pared."""
+        # Si el límite está tan cerca que no alcanza el calentamiento, se apunta al siguiente
+        objetivo = self.proximo_limite(self.reloj.pared() + (self.anticipo_calentamiento if self.calentar else 0),
+                                       periodo, desfase)
+        return self.ejecutar_en(objetivo, funcion)
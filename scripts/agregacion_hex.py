@@ -0,0 +1,215 @@
+# agregacion_hex.py
+
+import numpy as np
+import pandas as pd
+from indexado_h3 import celdas_a_str
+from estadisticas_streaming import (momentos_desde_valores, combinar_momentos, varianza_muestral,
+                                    FronterasDispositivos)
+from conteo_distinto import ConteoDistintoExacto, MODOS_CONTEO, crear_conteo
+from sesiones import IntervalosPermanencia
+
+COLUMNAS_FEATURES = ['mobility_density', 'avg_time_in_hex', 'time_in_hex_variance', 'avg_visits_per_device',
+                     'visits', 'night_share', 'return_frequency']
+
+
+def codificar_dispositivos(device_ids):
+    """
+    Codifica device_id como hash uint64 estable entre bloques y procesos.
+    Devuelve el diccionario ordenado de hashes y el código de cada fila.
+    """
+    codigos, unicos = pd.factorize(pd.Series(device_ids), sort=False)
+    hashes = pd.util.hash_array(np.asarray(unicos, dtype=object))
+    diccionario, remapeo = np.unique(hashes, return_inverse=True)
+    return diccionario, remapeo.reshape(-1)[codigos]
+
+
+def a_segundos(timestamps):
+    """
+    Convierte timestamps (epoch numérico, datetime64 o fechas con zona horaria)
+    a segundos epoch UTC en float64.
+    """
+    if isinstance(timestamps, np.ndarray) and timestamps.dtype == object:
+        # Así devuelve to_numpy() las columnas con zona horaria
+        timestamps = pd.to_datetime(timestamps, utc=True)
+    if pd.api.types.is_datetime64_any_dtype(timestamps):
+        fechas = pd.DatetimeIndex(timestamps)
+        if fechas.tz is not None:
+            fechas = fechas.tz_convert(None)
+        return fechas.to_numpy().astype('datetime64[ns]').astype(np.int64) / 1e9
+    return np.asarray(timestamps).astype(np.float64)
+
+
+def _acumular(destino, indices, valores):
+    # Los índices de un almacén son únicos, así que la suma por posición es directa
+    destino[indices] += valores
+
+
+class AlmacenAgregados:
+    """
+    Agregados de movilidad por celda H3 en arreglos columnares.
+
+    Las celdas (uint64) se guardan como diccionario ordenado y las métricas
+    por celda son arreglos alineados con `celdas`. Los dispositivos distintos
+    por celda se llevan en un conteo combinable (exacto o HyperLogLog), de modo
+    que un dispositivo visto en varios bloques se cuenta una sola vez.
+    """
+
+    def __init__(self, celdas=None, puntos=None, distintos=None, n_permanencias=None, media_permanencia=None,
+                 m2_permanencia=None, fronteras=None, puntos_nocturnos=None, n_visitas=None):
+        self.celdas = np.empty(0, dtype=np.uint64) if celdas is None else celdas
+        n = len(self.celdas)
+        self.puntos = np.zeros(n, dtype=np.int64) if puntos is None else puntos
+        self.puntos_nocturnos = np.zeros(n, dtype=np.int64) if puntos_nocturnos is None else puntos_nocturnos
+        # Visitas: estadías ininterrumpidas de un dispositivo en la celda
+        self.n_visitas = np.zeros(n, dtype=np.int64) if n_visitas is None else n_visitas
+        self.distintos = ConteoDistintoExacto() if distintos is None else distintos
+        # Momentos (n, media, M2) de los intervalos de permanencia por celda
+        self.n_permanencias = np.zeros(n, dtype=np.int64) if n_permanencias is None else n_permanencias
+        self.media_permanencia = np.zeros(n) if media_permanencia is None else media_permanencia
+        self.m2_permanencia = np.zeros(n) if m2_permanencia is None else m2_permanencia
+        # Extremos de cada dispositivo por bloque, para unir permanencias entre bloques
+        self.fronteras = FronterasDispositivos() if fronteras is None else fronteras
+
+    @classmethod
+    def desde_bloque(cls, celdas, device_ids, timestamps, modo_densidad='exacto', precision_hll=12,
+                     celdas_anteriores=None, timestamps_anteriores=None):
+        """
+        Construye el agregado parcial de un bloque (celdas uint64 por fila) a partir
+        de su tabla de intervalos de permanencia. Si se conoce el punto anterior de
+        cada fila (dataset particionado), no hace falta unir fronteras.
+        """
+        dispositivos, cod_disp = codificar_dispositivos(device_ids)
+        intervalos = IntervalosPermanencia.desde_puntos(cod_disp, celdas, a_segundos(timestamps), celdas_anteriores,
+                                                        None if timestamps_anteriores is None
+                                                        else a_segundos(timestamps_anteriores))
+        return cls.desde_intervalos(intervalos, dispositivos, modo_densidad, precision_hll,
+                                    con_fronteras=celdas_anteriores is None)
+
+    @classmethod
+    def desde_intervalos(cls, intervalos, dispositivos, modo_densidad='exacto', precision_hll=12, con_fronteras=True,
+                         mascara=None):
+        """
+        Agregado de una tabla de intervalos cuyos códigos de dispositivo indexan
+        `dispositivos` (hashes uint64). Sin fronteras, las estadías que cruzan
+        bloques ya deben venir enlazadas por el punto previo. Con `mascara` solo
+        se agregan los intervalos marcados, pero las fronteras se toman de todos.
+        """
+        fronteras = None
+        if con_fronteras:
+            fronteras = FronterasDispositivos.desde_ordenados(dispositivos[intervalos.dispositivo], intervalos.entrada,
+                                                              intervalos.celda, intervalos.salida)
+        if mascara is not None:
+            intervalos = intervalos.seleccionar(mascara)
+        celdas_unicas = np.unique(intervalos.celda)
+        # Dispositivos distintos por celda: basta con un par por intervalo
+        distintos = crear_conteo(intervalos.celda, dispositivos[intervalos.dispositivo], modo_densidad, precision_hll)
+        return cls(celdas=celdas_unicas, distintos=distintos, fronteras=fronteras,
+                   **intervalos.por_celda(celdas_unicas))
+
+    @classmethod
+    def combinar_todos(cls, almacenes):
+        """Reduce varios agregados parciales en uno solo con operaciones vectorizadas."""
+        almacenes = [a for a in almacenes if len(a.celdas)]
+        if not almacenes:
+            return cls()
+        if len(almacenes) == 1:
+            return almacenes[0]
+        celdas = np.unique(np.concatenate([a.celdas for a in almacenes]))
+        resultado = cls(celdas=celdas)
+
+        indices, conteos, medias, m2s = [], [], [], []
+        for almacen in almacenes:
+            idx = np.searchsorted(celdas, almacen.celdas)
+            _acumular(resultado.puntos, idx, almacen.puntos)
+            _acumular(resultado.puntos_nocturnos, idx, almacen.puntos_nocturnos)
+            _acumular(resultado.n_visitas, idx, almacen.n_visitas)
+            indices.append(idx)
+            conteos.append(almacen.n_permanencias)
+            medias.append(almacen.media_permanencia)
+            m2s.append(almacen.m2_permanencia)
+
+        resultado.n_permanencias, resultado.media_permanencia, resultado.m2_permanencia = combinar_momentos(
+            np.concatenate(indices), np.concatenate(conteos), np.concatenate(medias), np.concatenate(m2s), len(celdas))
+        resultado.distintos = type(almacenes[0].distintos).combinar_todos([a.distintos for a in almacenes])
+        resultado.fronteras = FronterasDispositivos.combinar_todos([a.fronteras for a in almacenes])
+        return resultado
+
+    def combinar(self, otro):
+        return AlmacenAgregados.combinar_todos([self, otro])
+
+    def cerrar_fronteras(self):
+        """
+        Incorpora a los momentos las permanencias que cruzan fronteras entre bloques;
+        cada una une dos intervalos en una sola visita.
+        """
+        celdas, diferencias = self.fronteras.cerrar()
+        # Las fronteras cubren todas las celdas del bloque; solo cuentan las agregadas
+        agregadas = np.isin(celdas, self.celdas)
+        celdas, diferencias = celdas[agregadas], diferencias[agregadas]
+        if len(celdas) == 0:
+            return
+        n = len(self.celdas)
+        grupo = np.searchsorted(self.celdas, celdas)
+        self.n_visitas = self.n_visitas - np.bincount(grupo, minlength=n)
+        conteo, media, m2 = momentos_desde_valores(grupo, diferencias, n)
+        grupos = np.concatenate((np.arange(n), np.arange(n)))
+        self.n_permanencias, self.media_permanencia, self.m2_permanencia = combinar_momentos(
+            grupos,
+            np.concatenate((self.n_permanencias, conteo)),
+            np.concatenate((self.media_permanencia, media)),
+            np.concatenate((self.m2_permanencia, m2)),
+            n,
+        )
+
+    def guardar(self, ruta):
+        """Persiste el estado combinable (momentos, conteo distinto y fronteras) en un .npz."""
+        modo = next(m for m, clase in MODOS_CONTEO.items() if isinstance(self.distintos, clase))
+        arreglos = {'celdas': self.celdas, 'puntos': self.puntos, 'puntos_nocturnos': self.puntos_nocturnos,
+                    'n_visitas': self.n_visitas, 'n_permanencias': self.n_permanencias,
+                    'media_permanencia': self.media_permanencia, 'm2_permanencia': self.m2_permanencia,
+                    'modo_densidad': np.array(modo)}
+        arreglos.update({f"distintos_{k}": v for k, v in self.distintos.a_arreglos().items()})
+        arreglos.update({f"fronteras_{k}": v for k, v in self.fronteras.a_arreglos().items()})
+        np.savez(ruta, **arreglos)
+
+    @classmethod
+    def cargar(cls, ruta):
+        with np.load(ruta) as datos:
+            arreglos = {k: datos[k] for k in datos.files}
+
+        def _prefijo(prefijo):
+            return {k[len(prefijo):]: v for k, v in arreglos.items() if k.startswith(prefijo)}
+
+        return cls(
+            celdas=arreglos['celdas'],
+            puntos=arreglos['puntos'],
+            distintos=MODOS_CONTEO[str(arreglos['modo_densidad'])].desde_arreglos(_prefijo('distintos_')),
+            n_permanencias=arreglos['n_permanencias'],
+            media_permanencia=arreglos['media_permanencia'],
+            m2_permanencia=arreglos['m2_permanencia'],
+            fronteras=FronterasDispositivos.desde_arreglos(_prefijo('fronteras_')),
+            puntos_nocturnos=arreglos['puntos_nocturnos'],
+            n_visitas=arreglos['n_visitas'],
+        )
+
+    def a_dataframe(self):
+        """Tabla de características por hex_id, con NaN donde no hubo permanencias."""
+        self.cerrar_fronteras()
+        densidad = self.distintos.estimar(self.celdas)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            tiempo_promedio = np.where(self.n_permanencias > 0, self.media_permanencia, np.nan)
+            visitas_media = self.puntos / densidad
+            proporcion_nocturna = self.puntos_nocturnos / self.puntos
+            # Regresos por dispositivo: visitas más allá de la primera de cada dispositivo
+            frecuencia_regreso = np.maximum(self.n_visitas - densidad, 0) / densidad
+
+        return pd.DataFrame({
+            'hex_id': celdas_a_str(self.celdas),
+            'mobility_density': densidad,
+            'avg_time_in_hex': tiempo_promedio,
+            'time_in_hex_variance': varianza_muestral(self.n_permanencias, self.m2_permanencia),
+            'avg_visits_per_device': visitas_media,
+            'visits': self.n_visitas,
+            'night_share': proporcion_nocturna,
+            'return_frequency': frecuencia_regreso,
+        })
@@ -0,0 +1,100 @@
+# agrupador_lotes.py
+
+import asyncio
+
+
+class AgrupadorLotes:
+    """
+    Agrupa solicitudes concurrentes de un elemento en lotes: espera hasta
+    `max_espera_ms` desde la primera solicitud pendiente o hasta juntar
+    `max_lote`, llama una sola vez a `funcion_lote(elementos)` (que devuelve un
+    resultado por elemento, en orden) y entrega cada resultado a quien lo pidió.
+    Corre dentro del event loop; `funcion_lote` no debe bloquear por mucho tiempo.
+    """
+
+    def __init__(self, funcion_lote, max_espera_ms=2.0, max_lote=256):
+        if max_lote < 1:
+            raise ValueError("max_lote debe ser al menos 1")
+        self.funcion_lote = funcion_lote
+        self.max_espera = max_espera_ms / 1000
+        self.max_lote = max_lote
+        self._pendientes = []  # (elemento, futuro)
+        self._hay_pendientes = None
+        self._lote_lleno = None
+        self._tarea = None
+        self.lotes = 0
+        self.elementos = 0
+        self.profundidad_maxima = 0
+
+    def iniciar(self):
+        self._hay_pendientes = asyncio.Event()
+        self._lote_lleno = asyncio.Event()
+        self._tarea = asyncio.get_running_loop().create_task(self._bucle())
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+        for _, futuro in self._pendientes:
+            if not futuro.done():
+                futuro.set_exception(RuntimeError("Agrupador detenido"))
+        self._pendientes = []
+
+    async def enviar(self, elemento):
+        """Resultado de `elemento`, calculado junto con las demás solicitudes del mismo lote."""
+        if self._tarea is None:
+            raise RuntimeError("El agrupador no está iniciado")
+        futuro = asyncio.get_running_loop().create_future()
+        self._pendientes.append((elemento, futuro))
+        self.profundidad_maxima = max(self.profundidad_maxima, len(self._pendientes))
+        self._hay_pendientes.set()
+        if len(self._pendientes) >= self.max_lote:
+            self._lote_lleno.set()
+        return await futuro
+
+    async def _bucle(self):
+        while True:
+            await self._hay_pendientes.wait()
+            if len(self._pendientes) < self.max_lote:
+                try:
+                    await asyncio.wait_for(self._lote_lleno.wait(), self.max_espera)
+                except asyncio.TimeoutError:
+                    pass
+            lote, self._pendientes = self._pendientes[:self.max_lote], self._pendientes[self.max_lote:]
+            if len(self._pendientes) < self.max_lote:
+                self._lote_lleno.clear()
+            if not self._pendientes:
+                self._hay_pendientes.clear()
+            self._resolver(lote)
+            # Ceder el loop para que las solicitudes resueltas respondan antes del próximo lote
+            await asyncio.sleep(0)
+
+    def _resolver(self, lote):
+        elementos = [elemento for elemento, _ in lote]
+        try:
+            resultados = self.funcion_lote(elementos)
+        except Exception as error:
+            for _, futuro in lote:
+                if not futuro.done():
+                    futuro.set_exception(error)
+            return
+        self.lotes += 1
+        self.elementos += len(lote)
+        for (_, futuro), resultado in zip(lote, resultados):
+            if not futuro.done():  # la solicitud pudo cancelarse mientras esperaba
+                futuro.set_result(resultado)
+
+    def metricas(self):
+        return {
+            "queue_depth": len(self._pendientes),
+            "max_queue_depth": self.profundidad_maxima,
+            "batches": self.lotes,
+            "items": self.elementos,
+            "mean_batch_size": self.elementos / self.lotes if self.lotes else None,
+            "max_wait_ms": self.max_espera * 1000,
+            "max_batch": self.max_lote,
+        }
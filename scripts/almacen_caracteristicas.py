@@ -0,0 +1,260 @@
+# almacen_caracteristicas.py
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from indexado_h3 import str_a_celdas, celdas_a_str
+
+ARCHIVO_CATALOGO = 'catalogo.json'
+COLUMNA_CELDA = 'celda'
+
+
+def referencia(nombre, version):
+    """Referencia de linaje a una versión de un conjunto del almacén."""
+    return f"{nombre}@{version}"
+
+
+def _arreglo_arrow(serie):
+    # Desde numpy los NaN quedan como valores (sin máscara de nulos) y la columna se lee sin copia
+    if serie.dtype.kind in 'biuf':
+        return pa.array(serie.to_numpy())
+    return pa.array(serie, from_pandas=True)
+
+
+def _huella_archivo(ruta):
+    h = hashlib.sha1()
+    with open(ruta, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _posiciones(celdas_tabla, celdas):
+    # Fila de cada celda en la tabla ordenada (acotada) y máscara de encontradas
+    if not len(celdas_tabla):
+        return np.zeros(len(celdas), dtype=np.int64), np.zeros(len(celdas), dtype=bool)
+    posiciones = np.minimum(np.searchsorted(celdas_tabla, celdas), len(celdas_tabla) - 1)
+    return posiciones, celdas_tabla[posiciones] == celdas
+
+
+def _reunir_columna(valores, posiciones, encontradas):
+    # Valores de las filas `posiciones`; las no encontradas quedan en NaN (None si no es numérica)
+    valores = np.asarray(valores)[posiciones] if len(valores) else np.full(len(posiciones), np.nan)
+    if not encontradas.all():
+        if valores.dtype.kind in 'biu':
+            valores = valores.astype(np.float64)
+        elif valores.dtype.kind not in 'fO':
+            valores = valores.astype(object)
+        valores[~encontradas] = np.nan if valores.dtype.kind == 'f' else None
+    return valores
+
+
+def unir_por_celda(df, celdas_tabla, columnas, columna='hex_id'):
+    """
+    Une a `df` (por su columna `columna` de hex_id) las `columnas` (nombre ->
+    arreglo) de una tabla ordenada por `celdas_tabla` uint64, con búsqueda
+    binaria en lugar de un merge de pandas. Es un left join: los hexágonos que
+    no están en la tabla quedan con NaN (None en columnas no numéricas).
+    """
+    posiciones, encontradas = _posiciones(celdas_tabla, str_a_celdas(df[columna]))
+    df = df.copy()
+    for nombre, valores in columnas.items():
+        df[nombre] = _reunir_columna(valores, posiciones, encontradas)
+    return df
+
+
+def unir_tablas_externo(celdas_a, columnas_a, celdas_b, columnas_b):
+    """
+    Outer join de dos tablas ordenadas por celda uint64 (celdas, nombre ->
+    arreglo): devuelve la unión ordenada de las celdas y las columnas de ambas,
+    con NaN (None) donde una tabla no tiene la celda. Las columnas de `b`
+    reemplazan a las de `a` con el mismo nombre.
+    """
+    celdas = np.union1d(celdas_a, celdas_b)
+    resultado = {}
+    for celdas_tabla, columnas in ((celdas_a, columnas_a), (celdas_b, columnas_b)):
+        posiciones, encontradas = _posiciones(celdas_tabla, celdas)
+        for nombre, valores in columnas.items():
+            resultado[nombre] = _reunir_columna(valores, posiciones, encontradas)
+    return celdas, resultado
+
+
+def unir_tabla(df, tabla, columna='hex_id'):
+    """Left join de `df` con un DataFrame `tabla` de una fila por hex_id, por búsqueda binaria."""
+    return unir_por_celda(df, *tabla_por_celda(tabla, columna), columna)
+
+
+def tabla_por_celda(df, columna='hex_id'):
+    """Celdas uint64 ordenadas y arreglos de las demás columnas de `df` en ese orden."""
+    celdas = str_a_celdas(df[columna])
+    orden = np.argsort(celdas, kind='stable')
+    return celdas[orden], {c: df[c].to_numpy()[orden] for c in df if c != columna}
+
+
+def reunir_por_celda(celdas, celdas_tabla, columnas):
+    """
+    Matriz float64 preasignada con las `columnas` (nombre -> arreglo numérico)
+    de la tabla ordenada por `celdas_tabla` para cada una de `celdas`, y la
+    máscara de celdas encontradas; las filas no encontradas quedan en NaN.
+    """
+    X = np.full((len(celdas), len(columnas)), np.nan)
+    posiciones, encontradas = _posiciones(celdas_tabla, celdas)
+    filas = posiciones[encontradas]
+    for j, valores in enumerate(columnas.values()):
+        X[encontradas, j] = valores[filas]
+    return X, encontradas
+
+
+def enriquecer_conjuntos(conjuntos, celdas_tabla, columnas, imputador=None, columna='hex_id'):
+    """
+    Enriquece varios DataFrames (p. ej. train y test) en una sola llamada: cada
+    hex_id se convierte una vez a uint64, las celdas únicas de todos los
+    conjuntos se buscan juntas en la tabla ordenada y sus filas se copian a una
+    matriz preasignada. La máscara de filas sin datos propios (no encontradas o
+    con NaN) pasa directo a `imputador.imputar_matriz`, así un hexágono recibe
+    el mismo valor en todos los conjuntos. Devuelve los conjuntos enriquecidos,
+    las celdas únicas, su matriz de características y la máscara de encontradas.
+    """
+    nombres = list(columnas)
+    largos = [len(df) for df in conjuntos]
+    celdas = str_a_celdas(pd.concat([df[columna] for df in conjuntos], ignore_index=True) if conjuntos else [])
+    unicas, inversa = np.unique(celdas, return_inverse=True)
+    X, encontradas = reunir_por_celda(unicas, celdas_tabla, columnas)
+    if imputador is not None:
+        imputador.imputar_matriz(X, nombres, unicas, ~encontradas | np.isnan(X).any(axis=1))
+
+    enriquecidos = []
+    inicio = 0
+    for df, largo in zip(conjuntos, largos):
+        filas = inversa.reshape(-1)[inicio:inicio + largo]
+        inicio += largo
+        base = df.drop(columns=[c for c in nombres if c in df]).reset_index(drop=True)
+        enriquecidos.append(pd.concat([base, pd.DataFrame(X[filas], columns=nombres)], axis=1))
+    return enriquecidos, unicas, X, encontradas
+
+
+class AlmacenCaracteristicas:
+    """
+    Almacén de características por hexágono. Cada versión de un conjunto es un
+    archivo Arrow IPC sin compresión, ordenado por la celda H3 uint64 y con
+    columnas tipadas, que se lee mapeado en memoria y sin copias. El catálogo
+    JSON registra de cada versión su esquema, filas, huella del archivo, origen
+    (linaje: otras versiones del almacén o archivos externos) y parámetros.
+    Escribir un contenido idéntico a la última versión no crea una nueva.
+    """
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+        ruta = os.path.join(directorio, ARCHIVO_CATALOGO)
+        self.catalogo = {'conjuntos': {}}
+        if os.path.exists(ruta):
+            with open(ruta) as archivo:
+                self.catalogo = json.load(archivo)
+
+    def _guardar_catalogo(self):
+        ruta = os.path.join(self.directorio, ARCHIVO_CATALOGO)
+        with open(ruta + '.tmp', 'w') as archivo:
+            json.dump(self.catalogo, archivo, indent=2)
+        os.replace(ruta + '.tmp', ruta)
+
+    def __contains__(self, nombre):
+        return nombre in self.catalogo['conjuntos']
+
+    def versiones(self, nombre):
+        if nombre not in self:
+            raise KeyError(f"El conjunto {nombre} no está en el almacén")
+        return self.catalogo['conjuntos'][nombre]
+
+    def version(self, nombre, version=None):
+        """Entrada del catálogo de una versión (la última si `version` es None)."""
+        versiones = self.versiones(nombre)
+        if version is None:
+            return versiones[-1]
+        for entrada in versiones:
+            if entrada['version'] == version:
+                return entrada
+        raise KeyError(f"El conjunto {nombre} no tiene la versión {version}")
+
+    def ruta(self, nombre, version=None):
+        return os.path.join(self.directorio, self.version(nombre, version)['archivo'])
+
+    def escribir(self, nombre, df, origen=(), parametros=None, columna='hex_id'):
+        """Guarda `df` (una fila por hex_id) como nueva versión de `nombre` y devuelve su número."""
+        celdas = str_a_celdas(df[columna])
+        orden = np.argsort(celdas, kind='stable')
+        celdas = celdas[orden]
+        if len(celdas) > 1 and (celdas[1:] == celdas[:-1]).any():
+            raise ValueError(f"Hay hex_id repetidos en el conjunto {nombre}")
+        df = df.drop(columns=columna).iloc[orden].reset_index(drop=True)
+        tabla = pa.Table.from_arrays([pa.array(celdas)] + [_arreglo_arrow(df[c]) for c in df.columns],
+                                     names=[COLUMNA_CELDA] + [str(c) for c in df.columns])
+
+        versiones = self.catalogo['conjuntos'].get(nombre, [])
+        version = versiones[-1]['version'] + 1 if versiones else 1
+        archivo = os.path.join(nombre, f"v{version:04d}.arrow")
+        ruta = os.path.join(self.directorio, archivo)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with pa.OSFile(ruta + '.tmp', 'wb') as salida, pa.ipc.new_file(salida, tabla.schema) as escritor:
+            escritor.write_table(tabla, max_chunksize=max(len(celdas), 1))
+        huella = _huella_archivo(ruta + '.tmp')
+        origen = list(origen)
+        parametros = parametros or {}
+        if versiones and (versiones[-1]['huella'], versiones[-1]['origen'], versiones[-1]['parametros']) == \
+                (huella, origen, parametros):
+            os.remove(ruta + '.tmp')
+            return versiones[-1]['version']
+        os.replace(ruta + '.tmp', ruta)
+
+        versiones.append({'version': version, 'archivo': archivo, 'filas': len(celdas), 'huella': huella,
+                          'esquema': {campo.name: str(campo.type) for campo in tabla.schema},
+                          'origen': origen, 'parametros': parametros,
+                          'creado': datetime.now(timezone.utc).isoformat(timespec='seconds')})
+        self.catalogo['conjuntos'][nombre] = versiones
+        self._guardar_catalogo()
+        return version
+
+    def importar_csv(self, nombre, ruta_csv, parametros=None):
+        """Incorpora un CSV externo; su linaje registra la ruta y la huella del archivo."""
+        origen = [f"archivo:{os.path.abspath(ruta_csv)}#{_huella_archivo(ruta_csv)[:12]}"]
+        return self.escribir(nombre, pd.read_csv(ruta_csv), origen, parametros)
+
+    def tabla(self, nombre, columnas=None, version=None):
+        """Tabla Arrow mapeada en memoria (sin copia), proyectada a la celda y `columnas`."""
+        tabla = pa.ipc.open_file(pa.memory_map(self.ruta(nombre, version), 'r')).read_all()
+        if columnas is not None:
+            faltantes = [c for c in columnas if c not in tabla.column_names]
+            if faltantes:
+                raise KeyError(f"Faltan columnas en el conjunto {nombre}: {faltantes}")
+            tabla = tabla.select([COLUMNA_CELDA] + [c for c in columnas if c != COLUMNA_CELDA])
+        return tabla
+
+    def columnas(self, nombre, columnas=None, version=None):
+        """Celdas ordenadas y arreglos numpy de las columnas; las numéricas son vistas del mapa de memoria."""
+        tabla = self.tabla(nombre, columnas, version)
+        arreglos = {c: tabla.column(c).combine_chunks().to_numpy(zero_copy_only=False) for c in tabla.column_names}
+        return arreglos.pop(COLUMNA_CELDA), arreglos
+
+    def leer(self, nombre, columnas=None, version=None):
+        """DataFrame con 'hex_id' y las `columnas` pedidas (todas si es None)."""
+        celdas, arreglos = self.columnas(nombre, columnas, version)
+        return pd.DataFrame({'hex_id': celdas_a_str(celdas), **arreglos})
+
+    def unir(self, df, nombre, columnas=None, version=None, columna='hex_id'):
+        """Left join de `df` con un conjunto del almacén por búsqueda binaria sobre la celda."""
+        celdas, arreglos = self.columnas(nombre, columnas, version)
+        return unir_por_celda(df, celdas, arreglos, columna)
+
+    def linaje(self, nombre, version=None):
+        """Entradas del catálogo de la versión y de todo su origen dentro del almacén, recursivamente."""
+        entrada = {'nombre': nombre, **self.version(nombre, version)}
+        resultado = [entrada]
+        for origen in entrada['origen']:
+            if '@' in origen and not origen.startswith('archivo:'):
+                nombre_origen, version_origen = origen.rsplit('@', 1)
+                resultado.extend(self.linaje(nombre_origen, int(version_origen)))
+        return resultado
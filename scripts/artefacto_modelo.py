@@ -0,0 +1,79 @@
+# artefacto_modelo.py
+
+import json
+import os
+import numpy as np
+import pandas as pd
+import lightgbm as lgb
+from datasets_lightgbm import huella_arreglos
+
+ARCHIVO_BOOSTER = 'booster.txt'
+ARCHIVO_MANIFIESTO = 'artefacto.json'
+
+
+class ArtefactoModelo:
+    """
+    Modelo listo para inferencia: booster de LightGBM, escalado de las columnas
+    normalizadas (media y desvío del StandardScaler de entrenamiento), orden de
+    las columnas de entrada y huella de los datos con que se entrenó. `predict`
+    aplica el mismo preprocesamiento que el entrenamiento a cualquier tabla que
+    tenga esas columnas.
+    """
+
+    def __init__(self, booster, columnas, columnas_normalizadas=(), media=None, escala=None, huella=None,
+                 metadatos=None):
+        self.booster = booster
+        self.columnas = list(columnas)
+        self.columnas_normalizadas = list(columnas_normalizadas)
+        self.media = np.zeros(len(self.columnas_normalizadas)) if media is None else np.asarray(media, dtype=np.float64)
+        self.escala = np.ones(len(self.columnas_normalizadas)) if escala is None else np.asarray(escala, dtype=np.float64)
+        self.huella = huella
+        self.metadatos = metadatos or {}
+        self._posiciones = [self.columnas.index(c) for c in self.columnas_normalizadas]
+
+    @classmethod
+    def desde_entrenamiento(cls, modelo, X, scaler=None, columnas_normalizadas=(), metadatos=None):
+        """Arma el artefacto con el modelo sklearn de LightGBM, el scaler ajustado y la matriz de entrenamiento."""
+        return cls(modelo.booster_ if hasattr(modelo, 'booster_') else modelo, X.columns, columnas_normalizadas,
+                   None if scaler is None else scaler.mean_, None if scaler is None else scaler.scale_,
+                   huella_arreglos([X], columnas=list(X.columns)), metadatos)
+
+    def preparar(self, df):
+        """Matriz de entrada en el orden de entrenamiento, con las columnas normalizadas escaladas."""
+        faltantes = [c for c in self.columnas if c not in df]
+        if faltantes:
+            raise ValueError(f"Faltan columnas para el modelo: {faltantes}")
+        return self.escalar(df[self.columnas].to_numpy(dtype=np.float64, copy=True))
+
+    def escalar(self, X):
+        """Escala en su lugar las columnas normalizadas de una matriz ya en el orden de `columnas`."""
+        if self._posiciones:
+            X[:, self._posiciones] = (X[:, self._posiciones] - self.media) / self.escala
+        return X
+
+    def predict(self, df):
+        return self.booster.predict(self.preparar(df))
+
+    def guardar(self, directorio):
+        os.makedirs(directorio, exist_ok=True)
+        self.booster.save_model(os.path.join(directorio, ARCHIVO_BOOSTER))
+        manifiesto = {'columnas': self.columnas, 'columnas_normalizadas': self.columnas_normalizadas,
+                      'media': self.media.tolist(), 'escala': self.escala.tolist(), 'huella': self.huella,
+                      'metadatos': self.metadatos}
+        temporal = os.path.join(directorio, ARCHIVO_MANIFIESTO + '.tmp')
+        with open(temporal, 'w') as archivo:
+            json.dump(manifiesto, archivo, indent=2, default=str)
+        os.replace(temporal, os.path.join(directorio, ARCHIVO_MANIFIESTO))
+
+    @classmethod
+    def cargar(cls, directorio):
+        with open(os.path.join(directorio, ARCHIVO_MANIFIESTO)) as archivo:
+            manifiesto = json.load(archivo)
+        booster = lgb.Booster(model_file=os.path.join(directorio, ARCHIVO_BOOSTER))
+        return cls(booster, manifiesto['columnas'], manifiesto['columnas_normalizadas'], manifiesto['media'],
+                   manifiesto['escala'], manifiesto['huella'], manifiesto['metadatos'])
+
+
+def predecir_lote(artefacto, df, columna_id='hex_id', columna_prediccion='cost_of_living'):
+    """Predicciones de un lote como tabla (id, predicción)."""
+    return pd.DataFrame({columna_id: df[columna_id].to_numpy(), columna_prediccion: artefacto.predict(df)})
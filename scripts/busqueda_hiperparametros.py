@@ -0,0 +1,185 @@
+# busqueda_hiperparametros.py
+
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import lightgbm as lgb
+from scipy.stats import qmc
+from tqdm import tqdm
+from datasets_lightgbm import huella_arreglos, datasets_en_cache, cargar_datasets
+
+# Estado de cada proceso del pool: los Datasets se cargan una sola vez al iniciar
+_datos_proceso = {}
+
+
+def muestrear_configuracion(espacio, indice, semilla=42):
+    """
+    Configuración número `indice` de una secuencia cuasi aleatoria (Sobol) sobre
+    las listas de valores de `espacio`. Es determinista, así que un ensayo se
+    identifica por su índice y la grilla nunca se materializa.
+    """
+    nombres = sorted(espacio)
+    sobol = qmc.Sobol(d=len(nombres), scramble=True, seed=semilla)
+    if indice:
+        sobol.fast_forward(indice)
+    punto = sobol.random(1)[0]
+    return {nombre: espacio[nombre][min(int(u * len(espacio[nombre])), len(espacio[nombre]) - 1)]
+            for nombre, u in zip(nombres, punto)}
+
+
+def peldanos_asha(presupuesto_min, presupuesto_max, eta):
+    """Presupuestos (rondas de boosting) de cada peldaño: r_min * eta^k, con tope r_max."""
+    peldanos = [presupuesto_min]
+    while peldanos[-1] < presupuesto_max:
+        peldanos.append(min(peldanos[-1] * eta, presupuesto_max))
+    return peldanos
+
+
+def _iniciar_proceso(rutas_particiones, parametros_binning, parametros_fijos):
+    datasets = [cargar_datasets(ruta_train, ruta_valid, parametros_binning) for ruta_train, ruta_valid in rutas_particiones]
+    _datos_proceso.update(datasets=datasets, parametros_fijos=parametros_fijos)
+
+
+def _evaluar(tarea):
+    # Entrena una configuración con el presupuesto de su peldaño sobre los Datasets
+    # ya discretizados del proceso y devuelve el RMSE medio de validación
+    id_ensayo, parametros, peldano, presupuesto = tarea
+    datos = _datos_proceso
+    rmses, iteraciones = [], []
+    for entrenamiento, validacion in datos['datasets']:
+        modelo = lgb.train({**datos['parametros_fijos'], **parametros}, entrenamiento, num_boost_round=presupuesto,
+                           valid_sets=[validacion], callbacks=[lgb.early_stopping(stopping_rounds=50, verbose=False)])
+        rmses.append(float(modelo.best_score['valid_0']['rmse']))
+        iteraciones.append(modelo.best_iteration or presupuesto)
+    return {'id': id_ensayo, 'parametros': parametros, 'peldano': peldano, 'presupuesto': presupuesto,
+            'rmse': float(np.mean(rmses)), 'mejor_iteracion': int(round(np.mean(iteraciones)))}
+
+
+def _leer_registro(ruta_registro, huella):
+    # Solo se reanudan ensayos hechos con los mismos datos y el mismo espacio de búsqueda
+    if ruta_registro is None or not os.path.exists(ruta_registro):
+        return []
+    with open(ruta_registro) as archivo:
+        registros = [json.loads(linea) for linea in archivo if linea.strip()]
+    return [r for r in registros if r.get('huella') == huella]
+
+
+class BusquedaASHA:
+    """
+    Búsqueda de hiperparámetros con muestreo cuasi aleatorio y terminación
+    temprana asíncrona (ASHA): cada configuración empieza con pocas rondas de
+    boosting y solo la mejor fracción 1/eta de cada peldaño pasa al siguiente.
+    Los ensayos corren en un pool de procesos, cada uno con `hilos_por_ensayo`
+    hilos de LightGBM, y cada resultado se agrega a un registro JSONL desde el
+    que la búsqueda se reanuda sin repetir ensayos.
+
+    Los Datasets de LightGBM se discretizan una sola vez y se guardan en binario
+    en `directorio_cache` (temporal si es None); todos los ensayos los reutilizan.
+    """
+
+    def __init__(self, espacio, n_configuraciones=200, presupuesto_min=25, presupuesto_max=500, eta=3,
+                 n_procesos=None, hilos_por_ensayo=None, ruta_registro=None, semilla=42, directorio_cache=None,
+                 parametros_binning=None):
+        self.espacio = {k: list(v) for k, v in espacio.items() if k != 'n_estimators'}
+        self.n_configuraciones = n_configuraciones
+        self.peldanos = peldanos_asha(presupuesto_min, presupuesto_max, eta)
+        self.eta = eta
+        self.n_procesos = n_procesos or os.cpu_count() or 1
+        # Repartir los núcleos entre los procesos para no sobresuscribir la CPU
+        self.hilos_por_ensayo = hilos_por_ensayo or max(1, (os.cpu_count() or 1) // self.n_procesos)
+        self.ruta_registro = ruta_registro
+        self.semilla = semilla
+        self.directorio_cache = directorio_cache
+        self.parametros_binning = parametros_binning
+        self.resultados = {}  # (id, peldaño) -> resultado
+        self._en_curso = set()
+
+    def _promovible(self):
+        # Configuración en el tercio superior de su peldaño aún no promovida, desde el peldaño más alto
+        for peldano in range(len(self.peldanos) - 2, -1, -1):
+            completados = sorted((r['rmse'], r['id']) for (i, p), r in self.resultados.items() if p == peldano)
+            mejores = completados[:len(completados) // self.eta]
+            for _, id_ensayo in mejores:
+                if (id_ensayo, peldano + 1) not in self.resultados and (id_ensayo, peldano + 1) not in self._en_curso:
+                    return id_ensayo, peldano + 1
+        return None
+
+    def _siguiente_tarea(self, siguiente_id):
+        promovida = self._promovible()
+        if promovida is not None:
+            id_ensayo, peldano = promovida
+            parametros = self.resultados[(id_ensayo, peldano - 1)]['parametros']
+        elif siguiente_id < self.n_configuraciones:
+            id_ensayo, peldano = siguiente_id, 0
+            parametros = muestrear_configuracion(self.espacio, id_ensayo, self.semilla)
+        else:
+            return None
+        return id_ensayo, parametros, peldano, self.peldanos[peldano]
+
+    def ejecutar(self, X_train, y_train, X_valid, y_valid, parametros_fijos=None):
+        return self.ejecutar_particiones([(X_train, y_train, X_valid, y_valid)], parametros_fijos)
+
+    def ejecutar_particiones(self, particiones, parametros_fijos=None):
+        """
+        Búsqueda sobre varias particiones (X_train, y_train, X_valid, y_valid), p. ej.
+        los pliegues de una validación cruzada: cada ensayo se puntúa con el RMSE
+        medio de todas ellas.
+        """
+        parametros_fijos = {'objective': 'regression', 'metric': 'rmse', 'verbosity': -1, **(parametros_fijos or {})}
+        huella = huella_arreglos([a for particion in particiones for a in particion], espacio=self.espacio,
+                                 peldanos=self.peldanos, eta=self.eta, semilla=self.semilla, fijos=parametros_fijos,
+                                 binning=self.parametros_binning)
+        parametros_fijos['num_threads'] = self.hilos_por_ensayo
+        for resultado in _leer_registro(self.ruta_registro, huella):
+            self.resultados[(resultado['id'], resultado['peldano'])] = resultado
+        siguiente_id = 1 + max((i for i, _ in self.resultados), default=-1)
+
+        temporal = tempfile.TemporaryDirectory() if self.directorio_cache is None else None
+        rutas = [datasets_en_cache(*particion, self.directorio_cache or temporal.name, self.parametros_binning)
+                 for particion in particiones]
+
+        registro = open(self.ruta_registro, 'a') if self.ruta_registro else None
+        ejecutor = ProcessPoolExecutor(max_workers=self.n_procesos, initializer=_iniciar_proceso,
+                                       initargs=(rutas, self.parametros_binning, parametros_fijos))
+        pendientes = {}
+        progreso = tqdm(desc="Ensayos ASHA", initial=len(self.resultados))
+        try:
+            while True:
+                # Mantener todos los procesos ocupados
+                while len(pendientes) < self.n_procesos:
+                    tarea = self._siguiente_tarea(siguiente_id)
+                    if tarea is None:
+                        break
+                    if tarea[2] == 0:
+                        siguiente_id += 1
+                    self._en_curso.add((tarea[0], tarea[2]))
+                    pendientes[ejecutor.submit(_evaluar, tarea)] = tarea
+                if not pendientes:
+                    break
+                terminados, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                for futuro in terminados:
+                    tarea = pendientes.pop(futuro)
+                    self._en_curso.discard((tarea[0], tarea[2]))
+                    resultado = {**futuro.result(), 'huella': huella}
+                    self.resultados[(resultado['id'], resultado['peldano'])] = resultado
+                    if registro is not None:
+                        registro.write(json.dumps(resultado) + '\n')
+                        registro.flush()
+                    progreso.update(1)
+        finally:
+            progreso.close()
+            ejecutor.shutdown()
+            if registro is not None:
+                registro.close()
+            if temporal is not None:
+                temporal.cleanup()
+        return self.mejor()
+
+    def mejor(self):
+        """Mejor ensayo (menor RMSE); sus parámetros incluyen n_estimators = mejor iteración."""
+        if not self.resultados:
+            raise ValueError("No hay ensayos completados")
+        mejor = min(self.resultados.values(), key=lambda r: (r['rmse'], -r['peldano'], r['id']))
+        return {**mejor['parametros'], 'n_estimators': mejor['mejor_iteracion']}, mejor['rmse']
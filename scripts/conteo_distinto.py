@@ -0,0 +1,212 @@
+# conteo_distinto.py
+
+import numpy as np
+
+
+def _ordenar_pares(celdas, dispositivos):
+    # Pares (celda, dispositivo) únicos en orden lexicográfico
+    orden = np.lexsort((dispositivos, celdas))
+    celdas, dispositivos = celdas[orden], dispositivos[orden]
+    nuevo = np.ones(len(celdas), dtype=bool)
+    nuevo[1:] = (celdas[1:] != celdas[:-1]) | (dispositivos[1:] != dispositivos[:-1])
+    return celdas[nuevo], dispositivos[nuevo]
+
+
+def _longitud_bits(valores):
+    """Posición del bit más alto encendido (0 para el valor 0), vectorizado sobre uint64."""
+    valores = valores.astype(np.uint64, copy=True)
+    longitud = np.zeros(len(valores), dtype=np.int64)
+    for desplazamiento in (32, 16, 8, 4, 2, 1):
+        altos = valores >> np.uint64(desplazamiento)
+        mascara = altos > 0
+        longitud[mascara] += desplazamiento
+        valores[mascara] = altos[mascara]
+    return longitud + (valores > 0)
+
+
+def _mezclar(valores):
+    """Finalizador de splitmix64: reparte los bits de cualquier clave uint64."""
+    with np.errstate(over='ignore'):
+        x = valores.astype(np.uint64, copy=True)
+        x ^= x >> np.uint64(30)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(27)
+        x *= np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+    return x
+
+
+class ConteoDistintoExacto:
+    """Conjunto ordenado de pares (celda, hash de dispositivo); el conteo es exacto."""
+
+    def __init__(self, celdas=None, dispositivos=None):
+        self.celdas = np.empty(0, dtype=np.uint64) if celdas is None else celdas
+        self.dispositivos = np.empty(0, dtype=np.uint64) if dispositivos is None else dispositivos
+
+    @classmethod
+    def desde_pares(cls, celdas, dispositivos):
+        return cls(*_ordenar_pares(np.asarray(celdas, dtype=np.uint64), np.asarray(dispositivos, dtype=np.uint64)))
+
+    @classmethod
+    def combinar_todos(cls, conteos):
+        conteos = [c for c in conteos if len(c.celdas)]
+        if len(conteos) <= 1:
+            return conteos[0] if conteos else cls()
+        return cls(*_ordenar_pares(np.concatenate([c.celdas for c in conteos]),
+                                   np.concatenate([c.dispositivos for c in conteos])))
+
+    def a_arreglos(self):
+        return {'celdas': self.celdas, 'dispositivos': self.dispositivos}
+
+    @classmethod
+    def desde_arreglos(cls, arreglos):
+        return cls(arreglos['celdas'], arreglos['dispositivos'])
+
+    def estimar(self, celdas):
+        """Dispositivos distintos para cada celda de `celdas` (arreglo ordenado)."""
+        inicio = np.searchsorted(self.celdas, celdas, side='left')
+        fin = np.searchsorted(self.celdas, celdas, side='right')
+        return (fin - inicio).astype(np.int64)
+
+
+def _max_por_registro(celdas, indices, rangos):
+    # Reduce entradas (celda, registro, rango) repetidas a una por registro con el rango máximo
+    orden = np.lexsort((rangos, indices, celdas))
+    celdas, indices, rangos = celdas[orden], indices[orden], rangos[orden]
+    ultimo = np.ones(len(celdas), dtype=bool)
+    ultimo[:-1] = (celdas[1:] != celdas[:-1]) | (indices[1:] != indices[:-1])
+    return celdas[ultimo], indices[ultimo], rangos[ultimo]
+
+
+class ConteoDistintoHLL:
+    """
+    HyperLogLog por celda: 2**precision registros de un byte, error relativo
+    típico de 1.04 / sqrt(2**precision). La combinación es el máximo por
+    registro, así que los estados parciales se unen sin releer los datos.
+
+    Las celdas con pocos registros ocupados se guardan dispersas, como entradas
+    (celda, registro, rango) de 13 bytes; al superar `2**precision / 16`
+    registros ocupados (~256 dispositivos con precisión 12) pasan a una fila
+    densa de 2**precision bytes. Así una celda chica nunca ocupa más que en modo
+    exacto (16 bytes por dispositivo) y una grande queda acotada a 4 KiB.
+    """
+
+    def __init__(self, precision=12, celdas=None, registros=None, celdas_dispersas=None, indices=None, rangos=None):
+        if not 4 <= precision <= 18:
+            raise ValueError("La precisión de HyperLogLog debe estar entre 4 y 18")
+        self.precision = precision
+        # Parte densa: celdas ordenadas y una fila de registros por celda
+        self.celdas = np.empty(0, dtype=np.uint64) if celdas is None else celdas
+        if registros is None:
+            registros = np.zeros((len(self.celdas), 1 << precision), dtype=np.uint8)
+        self.registros = registros
+        # Parte dispersa: registros ocupados, ordenados por (celda, registro)
+        self.celdas_dispersas = np.empty(0, dtype=np.uint64) if celdas_dispersas is None else celdas_dispersas
+        self.indices = np.empty(0, dtype=np.uint32) if indices is None else indices
+        self.rangos = np.empty(0, dtype=np.uint8) if rangos is None else rangos
+
+    @property
+    def umbral_denso(self):
+        return (1 << self.precision) // 16
+
+    @classmethod
+    def _desde_entradas(cls, precision, celdas, indices, rangos):
+        # Entradas sin reducir -> parte dispersa para celdas chicas y densa para las grandes
+        celdas, indices, rangos = _max_por_registro(celdas, indices, rangos)
+        conteo = cls(precision)
+        celdas_unicas, inicio, ocupados = np.unique(celdas, return_index=True, return_counts=True)
+        densas = ocupados > conteo.umbral_denso
+        if densas.any():
+            en_densa = np.repeat(densas, ocupados)
+            conteo.celdas = celdas_unicas[densas]
+            conteo.registros = np.zeros((len(conteo.celdas), 1 << precision), dtype=np.uint8)
+            fila = np.repeat(np.arange(len(conteo.celdas)), ocupados[densas])
+            conteo.registros[fila, indices[en_densa]] = rangos[en_densa]
+            celdas, indices, rangos = celdas[~en_densa], indices[~en_densa], rangos[~en_densa]
+        conteo.celdas_dispersas, conteo.indices, conteo.rangos = celdas, indices, rangos
+        return conteo
+
+    def _entradas(self):
+        # Todas las entradas (celda, registro, rango) ocupadas, densas incluidas
+        fila, indice = np.nonzero(self.registros)
+        return (np.concatenate((self.celdas_dispersas, self.celdas[fila])),
+                np.concatenate((self.indices, indice.astype(np.uint32))),
+                np.concatenate((self.rangos, self.registros[fila, indice])))
+
+    @classmethod
+    def desde_pares(cls, celdas, dispositivos, precision=12):
+        hashes = _mezclar(np.asarray(dispositivos, dtype=np.uint64))
+        # Los primeros `precision` bits eligen el registro; el resto define el rango
+        bits_resto = 64 - precision
+        registro = (hashes >> np.uint64(bits_resto)).astype(np.uint32)
+        resto = hashes & np.uint64((1 << bits_resto) - 1)
+        rango = (bits_resto - _longitud_bits(resto) + 1).astype(np.uint8)
+        return cls._desde_entradas(precision, np.asarray(celdas, dtype=np.uint64), registro, rango)
+
+    @classmethod
+    def combinar_todos(cls, conteos):
+        conteos = [c for c in conteos if len(c.celdas) or len(c.celdas_dispersas)]
+        if len(conteos) <= 1:
+            return conteos[0] if conteos else cls()
+        precision = conteos[0].precision
+        if any(c.precision != precision for c in conteos):
+            raise ValueError("No se pueden combinar HyperLogLog con distinta precisión")
+        entradas = [c._entradas() for c in conteos]
+        return cls._desde_entradas(precision, *(np.concatenate(partes) for partes in zip(*entradas)))
+
+    def memoria(self):
+        """Bytes ocupados por los registros (densos y dispersos)."""
+        return self.celdas.nbytes + self.registros.nbytes + self.celdas_dispersas.nbytes + \
+            self.indices.nbytes + self.rangos.nbytes
+
+    def a_arreglos(self):
+        return {'precision': np.array(self.precision), 'celdas': self.celdas, 'registros': self.registros,
+                'celdas_dispersas': self.celdas_dispersas, 'indices': self.indices, 'rangos': self.rangos}
+
+    @classmethod
+    def desde_arreglos(cls, arreglos):
+        # Los estados guardados antes de la parte dispersa solo tienen celdas y registros
+        return cls(int(arreglos['precision']), arreglos['celdas'], arreglos['registros'],
+                   arreglos.get('celdas_dispersas'), arreglos.get('indices'), arreglos.get('rangos'))
+
+    def estimar(self, celdas):
+        """Estimación de dispositivos distintos para cada celda de `celdas` (arreglo ordenado)."""
+        m = 1 << self.precision
+        resultado = np.zeros(len(celdas), dtype=np.int64)
+        # Por celda: suma de 2^-registro sobre los m registros y cantidad de registros vacíos
+        celdas_dispersas, inicio, ocupados = np.unique(self.celdas_dispersas, return_index=True, return_counts=True)
+        suma_dispersa = np.add.reduceat(np.exp2(-self.rangos.astype(np.float64)), inicio) if len(inicio) else \
+            np.empty(0)
+        registros = self.registros.astype(np.float64)
+        todas = np.concatenate((self.celdas, celdas_dispersas))
+        if len(todas) == 0:
+            return resultado
+        sumas = np.concatenate((np.sum(np.exp2(-registros), axis=1), suma_dispersa + (m - ocupados)))
+        vacios = np.concatenate((np.sum(registros == 0, axis=1), m - ocupados))
+        orden = np.argsort(todas)
+        todas, sumas, vacios = todas[orden], sumas[orden], vacios[orden]
+
+        idx = np.searchsorted(todas, celdas)
+        presente = (idx < len(todas)) & (todas[np.minimum(idx, len(todas) - 1)] == celdas)
+        if not presente.any():
+            return resultado
+        sumas, ceros = sumas[idx[presente]], vacios[idx[presente]]
+        alfa = 0.7213 / (1 + 1.079 / m)
+        estimacion = alfa * m * m / sumas
+        # Corrección de rango pequeño (conteo lineal) cuando quedan registros vacíos
+        lineal = m * np.log(m / np.maximum(ceros, 1))
+        estimacion = np.where((estimacion <= 2.5 * m) & (ceros > 0), lineal, estimacion)
+        resultado[presente] = np.rint(estimacion).astype(np.int64)
+        return resultado
+
+
+MODOS_CONTEO = {'exacto': ConteoDistintoExacto, 'hll': ConteoDistintoHLL}
+
+
+def crear_conteo(celdas, dispositivos, modo='exacto', precision=12):
+    """Crea el conteo distinto de un bloque en modo 'exacto' o 'hll'."""
+    if modo == 'exacto':
+        return ConteoDistintoExacto.desde_pares(celdas, dispositivos)
+    if modo == 'hll':
+        return ConteoDistintoHLL.desde_pares(celdas, dispositivos, precision)
+    raise ValueError(f"Modo de conteo desconocido: {modo}")
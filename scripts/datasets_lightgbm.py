@@ -0,0 +1,58 @@
+# datasets_lightgbm.py
+
+import hashlib
+import json
+import os
+import numpy as np
+import lightgbm as lgb
+
+# Parámetros que fijan el binning del Dataset; los ensayos no pueden cambiarlos.
+# feature_pre_filter=False permite variar min_child_samples entre ensayos.
+PARAMETROS_BINNING = {'max_bin': 255, 'min_data_in_bin': 3, 'bin_construct_sample_cnt': 200000,
+                      'feature_pre_filter': False, 'verbosity': -1}
+
+
+def huella_arreglos(arreglos, **configuracion):
+    """Hash sha1 de arreglos numéricos (forma y contenido) y de una configuración JSON."""
+    h = hashlib.sha1(json.dumps(configuracion, sort_keys=True, default=str).encode())
+    for arreglo in arreglos:
+        arreglo = np.ascontiguousarray(np.asarray(arreglo, dtype=np.float64))
+        h.update(str(arreglo.shape).encode())
+        h.update(arreglo.tobytes())
+    return h.hexdigest()
+
+
+def _nombres(X):
+    return list(X.columns) if hasattr(X, 'columns') else 'auto'
+
+
+def datasets_en_cache(X_train, y_train, X_valid, y_valid, directorio, parametros_binning=None):
+    """
+    Rutas de los Datasets binarios (entrenamiento, validación) ya discretizados,
+    identificados por un hash de los datos y del binning. Solo se construyen si
+    no existen; la validación comparte los límites de bins del entrenamiento.
+    """
+    parametros = {**PARAMETROS_BINNING, **(parametros_binning or {})}
+    clave = huella_arreglos([X_train, y_train, X_valid, y_valid], binning=parametros,
+                            columnas=_nombres(X_train))[:16]
+    ruta_train = os.path.join(directorio, f"train-{clave}.bin")
+    ruta_valid = os.path.join(directorio, f"valid-{clave}.bin")
+    if os.path.exists(ruta_train) and os.path.exists(ruta_valid):
+        return ruta_train, ruta_valid
+
+    os.makedirs(directorio, exist_ok=True)
+    entrenamiento = lgb.Dataset(X_train, y_train, params=parametros, feature_name=_nombres(X_train)).construct()
+    validacion = lgb.Dataset(X_valid, y_valid, reference=entrenamiento, params=parametros).construct()
+    # Escribir en temporales y renombrar, para no dejar binarios a medias
+    for dataset, ruta in ((entrenamiento, ruta_train), (validacion, ruta_valid)):
+        dataset.save_binary(ruta + '.tmp')
+        os.replace(ruta + '.tmp', ruta)
+    return ruta_train, ruta_valid
+
+
+def cargar_datasets(ruta_train, ruta_valid, parametros_binning=None):
+    """Carga los Datasets binarios listos para lgb.train, sin volver a discretizar."""
+    parametros = {**PARAMETROS_BINNING, **(parametros_binning or {})}
+    entrenamiento = lgb.Dataset(ruta_train, params=parametros).construct()
+    validacion = lgb.Dataset(ruta_valid, reference=entrenamiento, params=parametros).construct()
+    return entrenamiento, validacion
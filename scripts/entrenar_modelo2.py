@@ -1,19 +1,22 @@
 # entrenar_modelo2.py
 
 import pandas as pd
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import ParameterGrid
 import numpy as np
 import lightgbm as lgb
-from tqdm import tqdm
+from busqueda_hiperparametros import BusquedaASHA
+from artefacto_modelo import ArtefactoModelo
+from validacion_cruzada import pliegues_espaciales, particiones_pliegues, predicciones_fuera_de_pliegue
 import warnings
 
 # Suprimir warnings globales
 warnings.filterwarnings("ignore")
 
-def entrenar_y_optimizar_lightgbm_tqdm(ruta_train):
+def entrenar_y_optimizar_lightgbm_tqdm(ruta_train, n_configuraciones=200, n_procesos=None,
+                                       ruta_registro='./data/ensayos_lightgbm.jsonl',
+                                       directorio_cache='./data/cache_lightgbm', n_pliegues=5,
+                                       ruta_oof='./data/oof_lightgbm.csv', ruta_artefacto='./data/modelo_lightgbm'):
     print("Cargando datos...")
     train_data = pd.read_csv(ruta_train)
 
@@ -33,18 +36,9 @@ def entrenar_y_optimizar_lightgbm_tqdm(ruta_train):
     print("Diagnóstico: valores NaN después de la normalización:")
     print(X.isnull().sum())
 
-    print("Dividiendo datos en entrenamiento y validación (60% validación)...")
-    X_train, X_valid, y_train, y_valid = train_test_split(X, y, test_size=0.6, random_state=42)
-
-    print("Inicializando modelo LightGBM...")
-    model = lgb.LGBMRegressor(
-        boosting_type='gbdt', 
-        objective='regression', 
-        random_state=42, 
-        n_jobs=-1, 
-        min_split_gain=0.01, 
-        verbosity=-1  # Silenciar los warnings
-    )
+    print(f"Generando {n_pliegues} pliegues agrupados por celda padre H3...")
+    pliegues = pliegues_espaciales(train_data['hex_id'], n_pliegues)
+    particiones = particiones_pliegues(X, y, pliegues)
 
     param_dist = {
         'num_leaves': [15, 31, 50, 75],           
@@ -57,33 +51,29 @@ def entrenar_y_optimizar_lightgbm_tqdm(ruta_train):
         'reg_lambda': [0.01, 0.05, 0.1, 0.2]      
     }
 
-    param_grid = list(ParameterGrid(param_dist))[:30000]  # Limitar a 30000 combinaciones
-    print(f"Total de combinaciones: {len(param_grid)}")
-
-    best_score = float("inf")
-    best_params = None
-
+    # Muestreo cuasi aleatorio de configuraciones con terminación temprana (ASHA):
+    # n_estimators pasa a ser el presupuesto de cada peldaño, hasta su máximo
     print("Optimizando hiperparámetros...")
-    for params in tqdm(param_grid, desc="Evaluando combinaciones", total=len(param_grid)):
-        model.set_params(**params)
-        model.fit(
-            X_train, y_train,
-            eval_set=[(X_valid, y_valid)],
-            eval_metric='rmse',
-            callbacks=[lgb.early_stopping(stopping_rounds=50, verbose=False)]  # Silenciar logs por iteración
-        )
-
-        y_pred = model.predict(X_valid)
-        rmse = np.sqrt(mean_squared_error(y_valid, y_pred))
-
-        if rmse < best_score:
-            best_score = rmse
-            best_params = params
+    busqueda = BusquedaASHA(param_dist, n_configuraciones=n_configuraciones,
+                            presupuesto_max=max(param_dist['n_estimators']), n_procesos=n_procesos,
+                            ruta_registro=ruta_registro, directorio_cache=directorio_cache)
+    parametros_fijos = {'min_split_gain': 0.01, 'random_state': 42}
+    best_params, best_score = busqueda.ejecutar_particiones(particiones, parametros_fijos)
+    print(f"Ensayos completados: {len(busqueda.resultados)}")
 
     print("\nMejores hiperparámetros:", best_params)
-    print(f"Mejor RMSE en validación: {best_score:.6f}")
+    print(f"Mejor RMSE promedio en validación cruzada: {best_score:.6f}")
+
+    # Predicciones fuera de pliegue con el número de rondas elegido, para stacking
+    print("Calculando predicciones fuera de pliegue...")
+    oof, rmse_pliegues = predicciones_fuera_de_pliegue(X, y, pliegues, {**parametros_fijos, **best_params},
+                                                       best_params['n_estimators'], n_procesos=n_procesos,
+                                                       directorio_cache=directorio_cache)
+    rmse = np.sqrt(mean_squared_error(y, oof))
+    pd.DataFrame({'hex_id': train_data['hex_id'], 'pliegue': pliegues, 'cost_of_living': y,
+                  'prediccion_oof': oof}).to_csv(ruta_oof, index=False)
 
-    print("Entrenando modelo final con los mejores parámetros...")
+    print("Entrenando modelo final con los mejores parámetros sobre todo el entrenamiento...")
 
     best_model = lgb.LGBMRegressor(
         **best_params,
@@ -93,28 +83,29 @@ def entrenar_y_optimizar_lightgbm_tqdm(ruta_train):
         verbosity=-1
     )
     
-    best_model.fit(
-        X_train, y_train,
-        eval_set=[(X_valid, y_valid)],
-        eval_metric='rmse',
-        callbacks=[lgb.early_stopping(stopping_rounds=100, verbose=False)]  # Más paciencia
-    )
+    # Sin conjunto de validación: n_estimators ya es la mejor iteración de la validación cruzada
+    best_model.fit(X, y)
 
     print("Guardando metricas y características...")
-    y_pred = best_model.predict(X_valid)
-    rmse = np.sqrt(mean_squared_error(y_valid, y_pred))
-
     with open('./data/metrics_lightgbm_tqdm.txt', 'w') as f:
         f.write(f"Mejores Hiperparámetros: {best_params}\n")
         f.write(f"Mejor RMSE promedio en validación cruzada: {best_score:.6f}\n")
-        f.write(f"RMSE en conjunto de validación: {rmse:.6f}\n")
+        f.write(f"RMSE por pliegue: {', '.join(f'{r:.6f}' for r in rmse_pliegues)}\n")
+        f.write(f"RMSE fuera de pliegue: {rmse:.6f}\n")
 
     importances = best_model.feature_importances_
     feature_names = X.columns
     importancia_df = pd.DataFrame({'feature': feature_names, 'importance': importances}).sort_values(by='importance', ascending=False)
     importancia_df.to_csv('./data/feature_importance_lightgbm_tqdm.csv', index=False)
 
-    return best_model
+    # Artefacto de inferencia: booster, scaler, orden de columnas y huella de los datos
+    print(f"Guardando artefacto del modelo en {ruta_artefacto}...")
+    artefacto = ArtefactoModelo.desde_entrenamiento(
+        best_model, X, scaler, features_to_normalize,
+        metadatos={'parametros': best_params, 'rmse_cv': best_score, 'rmse_oof': rmse})
+    artefacto.guardar(ruta_artefacto)
+
+    return artefacto
 
 
 if __name__ == "__main__":
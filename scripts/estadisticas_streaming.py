@@ -0,0 +1,123 @@
+# estadisticas_streaming.py
+
+import numpy as np
+
+
+def momentos_desde_valores(grupos, valores, n_grupos):
+    """Cuenta, media y M2 (suma de desvíos al cuadrado) por grupo en dos pasadas."""
+    valores = np.asarray(valores, dtype=np.float64)
+    conteo = np.bincount(grupos, minlength=n_grupos).astype(np.int64)
+    suma = np.bincount(grupos, weights=valores, minlength=n_grupos)
+    media = np.divide(suma, conteo, out=np.zeros(n_grupos), where=conteo > 0)
+    m2 = np.bincount(grupos, weights=(valores - media[grupos]) ** 2, minlength=n_grupos)
+    return conteo, media, m2
+
+
+def combinar_momentos(grupos, conteos, medias, m2s, n_grupos):
+    """
+    Combina momentos parciales (n, media, M2) por grupo con la fórmula de
+    Chan et al.; el resultado coincide con calcularlos en una sola pasada.
+    """
+    conteos = np.asarray(conteos, dtype=np.float64)
+    conteo = np.bincount(grupos, weights=conteos, minlength=n_grupos)
+    suma = np.bincount(grupos, weights=conteos * medias, minlength=n_grupos)
+    media = np.divide(suma, conteo, out=np.zeros(n_grupos), where=conteo > 0)
+    m2 = np.bincount(grupos, weights=m2s + conteos * (medias - media[grupos]) ** 2, minlength=n_grupos)
+    return conteo.astype(np.int64), media, m2
+
+
+def varianza_muestral(conteo, m2):
+    """Varianza con ddof=1 (como pandas); NaN con menos de dos valores."""
+    return np.divide(m2, conteo - 1, out=np.full(len(conteo), np.nan), where=conteo > 1)
+
+
+class FronterasDispositivos:
+    """
+    Primer y último punto (timestamp, celda) de cada dispositivo en cada bloque
+    procesado. Al cerrar, los segmentos de un mismo dispositivo se ordenan en el
+    tiempo y se recuperan las permanencias que cruzan fronteras entre bloques,
+    sin importar el tamaño ni el orden en que se procesaron los bloques.
+
+    Es exacto solo si cada bloque cubre un tramo de tiempo contiguo de cada
+    dispositivo, es decir, si los segmentos de un dispositivo no se solapan (p.
+    ej. archivo ordenado por tiempo, o dataset de particionar_mobility). Con
+    segmentos solapados `cerrar` lanza ValueError en lugar de unir estadías
+    que en realidad fueron interrumpidas por puntos de otro bloque.
+    """
+
+    def __init__(self, dispositivos=None, t_inicio=None, celda_inicio=None, t_fin=None, celda_fin=None):
+        self.dispositivos = np.empty(0, dtype=np.uint64) if dispositivos is None else dispositivos
+        self.t_inicio = np.empty(0) if t_inicio is None else t_inicio
+        self.celda_inicio = np.empty(0, dtype=np.uint64) if celda_inicio is None else celda_inicio
+        self.t_fin = np.empty(0) if t_fin is None else t_fin
+        self.celda_fin = np.empty(0, dtype=np.uint64) if celda_fin is None else celda_fin
+
+    def __len__(self):
+        return len(self.dispositivos)
+
+    @classmethod
+    def desde_ordenados(cls, dispositivos, tiempos, celdas, tiempos_fin=None):
+        """
+        Extrae los extremos de cada dispositivo de puntos (o intervalos, con
+        `tiempos_fin` como salida de cada uno) ordenados por (dispositivo, tiempo).
+        """
+        if len(dispositivos) == 0:
+            return cls()
+        tiempos_fin = tiempos if tiempos_fin is None else tiempos_fin
+        cambio = np.flatnonzero(dispositivos[1:] != dispositivos[:-1]) + 1
+        primeros = np.concatenate(([0], cambio))
+        ultimos = np.concatenate((cambio - 1, [len(dispositivos) - 1]))
+        return cls(dispositivos[primeros], tiempos[primeros], celdas[primeros],
+                   tiempos_fin[ultimos], celdas[ultimos])
+
+    @classmethod
+    def combinar_todos(cls, fronteras):
+        fronteras = [f for f in fronteras if len(f)]
+        if len(fronteras) == 1:
+            return fronteras[0]
+        if not fronteras:
+            return cls()
+        return cls(*(np.concatenate([getattr(f, atributo) for f in fronteras])
+                     for atributo in ('dispositivos', 't_inicio', 'celda_inicio', 't_fin', 'celda_fin')))
+
+    def a_arreglos(self):
+        return {'dispositivos': self.dispositivos, 't_inicio': self.t_inicio, 'celda_inicio': self.celda_inicio,
+                't_fin': self.t_fin, 'celda_fin': self.celda_fin}
+
+    @classmethod
+    def desde_arreglos(cls, arreglos):
+        return cls(arreglos['dispositivos'], arreglos['t_inicio'], arreglos['celda_inicio'],
+                   arreglos['t_fin'], arreglos['celda_fin'])
+
+    def cerrar(self):
+        """
+        Devuelve las permanencias entre bloques consecutivos (celdas, diferencias)
+        y compacta el estado a un único segmento por dispositivo.
+        """
+        if len(self) == 0:
+            return np.empty(0, dtype=np.uint64), np.empty(0)
+        orden = np.lexsort((self.t_inicio, self.dispositivos))
+        disp = self.dispositivos[orden]
+        t_ini, c_ini = self.t_inicio[orden], self.celda_inicio[orden]
+        t_fin, c_fin = self.t_fin[orden], self.celda_fin[orden]
+
+        # Un segmento que empieza antes de que termine el anterior del mismo dispositivo
+        # intercala puntos de dos bloques: sus fronteras no describen la trayectoria
+        solapados = (disp[1:] == disp[:-1]) & (t_ini[1:] < t_fin[:-1])
+        if solapados.any():
+            raise ValueError(f"{np.unique(disp[1:][solapados]).size} dispositivos tienen bloques solapados en el "
+                             "tiempo; ordenar el archivo por timestamp o usar el dataset de particionar_mobility")
+
+        # Transición del último punto de un segmento al primero del siguiente
+        mismo = (disp[1:] == disp[:-1]) & (c_fin[:-1] == c_ini[1:])
+        celdas = c_ini[1:][mismo]
+        diferencias = (t_ini[1:] - t_fin[:-1])[mismo]
+
+        # Compactar: un segmento por dispositivo, del primer al último punto
+        cambio = np.flatnonzero(disp[1:] != disp[:-1]) + 1
+        primeros = np.concatenate(([0], cambio))
+        ultimos = np.concatenate((cambio - 1, [len(disp) - 1]))
+        self.dispositivos = disp[primeros]
+        self.t_inicio, self.celda_inicio = t_ini[primeros], c_ini[primeros]
+        self.t_fin, self.celda_fin = t_fin[ultimos], c_fin[ultimos]
+        return celdas, diferencias
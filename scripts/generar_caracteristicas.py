@@ -1,27 +1,29 @@
 # generar_caracteristicas.py
 
-import pandas as pd
-import h3
+import numpy as np
+from indexado_h3 import latlng_a_celdas
+from agregacion_hex import AlmacenAgregados
 
 def generar_caracteristicas_mobility(mobility_data):
-    # Convertir coordenadas de latitud y longitud a índice H3
-    mobility_data['h3_index'] = mobility_data.apply(
-        lambda row: h3.latlng_to_cell(row['lat'], row['lon'], resolution=9), axis=1
+    # Convertir coordenadas de latitud y longitud a índice H3 (o usar la celda
+    # precalculada si los datos vienen del dataset particionado)
+    anteriores = None
+    if 'celda' in mobility_data:
+        celdas = mobility_data['celda'].to_numpy(dtype=np.uint64)
+        if 'celda_anterior' in mobility_data:
+            # El punto anterior de cada dispositivo ya está enlazado: no hace falta ordenar
+            anteriores = mobility_data['celda_anterior'].to_numpy(dtype=np.uint64)
+    else:
+        celdas = latlng_a_celdas(mobility_data['lat'].to_numpy(), mobility_data['lon'].to_numpy(), 9)
+
+    # Sesionizar en intervalos de permanencia (dispositivo, celda, entrada, salida) y
+    # derivar de ellos densidad, tiempo de permanencia, visitas y proporción nocturna
+    almacen = AlmacenAgregados.desde_bloque(
+        celdas, mobility_data['device_id'].to_numpy(), mobility_data['timestamp'].to_numpy(),
+        celdas_anteriores=anteriores,
+        timestamps_anteriores=mobility_data['timestamp_anterior'].to_numpy() if anteriores is not None else None,
     )
-
-    # Calcular densidad de movilidad: cantidad de dispositivos únicos por hexágono
-    mobility_density = mobility_data.groupby('h3_index')['device_id'].nunique().reset_index()
-    mobility_density.columns = ['hex_id', 'mobility_density']
-
-    # Calcular tiempo de permanencia promedio en cada hexágono
-    mobility_data = mobility_data.sort_values(by=['device_id', 'timestamp'])
-    mobility_data['time_diff'] = mobility_data.groupby('device_id')['timestamp'].diff()
-    mobility_data['same_hex'] = mobility_data['h3_index'] == mobility_data.groupby('device_id')['h3_index'].shift()
-    mobility_time_in_hex = mobility_data[mobility_data['same_hex']].groupby('h3_index')['time_diff'].mean().reset_index()
-    mobility_time_in_hex.columns = ['hex_id', 'avg_time_in_hex']
-
-    # Unir las características derivadas en un solo DataFrame
-    features = pd.merge(mobility_density, mobility_time_in_hex, on='hex_id', how='outer')
+    features = almacen.a_dataframe()
     print("Características generadas de mobility_data:\n", features.head())
 
     return features
@@ -32,4 +34,3 @@ if __name__ == "__main__":
     _, _, mobility_data = cargar_datos()
     
     features = generar_caracteristicas_mobility(mobility_data)
-
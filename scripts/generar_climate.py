@@ -2,6 +2,8 @@
 
 import pandas as pd
 import numpy as np
+from almacen_caracteristicas import AlmacenCaracteristicas
+from lector_mobility import cargar_config
 
 def generar_climate_data(ruta_features, ruta_climate_output):
     # Cargar características de movilidad
@@ -24,4 +26,8 @@ if __name__ == "__main__":
     ruta_features = './data/features_mobility.csv'
     ruta_climate_output = './data/climate_data.csv'
     generar_climate_data(ruta_features, ruta_climate_output)
+    # Registrar la versión `climate` en el almacén, que integrar_caracteristicas une con `mobility`
+    almacen = AlmacenCaracteristicas(cargar_config()['data']['feature_store'])
+    version = almacen.importar_csv('climate', ruta_climate_output)
+    print(f"Datos climáticos guardados en el almacén (versión {version})")
 
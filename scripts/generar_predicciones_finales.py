@@ -1,29 +1,30 @@
 # generar_predicciones_finales.py
 
+import os
 import pandas as pd
+from artefacto_modelo import ArtefactoModelo, predecir_lote
 
 def generar_predicciones(ruta_test, ruta_salida, modelo):
     # Cargar el conjunto de datos de prueba enriquecido
     test_data = pd.read_csv(ruta_test)
     
-    # Separar características (X) de prueba, excluyendo 'hex_id' y 'cost_of_living'
-    X_test = test_data.drop(columns=['hex_id', 'cost_of_living'])
-    
-    # Generar predicciones
-    test_data['cost_of_living'] = modelo.predict(X_test)
+    # Generar predicciones: el artefacto selecciona las columnas en el orden de
+    # entrenamiento (sin 'hex_id' ni 'cost_of_living') y aplica el mismo escalado
+    predicciones = predecir_lote(modelo, test_data)
     
     # Guardar el archivo de salida con las predicciones
-    test_data[['hex_id', 'cost_of_living']].to_csv(ruta_salida, index=False)
+    predicciones.to_csv(ruta_salida, index=False)
     print("Predicciones finales generadas y guardadas en:", ruta_salida)
 
 if __name__ == "__main__":
-    # Importar el modelo entrenado y ajustado
-    from entrenar_modelo2 import entrenar_y_optimizar_lightgbm_tqdm
-    ruta_train = './data/train_enriched.csv'
-    mejor_modelo = entrenar_y_optimizar_lightgbm_tqdm(ruta_train)
+    # Cargar el modelo entrenado por entrenar_modelo2.py (sin volver a entrenar)
+    ruta_artefacto = './data/modelo_lightgbm'
+    if not os.path.isdir(ruta_artefacto):
+        raise SystemExit(f"No existe el artefacto {ruta_artefacto}; ejecutar primero entrenar_modelo2.py")
+    mejor_modelo = ArtefactoModelo.cargar(ruta_artefacto)
+    print(f"Modelo cargado de {ruta_artefacto} (datos de entrenamiento {mejor_modelo.huella[:12]})")
     
     # Generar predicciones para el conjunto de prueba y guardarlas en 'submission.csv'
     ruta_test = './data/test_enriched.csv'
     ruta_salida = './data/submission.csv'
     generar_predicciones(ruta_test, ruta_salida, mejor_modelo)
-
@@ -0,0 +1,102 @@
+# imputacion_geografica.py
+
+import numpy as np
+import h3.api.basic_int as h3_int
+from sklearn.neighbors import BallTree
+from indexado_h3 import str_a_celdas
+
+# Columnas que nunca se imputan ni se usan como donantes
+COLUMNAS_OBJETIVO = ['cost_of_living']
+
+
+def centroides_celdas(celdas):
+    """Centroides (lat, lon) en radianes de celdas uint64, para la métrica haversine."""
+    celdas = np.asarray(celdas, dtype=np.uint64)
+    return np.radians(np.array([h3_int.cell_to_latlng(c) for c in celdas.tolist()], dtype=np.float64).reshape(-1, 2))
+
+
+class ImputadorGeografico:
+    """
+    Imputa cada característica faltante de un hexágono con la media de sus
+    `n_vecinos` hexágonos observados más cercanos (distancia haversine entre
+    centroides, BallTree). Las columnas con el mismo patrón de faltantes comparten
+    el árbol, así que el costo es O(n log n) por patrón y no depende del espacio
+    de características. Se ajusta una sola vez y se aplica igual a train y test.
+    """
+
+    def __init__(self, n_vecinos=5, excluir=COLUMNAS_OBJETIVO):
+        self.n_vecinos = n_vecinos
+        self.excluir = list(excluir)
+        self.grupos = []
+
+    def _columnas(self, df):
+        return [c for c in df.select_dtypes(include='number').columns if c not in self.excluir]
+
+    def fit(self, df):
+        columnas = self._columnas(df)
+        return self.fit_matriz(df[columnas].to_numpy(dtype=np.float64), columnas, str_a_celdas(df['hex_id']))
+
+    def fit_matriz(self, X, columnas, celdas):
+        """Ajusta con una matriz float64 (una fila por celda uint64, una columna por nombre de `columnas`)."""
+        columnas = list(columnas)
+        observado = ~np.isnan(X)
+        puntos = centroides_celdas(celdas)
+        # Agrupar columnas por patrón de observación: un árbol por patrón
+        patrones = {}
+        for j, columna in enumerate(columnas):
+            patrones.setdefault(observado[:, j].tobytes(), []).append(j)
+        self.grupos = []
+        for indices in patrones.values():
+            donantes = observado[:, indices[0]]
+            if not donantes.any():
+                continue
+            self.grupos.append(([columnas[j] for j in indices], BallTree(puntos[donantes], metric='haversine'),
+                                X[np.ix_(donantes, indices)]))
+        return self
+
+    def imputar_matriz(self, X, columnas, celdas, filas_faltantes=None):
+        """
+        Imputa en su lugar la matriz float64 `X` (una fila por celda uint64 de
+        `celdas`, una columna por nombre de `columnas`). `filas_faltantes` es la
+        máscara de filas con algún faltante si ya se conoce (p. ej. los hexágonos
+        que no estaban en la tabla de características); si es None se calcula.
+        """
+        if filas_faltantes is None:
+            filas_faltantes = np.isnan(X).any(axis=1)
+        filas = np.flatnonzero(filas_faltantes)
+        if not len(filas):
+            return X
+        puntos = centroides_celdas(np.asarray(celdas)[filas])
+        posicion = {c: j for j, c in enumerate(columnas)}
+        for columnas_grupo, arbol, valores in self.grupos:
+            pares = [(k, posicion[c]) for k, c in enumerate(columnas_grupo) if c in posicion]
+            if not pares:
+                continue
+            faltante = np.isnan(X[np.ix_(filas, [j for _, j in pares])])
+            con_faltante = faltante.any(axis=1)
+            if not con_faltante.any():
+                continue
+            # Solo se consultan los vecinos de las filas a las que les falta alguna columna del grupo
+            _, vecinos = arbol.query(puntos[con_faltante], k=min(self.n_vecinos, len(valores)))
+            imputados = valores[vecinos].mean(axis=1)
+            filas_grupo = filas[con_faltante]
+            for i, (k, j) in enumerate(pares):
+                faltan = faltante[con_faltante, i]
+                X[filas_grupo[faltan], j] = imputados[faltan, k]
+        return X
+
+    def transform(self, df):
+        df = df.copy()
+        columnas = [c for g in self.grupos for c in g[0] if c in df]
+        X = df[columnas].to_numpy(dtype=np.float64, copy=True)
+        faltantes = np.isnan(X)
+        if not faltantes.any():
+            return df
+        self.imputar_matriz(X, columnas, str_a_celdas(df['hex_id']), faltantes.any(axis=1))
+        # Solo se reemplazan las columnas que tenían faltantes; las demás conservan su tipo
+        for j in np.flatnonzero(faltantes.any(axis=0)):
+            df[columnas[j]] = X[:, j]
+        return df
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
@@ -0,0 +1,144 @@
+# indexado_h3.py
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from h3.api import basic_int as h3_int
+
+# Disposición de bits de un índice H3 (modo celda):
+# bits 52-55 resolución, bits 45-51 celda base y 15 dígitos de 3 bits
+# (el dígito de la resolución r ocupa los bits (15 - r) * 3 a (15 - r) * 3 + 2).
+MAX_RESOLUCION = 15
+_DESPLAZAMIENTO_RES = 52
+_MASCARA_RES = np.uint64(0xF) << np.uint64(_DESPLAZAMIENTO_RES)
+_BITS_POR_DIGITO = 3
+
+
+def _mascara_digitos(resolucion):
+    """Máscara con todos los dígitos posteriores a `resolucion` en 7 (sin usar)."""
+    n_bits = (MAX_RESOLUCION - resolucion) * _BITS_POR_DIGITO
+    return np.uint64((1 << n_bits) - 1)
+
+
+def latlng_a_celdas(lat, lon, resolucion):
+    """Convierte arreglos de lat/lon a celdas H3 uint64 con una sola llamada nativa por punto."""
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if lat.shape != lon.shape:
+        raise ValueError("lat y lon deben tener la misma longitud")
+    celdas = np.fromiter(
+        (h3_int.latlng_to_cell(la, lo, resolucion) for la, lo in zip(lat.tolist(), lon.tolist())),
+        dtype=np.uint64,
+        count=lat.size,
+    )
+    return celdas
+
+
+def padres(celdas, resolucion_padre):
+    """Deriva las celdas padre con operaciones de bits sobre el índice entero."""
+    celdas = np.asarray(celdas, dtype=np.uint64)
+    resolucion_padre = int(resolucion_padre)
+    if not 0 <= resolucion_padre <= MAX_RESOLUCION:
+        raise ValueError(f"Resolución inválida: {resolucion_padre}")
+    if celdas.size:
+        resoluciones = resolucion_de(celdas)
+        if resoluciones.min() < resolucion_padre:
+            raise ValueError("La resolución del padre no puede ser mayor que la de la celda")
+    resultado = celdas & ~_MASCARA_RES
+    resultado |= np.uint64(resolucion_padre) << np.uint64(_DESPLAZAMIENTO_RES)
+    resultado |= _mascara_digitos(resolucion_padre)
+    return resultado
+
+
+def resolucion_de(celdas):
+    """Resolución de cada celda leída directamente de los bits del índice."""
+    celdas = np.asarray(celdas, dtype=np.uint64)
+    return ((celdas & _MASCARA_RES) >> np.uint64(_DESPLAZAMIENTO_RES)).astype(np.int8)
+
+
+def celdas_multiresolucion(lat, lon, resoluciones):
+    """
+    Calcula celdas para varias resoluciones en una sola pasada: se indexa una vez
+    a la resolución más fina y las demás se obtienen como padres. Igual que
+    h3.cell_to_parent, esto sigue la jerarquía lógica de H3, que no siempre
+    coincide con indexar el punto directamente a la resolución gruesa.
+    """
+    resoluciones = sorted(set(int(r) for r in resoluciones), reverse=True)
+    if not resoluciones:
+        raise ValueError("Se requiere al menos una resolución")
+    mas_fina = latlng_a_celdas(lat, lon, resoluciones[0])
+    resultado = {resoluciones[0]: mas_fina}
+    for resolucion in resoluciones[1:]:
+        resultado[resolucion] = padres(mas_fina, resolucion)
+    return resultado
+
+
+def celdas_a_str(celdas):
+    """Convierte celdas uint64 a hex_id de texto (igual que h3.latlng_to_cell)."""
+    celdas = np.asarray(celdas, dtype=np.uint64)
+    # Formatear solo los valores únicos y expandir con los códigos inversos
+    unicas, inversa = np.unique(celdas, return_inverse=True)
+    textos = np.array([format(c, 'x') for c in unicas.tolist()], dtype=object)
+    return textos[inversa.reshape(-1)]
+
+
+# Valor de cada byte ASCII como dígito hexadecimal (255 si no lo es)
+_NIBBLES = np.full(256, 255, dtype=np.uint8)
+for _i, _c in enumerate(b'0123456789abcdef'):
+    _NIBBLES[_c] = _i
+    _NIBBLES[ord(chr(_c).upper())] = _i
+
+
+def _parsear_hex_ancho_fijo(hex_ids):
+    """
+    Parsea hex_id de igual largo (hasta 16 dígitos, como los índices H3) leyendo
+    directamente el buffer de texto de Arrow, sin objetos de Python. Devuelve
+    None si el atajo no aplica (nulos, largos distintos, caracteres no hexadecimales).
+    """
+    try:
+        arreglo = pa.array(hex_ids)
+    except (pa.ArrowException, TypeError, ValueError):
+        return None
+    if isinstance(arreglo, pa.ChunkedArray):
+        arreglo = arreglo.combine_chunks()
+    if not len(arreglo) or arreglo.null_count or not (pa.types.is_string(arreglo.type)
+                                                       or pa.types.is_large_string(arreglo.type)):
+        return None
+    _, offsets, datos = arreglo.buffers()
+    tipo_offset = np.int64 if pa.types.is_large_string(arreglo.type) else np.int32
+    offsets = np.frombuffer(offsets, dtype=tipo_offset)[arreglo.offset:arreglo.offset + len(arreglo) + 1]
+    ancho = int(offsets[1] - offsets[0])
+    if not 0 < ancho <= 16 or offsets[-1] - offsets[0] != ancho * len(arreglo) or \
+            (np.diff(offsets) != ancho).any():
+        return None
+    caracteres = np.frombuffer(datos, dtype=np.uint8)[offsets[0]:offsets[-1]].reshape(len(arreglo), ancho)
+    digitos = _NIBBLES[caracteres.T]
+    if (digitos == 255).any():
+        return None
+    # Método de Horner, una columna de dígitos por paso
+    valores = np.zeros(len(arreglo), dtype=np.uint64)
+    for fila in digitos:
+        valores <<= np.uint64(4)
+        valores |= fila
+    return valores
+
+
+def str_a_celdas(hex_ids):
+    """Convierte hex_id de texto a celdas uint64."""
+    valores = _parsear_hex_ancho_fijo(hex_ids)
+    if valores is not None:
+        return valores
+    codigos, unicos = pd.factorize(pd.Series(hex_ids, dtype=object), sort=False)
+    if (codigos < 0).any():
+        raise ValueError("Hay hex_id nulos")
+    valores = np.fromiter((int(h, 16) for h in unicos), dtype=np.uint64, count=len(unicos))
+    return valores[codigos]
+
+
+def indexar_dataframe(df, resolucion, resolucion_reducida=None, columna='hex_id'):
+    """Agrega la columna de hex_id (texto) a un DataFrame con columnas 'lat' y 'lon'."""
+    celdas = latlng_a_celdas(df['lat'].to_numpy(), df['lon'].to_numpy(), resolucion)
+    if resolucion_reducida:
+        celdas = padres(celdas, resolucion_reducida)
+    df[columna] = celdas_a_str(celdas)
+    return df
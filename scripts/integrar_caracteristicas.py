@@ -1,21 +1,88 @@
 # integrar_caracteristicas.py
+import os
+import sys
+import numpy as np
 import pandas as pd
-from sklearn.impute import KNNImputer
+from indexado_h3 import str_a_celdas, celdas_a_str, resolucion_de
+from agregacion_hex import COLUMNAS_FEATURES
+from vecindad_h3 import es_columna_vecindad
+from imputacion_geografica import ImputadorGeografico, COLUMNAS_OBJETIVO
+from almacen_caracteristicas import AlmacenCaracteristicas, referencia, tabla_por_celda, enriquecer_conjuntos
+from almacen_caracteristicas import unir_tablas_externo
 
-def integrar_caracteristicas(ruta_train, ruta_test, ruta_features, ruta_salida_train, ruta_salida_test):
+def integrar_caracteristicas(ruta_train, ruta_test, ruta_features, ruta_salida_train, ruta_salida_test,
+                             ruta_mobility_particionada=None, k_vecindad=0, ruta_almacen=None,
+                             conjunto_features='mobility_climatic', resoluciones=None,
+                             conjuntos_almacen=('mobility', 'climate')):
     # Cargar los datos de entrenamiento y prueba
     print("Cargando datos de entrenamiento y prueba...")
     train_data = pd.read_csv(ruta_train)
     test_data = pd.read_csv(ruta_test)
     
-    # Cargar las características de movilidad y climáticas
+    # Cargar las características de movilidad y climáticas como celdas uint64
+    # ordenadas y arreglos por columna. Con almacén se unen las últimas versiones
+    # guardadas de `conjuntos_almacen` (leídas sin copia); `ruta_features` es un
+    # respaldo explícito que se importa como versión de `conjunto_features`. Sin
+    # almacén se lee directamente el CSV
     print("Cargando características de movilidad y climáticas...")
-    features_mobility = pd.read_csv(ruta_features)
-    
-    # Unir las características con los datos de entrenamiento y prueba usando 'hex_id'
-    print("Uniendo características con datos de entrenamiento y prueba...")
-    train_data = train_data.merge(features_mobility, on='hex_id', how='left')
-    test_data = test_data.merge(features_mobility, on='hex_id', how='left')
+    almacen = AlmacenCaracteristicas(ruta_almacen) if ruta_almacen is not None else None
+    if almacen is not None:
+        nombres = list(conjuntos_almacen)
+        if ruta_features is not None:
+            almacen.importar_csv(conjunto_features, ruta_features)
+            nombres = [conjunto_features]
+        celdas_features, columnas_features, origen = np.empty(0, dtype=np.uint64), {}, []
+        for nombre in nombres:
+            version = almacen.version(nombre)['version']
+            celdas_features, columnas_features = unir_tablas_externo(celdas_features, columnas_features,
+                                                                     *almacen.columnas(nombre, version=version))
+            origen.append(referencia(nombre, version))
+    else:
+        celdas_features, columnas_features = tabla_por_celda(pd.read_csv(ruta_features))
+        origen = []
+
+    if ruta_mobility_particionada is not None:
+        # Recalcular la movilidad leyendo solo las particiones que cubren los hexágonos
+        # de entrenamiento y prueba, con la celda precalculada del dataset. Las
+        # resoluciones (base, features) son las de config.yaml, las mismas de
+        # procesar_mobility2 y mobility_incremental
+        from procesar_mobility2 import procesar_mobility_completo
+        from lector_mobility import cargar_config, resoluciones_desde_config
+        print("Calculando características de movilidad desde el dataset particionado...")
+        resolucion_base, resolucion_features = resoluciones or resoluciones_desde_config(cargar_config())
+        hex_objetivo = pd.concat([train_data['hex_id'], test_data['hex_id']]).unique()
+        if (resolucion_de(str_a_celdas(hex_objetivo)) != resolucion_features).any():
+            raise ValueError(f"Los hexágonos de entrenamiento y prueba deben tener resolución {resolucion_features}")
+        features_recalculadas = procesar_mobility_completo(ruta_mobility_particionada, resolucion_base,
+                                                           resolucion_features, filtros={'hex_ids': hex_objetivo},
+                                                           k_vecindad=k_vecindad)
+        # Outer join por celda ordenada: las columnas de movilidad recalculadas
+        # reemplazan a las del archivo y se conservan las demás (climáticas)
+        conservadas = {c: v for c, v in columnas_features.items()
+                       if c not in COLUMNAS_FEATURES and not es_columna_vecindad(c)}
+        celdas_features, columnas_features = unir_tablas_externo(celdas_features, conservadas,
+                                                                 *tabla_por_celda(features_recalculadas))
+        origen.append(f"archivo:{os.path.abspath(ruta_mobility_particionada)}")
+
+    # Enriquecer entrenamiento y prueba en una sola llamada: búsqueda binaria de las
+    # celdas únicas de ambos en la tabla ordenada y copia a una matriz preasignada.
+    # Los hexágonos sin datos propios se imputan con sus vecinos geográficos
+    # observados (nunca con cost_of_living) y reciben el mismo valor en ambos
+    columnas_features = {c: v for c, v in columnas_features.items() if c not in COLUMNAS_OBJETIVO}
+    print("Uniendo características con datos de entrenamiento y prueba e imputando faltantes...")
+    imputador = ImputadorGeografico(n_vecinos=5, excluir=COLUMNAS_OBJETIVO)
+    imputador.fit_matriz(np.column_stack([v.astype(np.float64) for v in columnas_features.values()]),
+                         list(columnas_features), celdas_features)
+    (train_data, test_data), celdas, X, encontradas = enriquecer_conjuntos([train_data, test_data], celdas_features,
+                                                                           columnas_features, imputador)
+    print(f"{(~encontradas).sum()} de {len(celdas)} hexágonos sin características propias; imputados")
+
+    if almacen is not None:
+        version = almacen.escribir('caracteristicas_integradas',
+                                   pd.DataFrame(X, columns=list(columnas_features)).assign(
+                                       hex_id=celdas_a_str(celdas)),
+                                   origen, {'k_vecindad': k_vecindad, 'n_vecinos_imputacion': imputador.n_vecinos})
+        print(f"Características integradas guardadas en el almacén (versión {version})")
     
     # Diagnóstico de valores faltantes
     print("Valores NaN en datos de entrenamiento después de la unión:")
@@ -23,15 +90,6 @@ def integrar_caracteristicas(ruta_train, ruta_test, ruta_features, ruta_salida_t
     print("Valores NaN en datos de prueba después de la unión:")
     print(test_data.isnull().sum())
     
-    # Imputar valores faltantes con KNNImputer
-    print("Imputando valores faltantes con KNNImputer...")
-    imputer = KNNImputer(n_neighbors=5, weights="uniform")
-    
-    # Seleccionar columnas numéricas para imputar
-    cols_to_impute = train_data.select_dtypes(include=['float64', 'int64']).columns
-    train_data[cols_to_impute] = imputer.fit_transform(train_data[cols_to_impute])
-    test_data[cols_to_impute] = imputer.transform(test_data[cols_to_impute])
-    
     # Guardar los datos enriquecidos en nuevos archivos CSV
     print(f"Guardando datos enriquecidos en {ruta_salida_train} y {ruta_salida_test}...")
     train_data.to_csv(ruta_salida_train, index=False)
@@ -39,11 +97,16 @@ def integrar_caracteristicas(ruta_train, ruta_test, ruta_features, ruta_salida_t
     print("Características integradas y guardadas exitosamente.")
 
 if __name__ == "__main__":
+    # Uso: python scripts/integrar_caracteristicas.py [./data/features_mobility_climatic.csv]
+    # Sin argumentos se unen las versiones `mobility` (procesar_mobility2.py) y
+    # `climate` (generar_climate.py) del almacén; el CSV solo se importa si se pasa
     ruta_train = './data/train.csv'
     ruta_test = './data/test.csv'
-    ruta_features = './data/features_mobility_climatic.csv'
+    ruta_features = sys.argv[1] if len(sys.argv) > 1 else None
     ruta_salida_train = './data/train_enriched.csv'
     ruta_salida_test = './data/test_enriched.csv'
+    ruta_almacen = './data/almacen_caracteristicas'
     
-    integrar_caracteristicas(ruta_train, ruta_test, ruta_features, ruta_salida_train, ruta_salida_test)
+    integrar_caracteristicas(ruta_train, ruta_test, ruta_features, ruta_salida_train, ruta_salida_test,
+                             ruta_almacen=ruta_almacen)
 
@@ -0,0 +1,236 @@
+# lector_mobility.py
+
+import numpy as np
+import pandas as pd
+import h3
+import yaml
+from fastparquet import ParquetFile
+from indexado_h3 import latlng_a_celdas, padres, str_a_celdas, resolucion_de
+from agregacion_hex import a_segundos
+
+COLUMNAS_MOBILITY = ['device_id', 'lat', 'lon', 'timestamp']
+
+# ParquetFile abierto por proceso, para no releer el footer en cada bloque
+_archivos_abiertos = {}
+
+
+def cargar_config(ruta_config='./config.yaml'):
+    with open(ruta_config) as archivo:
+        return yaml.safe_load(archivo)
+
+
+def resoluciones_desde_config(config):
+    """
+    Resolución base (la más fina de la pirámide) y resolución de features_mobility.csv.
+    Todas las rutas de cálculo sesionizan en la base y suben por celdas padre, así un
+    punto cae en el mismo hexágono grueso sin importar qué script lo procesó.
+    """
+    resoluciones = config['pyramid_resolutions']
+    resolucion_features = config['features_resolution']
+    if resolucion_features not in resoluciones:
+        raise ValueError(f"features_resolution ({resolucion_features}) debe estar en pyramid_resolutions")
+    return max(resoluciones), resolucion_features
+
+
+def _abrir(ruta):
+    if ruta not in _archivos_abiertos:
+        _archivos_abiertos[ruta] = ParquetFile(ruta)
+    return _archivos_abiertos[ruta]
+
+
+def _a_epoch(valor):
+    # Límite de tiempo como segundos epoch (acepta números, fechas ISO o Timestamp)
+    if valor is None:
+        return None
+    if isinstance(valor, (int, float, np.integer, np.floating)):
+        return float(valor)
+    return pd.Timestamp(valor).timestamp()
+
+
+def _bbox_de_hexagonos(hex_ids, resolucion_base=None):
+    # Caja (lat_min, lon_min, lat_max, lon_max) que cubre los bordes de las celdas; con
+    # resolución base se usan sus hijas, que no quedan contenidas exactamente en el padre
+    celdas = hex_ids
+    if resolucion_base is not None:
+        celdas = [hija for h in hex_ids
+                  for hija in h3.cell_to_children(h, max(resolucion_base, h3.get_resolution(h)))]
+    vertices = np.array([v for h in celdas for v in h3.cell_to_boundary(h)])
+    return (vertices[:, 0].min(), vertices[:, 1].min(), vertices[:, 0].max(), vertices[:, 1].max())
+
+
+def filtros_desde_config(config):
+    """Filtros del lector (bbox, rango de tiempo, hexágonos, dtype) definidos en config.yaml."""
+    opciones = config.get('mobility_reader') or {}
+    hex_ids = opciones.get('hex_ids')
+    if isinstance(hex_ids, str):
+        # Ruta a un CSV con columna hex_id (p. ej. train.csv o test.csv)
+        hex_ids = pd.read_csv(hex_ids)['hex_id'].tolist()
+    return {
+        'bbox': opciones.get('bbox'),
+        'rango_tiempo': opciones.get('time_range'),
+        'hex_ids': hex_ids,
+        'dtype_coordenadas': opciones.get('coordinate_dtype', 'float64'),
+    }
+
+
+class LectorMobility:
+    """
+    Lector de mobility_data.parquet con filtros empujados a las estadísticas de
+    cada row group: se descartan los bloques cuyo rango de lat/lon/timestamp no
+    puede cumplir el filtro y solo se leen las columnas necesarias.
+
+    Un punto pertenece a un hexágono de `hex_ids` si su celda en `resolucion_base`
+    (por defecto, la más fina de los hexágonos pedidos) desciende de él, igual que
+    en la pirámide de agregados. El filtro descarta puntos: las métricas de
+    permanencia necesitan el punto previo de cada dispositivo, así que
+    agregar_piramide_mobility no lo usa sobre el archivo crudo.
+    """
+
+    def __init__(self, ruta_mobility, bbox=None, rango_tiempo=None, hex_ids=None, columnas=None,
+                 dtype_coordenadas='float64', resolucion_base=None):
+        self.ruta_mobility = ruta_mobility
+        self.bbox = tuple(bbox) if bbox is not None else None  # (lat_min, lon_min, lat_max, lon_max)
+        self.rango_tiempo = tuple(_a_epoch(v) for v in rango_tiempo) if rango_tiempo is not None else None
+        self.hex_ids = sorted(set(hex_ids)) if hex_ids is not None else None
+        self.columnas = list(columnas) if columnas is not None else list(COLUMNAS_MOBILITY)
+        self.dtype_coordenadas = dtype_coordenadas
+
+        self.resolucion_base = resolucion_base
+        self._celdas_filtro = None
+        self._resoluciones_filtro = []
+        self._bbox_poda = self.bbox
+        if self.hex_ids is not None:
+            self._celdas_filtro = np.sort(str_a_celdas(self.hex_ids))
+            self._resoluciones_filtro = sorted(set(resolucion_de(self._celdas_filtro).tolist()))
+            self.resolucion_base = max(self._resoluciones_filtro + [resolucion_base or 0])
+            bbox_hex = (_bbox_de_hexagonos(self.hex_ids, self.resolucion_base) if self.hex_ids
+                        else (0.0, 0.0, -1.0, -1.0))
+            if self._bbox_poda is None:
+                self._bbox_poda = bbox_hex
+            else:
+                self._bbox_poda = (max(self._bbox_poda[0], bbox_hex[0]), max(self._bbox_poda[1], bbox_hex[1]),
+                                   min(self._bbox_poda[2], bbox_hex[2]), min(self._bbox_poda[3], bbox_hex[3]))
+
+    @classmethod
+    def desde_config(cls, config, ruta_mobility=None):
+        """Crea el lector a partir de la sección `mobility_reader` de config.yaml."""
+        opciones = config.get('mobility_reader') or {}
+        resolucion_base = resoluciones_desde_config(config)[0] if 'pyramid_resolutions' in config else None
+        return cls(ruta_mobility or config['data']['mobility_file'], columnas=opciones.get('columns'),
+                   resolucion_base=resolucion_base, **filtros_desde_config(config))
+
+    @property
+    def pf(self):
+        return _abrir(self.ruta_mobility)
+
+    def _columnas_lectura(self):
+        # Los filtros pueden requerir columnas que no se piden en la salida
+        necesarias = list(self.columnas)
+        if self._bbox_poda is not None or self._celdas_filtro is not None:
+            necesarias += [c for c in ('lat', 'lon') if c not in necesarias]
+        if self.rango_tiempo is not None and 'timestamp' not in necesarias:
+            necesarias.append('timestamp')
+        return necesarias
+
+    def row_groups_candidatos(self):
+        """Índices de los row groups que pueden contener filas que cumplen los filtros."""
+        total = len(self.pf.row_groups)
+        candidatos = np.ones(total, dtype=bool)
+        estadisticas = self.pf.statistics
+
+        def _descartar(columna, minimo_filtro, maximo_filtro, convertir=float):
+            minimos = estadisticas['min'].get(columna)
+            maximos = estadisticas['max'].get(columna)
+            if minimos is None or maximos is None:
+                return
+            for i in range(total):
+                if minimos[i] is None or maximos[i] is None:
+                    continue
+                if convertir(maximos[i]) < minimo_filtro or convertir(minimos[i]) > maximo_filtro:
+                    candidatos[i] = False
+
+        if self._bbox_poda is not None:
+            lat_min, lon_min, lat_max, lon_max = self._bbox_poda
+            _descartar('lat', lat_min, lat_max)
+            _descartar('lon', lon_min, lon_max)
+        if self.rango_tiempo is not None:
+            _descartar('timestamp', self.rango_tiempo[0], self.rango_tiempo[1], convertir=_a_epoch)
+        return np.flatnonzero(candidatos).tolist()
+
+    def _filtrar(self, df):
+        mascara = np.ones(len(df), dtype=bool)
+        if self.bbox is not None:
+            lat_min, lon_min, lat_max, lon_max = self.bbox
+            mascara &= df['lat'].between(lat_min, lat_max).to_numpy()
+            mascara &= df['lon'].between(lon_min, lon_max).to_numpy()
+        if self.rango_tiempo is not None:
+            tiempos = a_segundos(df['timestamp'])
+            mascara &= (tiempos >= self.rango_tiempo[0]) & (tiempos <= self.rango_tiempo[1])
+        if self._celdas_filtro is not None:
+            # Celda en la resolución base y sus padres, como en la pirámide de agregados
+            celdas = latlng_a_celdas(df['lat'].to_numpy(), df['lon'].to_numpy(), self.resolucion_base)
+            en_filtro = np.zeros(len(df), dtype=bool)
+            validas = celdas != 0
+            for resolucion in self._resoluciones_filtro:
+                en_filtro[validas] |= np.isin(padres(celdas[validas], resolucion), self._celdas_filtro)
+            mascara &= en_filtro
+        return df[mascara] if not mascara.all() else df
+
+    def _compactar(self, df):
+        # Tipos compactos: coordenadas en el dtype configurado, timestamps epoch int64
+        # (UTC si traen zona horaria) y device_id categórico
+        for columna in ('lat', 'lon'):
+            if columna in df:
+                df[columna] = df[columna].astype(self.dtype_coordenadas)
+        if 'timestamp' in df and pd.api.types.is_datetime64_any_dtype(df['timestamp']):
+            df['timestamp'] = np.floor(a_segundos(df['timestamp'])).astype(np.int64)
+        if 'device_id' in df and not isinstance(df['device_id'].dtype, pd.CategoricalDtype):
+            df['device_id'] = df['device_id'].astype('category')
+        return df
+
+    def leer_row_group(self, indice):
+        """Lee un row group aplicando filtros de filas, proyección de columnas y tipos compactos."""
+        df = self.pf[indice].to_pandas(columns=self._columnas_lectura())
+        df = self._filtrar(df)
+        return self._compactar(df[self.columnas].reset_index(drop=True))
+
+    def iter_bloques(self, indices=None):
+        for indice in (self.row_groups_candidatos() if indices is None else indices):
+            yield self.leer_row_group(indice)
+
+    def leer(self, indices=None):
+        bloques = list(self.iter_bloques(indices))
+        if not bloques:
+            return self._compactar(pd.DataFrame({c: [] for c in self.columnas}))
+        return self._compactar(pd.concat(bloques, ignore_index=True))
+
+    def muestrear(self, n_filas, semilla=42):
+        """
+        Muestra de aproximadamente `n_filas` filas eligiendo row groups al azar,
+        sin cargar el archivo completo; luego se recorta a `n_filas` exactas.
+        """
+        rng = np.random.default_rng(semilla)
+        candidatos = self.row_groups_candidatos()
+        elegidos, acumuladas = [], 0
+        for indice in rng.permutation(candidatos).tolist():
+            elegidos.append(indice)
+            acumuladas += self.pf.row_groups[indice].num_rows
+            if acumuladas >= n_filas:
+                break
+        df = self.leer(sorted(elegidos))
+        if len(df) > n_filas:
+            df = df.sample(n_filas, random_state=semilla).reset_index(drop=True)
+        return df
+
+
+def cargar_mobility(config, ruta_mobility=None, muestra=True):
+    """
+    Datos de movilidad según config.yaml: columnas y filtros de `mobility_reader` y,
+    si hay `mobility_sample_size` (y `muestra`), una muestra por row groups con la
+    semilla `sample_seed` en lugar de leer el archivo completo.
+    """
+    lector = LectorMobility.desde_config(config, ruta_mobility)
+    n_filas = config.get('mobility_sample_size')
+    if muestra and n_filas:
+        return lector.muestrear(n_filas, (config.get('mobility_reader') or {}).get('sample_seed', 42))
+    return lector.leer()
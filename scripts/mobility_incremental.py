@@ -0,0 +1,108 @@
+# mobility_incremental.py
+
+import glob
+import json
+import os
+import sys
+from agregacion_hex import AlmacenAgregados
+from procesar_mobility2 import agregar_mobility, imputar_features
+from vecindad_h3 import suavizar_features
+from lector_mobility import cargar_config, resoluciones_desde_config
+
+ARCHIVO_ESTADO = 'almacen.npz'
+ARCHIVO_MANIFIESTO = 'manifiesto.json'
+
+
+def _huella(ruta):
+    # Identidad de una entrada: tamaño y fecha de modificación (de todos sus archivos si es un directorio)
+    archivos = sorted(glob.glob(os.path.join(ruta, '**', '*.parquet'), recursive=True)) if os.path.isdir(ruta) else [ruta]
+    return {'archivos': len(archivos),
+            'bytes': sum(os.path.getsize(a) for a in archivos),
+            'modificado': max((os.path.getmtime(a) for a in archivos), default=0)}
+
+
+def _cargar_estado(ruta_estado, parametros):
+    ruta_manifiesto = os.path.join(ruta_estado, ARCHIVO_MANIFIESTO)
+    if not os.path.exists(ruta_manifiesto):
+        return AlmacenAgregados(), {'parametros': parametros, 'entradas': {}}
+    with open(ruta_manifiesto) as archivo:
+        manifiesto = json.load(archivo)
+    if manifiesto['parametros'] != parametros:
+        raise ValueError(f"El estado en {ruta_estado} se generó con otros parámetros: {manifiesto['parametros']}")
+    return AlmacenAgregados.cargar(os.path.join(ruta_estado, ARCHIVO_ESTADO)), manifiesto
+
+
+def _guardar_estado(ruta_estado, almacen, manifiesto):
+    os.makedirs(ruta_estado, exist_ok=True)
+    # Escribir primero en temporales y luego reemplazar, para no dejar un estado a medias
+    temporal_estado = os.path.join(ruta_estado, 'almacen.tmp.npz')
+    temporal_manifiesto = os.path.join(ruta_estado, ARCHIVO_MANIFIESTO + '.tmp')
+    almacen.guardar(temporal_estado)
+    with open(temporal_manifiesto, 'w') as archivo:
+        json.dump(manifiesto, archivo, indent=2)
+    os.replace(temporal_estado, os.path.join(ruta_estado, ARCHIVO_ESTADO))
+    os.replace(temporal_manifiesto, os.path.join(ruta_estado, ARCHIVO_MANIFIESTO))
+
+
+def actualizar_features_mobility(entradas, ruta_estado, ruta_salida, resolucion_inicial=9, resolucion_reducida=8,
+                                 modo_densidad='exacto', precision_hll=12, n_procesos=1, k_vecindad=0):
+    """
+    Incorpora al estado persistido solo las entradas (archivos parquet o datasets
+    particionados) que aún no figuran en el manifiesto y reescribe las
+    características. Volver a ejecutar con las mismas entradas no cambia nada.
+
+    El estado guarda por celda los momentos de permanencia, los puntos y el conteo
+    distinto de dispositivos, y el último punto visto de cada dispositivo para unir
+    permanencias entre días consecutivos. Se asume que las entradas nuevas son
+    posteriores en el tiempo a las ya incorporadas. Con `k_vecindad` > 0 se agregan
+    los anillos vecinos como en procesar_mobility2, para que la tabla tenga el mismo
+    esquema que la del cálculo completo.
+    """
+    parametros = {'resolucion_inicial': resolucion_inicial, 'resolucion_reducida': resolucion_reducida,
+                  'modo_densidad': modo_densidad, 'precision_hll': precision_hll}
+    almacen, manifiesto = _cargar_estado(ruta_estado, parametros)
+
+    nuevas = []
+    for ruta in sorted(entradas):
+        clave = os.path.abspath(ruta)
+        huella = _huella(ruta)
+        if clave in manifiesto['entradas']:
+            if manifiesto['entradas'][clave] != huella:
+                raise ValueError(f"La entrada {ruta} cambió después de incorporarse; reconstruya el estado")
+            continue
+        nuevas.append((ruta, clave, huella))
+
+    # El suavizado solo cambia la salida, no el estado: si cambió, se reescribe la tabla
+    if not nuevas and os.path.exists(ruta_salida) and manifiesto.get('k_vecindad', 0) == k_vecindad:
+        print("No hay entradas nuevas; las características están al día.")
+        return None
+
+    for ruta, clave, huella in nuevas:
+        print(f"Incorporando {ruta}...")
+        almacen = agregar_mobility(ruta, resolucion_inicial, resolucion_reducida, modo_densidad=modo_densidad,
+                                   precision_hll=precision_hll, n_procesos=n_procesos, almacen=almacen)
+        manifiesto['entradas'][clave] = huella
+
+    # a_dataframe cierra las fronteras: suma las permanencias entre entradas y deja
+    # solo el último punto de cada dispositivo en el estado
+    df_features = imputar_features(suavizar_features(almacen.a_dataframe(), k_vecindad))
+    manifiesto['k_vecindad'] = k_vecindad
+    _guardar_estado(ruta_estado, almacen, manifiesto)
+
+    if ruta_salida.endswith('.parquet'):
+        df_features.to_parquet(ruta_salida, index=False)
+    else:
+        df_features.to_csv(ruta_salida, index=False)
+    print(f"{len(nuevas)} entradas nuevas incorporadas; características guardadas en {ruta_salida}")
+    return df_features
+
+
+if __name__ == "__main__":
+    # Uso: python scripts/mobility_incremental.py ./data/mobility/*.parquet
+    config = cargar_config()
+    entradas = sys.argv[1:] or [config['data']['mobility_file']]
+    # Mismas resoluciones que procesar_mobility2, que también escribe features_mobility.csv
+    resolucion_base, resolucion_features = resoluciones_desde_config(config)
+    actualizar_features_mobility(entradas, config['data']['mobility_state'], './data/features_mobility.csv',
+                                 resolucion_inicial=resolucion_base, resolucion_reducida=resolucion_features,
+                                 n_procesos=os.cpu_count() or 1, k_vecindad=config.get('neighborhood_k', 0))
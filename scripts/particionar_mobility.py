@@ -0,0 +1,143 @@
+# particionar_mobility.py
+
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from fastparquet import ParquetFile, write
+from tqdm import tqdm
+from indexado_h3 import latlng_a_celdas, padres, celdas_a_str, str_a_celdas, resolucion_de
+from lector_mobility import LectorMobility, cargar_config, filtros_desde_config, resoluciones_desde_config
+
+ARCHIVO_MANIFIESTO = 'particiones.json'
+PREFIJO_PARTICION = 'parent='
+
+
+def _directorio_particion(ruta_dataset, hex_padre):
+    return os.path.join(ruta_dataset, f"{PREFIJO_PARTICION}{hex_padre}")
+
+
+def _escribir_piezas(df, claves, ruta_base, nombre):
+    # Escribe una pieza temporal por cada valor de `claves`
+    for clave, grupo in df.groupby(claves, sort=False):
+        directorio = os.path.join(ruta_base, str(clave))
+        os.makedirs(directorio, exist_ok=True)
+        write(os.path.join(directorio, nombre), grupo.reset_index(drop=True))
+
+
+def _leer_piezas(directorio):
+    piezas = [ParquetFile(os.path.join(directorio, f)).to_pandas() for f in sorted(os.listdir(directorio))]
+    return pd.concat(piezas, ignore_index=True).sort_values(by=['device_id', 'timestamp'], kind='stable')
+
+
+def particionar_mobility(ruta_mobility, ruta_dataset, resolucion=9, resolucion_particion=5, filtros=None, n_cubetas=16):
+    """
+    Reescribe mobility_data.parquet como un dataset particionado por celda padre
+    H3 (`resolucion_particion`), ordenado por (device_id, timestamp) dentro de
+    cada partición y con la celda a `resolucion` precalculada en la columna 'celda'.
+
+    Como la trayectoria de un dispositivo queda repartida entre particiones, cada
+    punto guarda además la celda y el timestamp del punto anterior del mismo
+    dispositivo ('celda_anterior' = 0 si no hay), de modo que las permanencias se
+    calculan de forma exacta leyendo solo un subconjunto de particiones.
+    """
+    if resolucion_particion > resolucion:
+        raise ValueError("La resolución de partición debe ser menor o igual a la de las celdas")
+    lector = LectorMobility(ruta_mobility, columnas=['device_id', 'lat', 'lon', 'timestamp'], **(filtros or {}))
+    ruta_cubetas = os.path.join(ruta_dataset, '_cubetas')
+    ruta_piezas = os.path.join(ruta_dataset, '_piezas')
+    if os.path.exists(ruta_dataset):
+        shutil.rmtree(ruta_dataset)
+    os.makedirs(ruta_cubetas)
+
+    # Fase 1: indexar cada row group y repartirlo en cubetas por hash de dispositivo
+    for indice in tqdm(lector.row_groups_candidatos(), desc="Particionando bloques"):
+        chunk = lector.leer_row_group(indice)
+        chunk['device_id'] = chunk['device_id'].astype(str)
+        chunk['celda'] = latlng_a_celdas(chunk['lat'].to_numpy(), chunk['lon'].to_numpy(), resolucion)
+        cubeta = pd.util.hash_array(chunk['device_id'].to_numpy(dtype=object)) % np.uint64(n_cubetas)
+        _escribir_piezas(chunk, cubeta, ruta_cubetas, f"rg-{indice:06d}.parquet")
+
+    # Fase 2: cada cubeta contiene dispositivos completos; se ordena y se enlaza cada
+    # punto con el anterior de su dispositivo antes de repartir por partición espacial
+    for cubeta in tqdm(sorted(os.listdir(ruta_cubetas)), desc="Ordenando dispositivos"):
+        df = _leer_piezas(os.path.join(ruta_cubetas, cubeta))
+        dispositivos = df['device_id'].to_numpy(dtype=object)
+        mismo = np.zeros(len(df), dtype=bool)
+        mismo[1:] = dispositivos[1:] == dispositivos[:-1]
+        celdas = df['celda'].to_numpy(dtype=np.uint64)
+        tiempos = df['timestamp'].to_numpy()
+        df['celda_anterior'] = np.where(mismo, np.roll(celdas, 1), np.uint64(0)).astype(np.uint64)
+        df['timestamp_anterior'] = np.where(mismo, np.roll(tiempos, 1), tiempos)
+        particion = celdas_a_str(padres(celdas, resolucion_particion))
+        _escribir_piezas(df, particion, ruta_piezas, f"b-{int(cubeta):04d}.parquet")
+    shutil.rmtree(ruta_cubetas)
+
+    # Fase 3: cada partición se ordena por (device_id, timestamp) y se escribe una sola vez
+    particiones = {}
+    for hex_padre in tqdm(sorted(os.listdir(ruta_piezas)) if os.path.exists(ruta_piezas) else [],
+                          desc="Ordenando particiones"):
+        df = _leer_piezas(os.path.join(ruta_piezas, hex_padre))
+        destino = _directorio_particion(ruta_dataset, hex_padre)
+        os.makedirs(destino)
+        write(os.path.join(destino, 'part-0.parquet'), df.reset_index(drop=True))
+        particiones[hex_padre] = len(df)
+    shutil.rmtree(ruta_piezas, ignore_errors=True)
+
+    with open(os.path.join(ruta_dataset, ARCHIVO_MANIFIESTO), 'w') as archivo:
+        json.dump({'resolucion': resolucion, 'resolucion_particion': resolucion_particion,
+                   'particiones': particiones}, archivo, indent=2)
+    return particiones
+
+
+def es_dataset_particionado(ruta):
+    return os.path.isfile(os.path.join(ruta, ARCHIVO_MANIFIESTO))
+
+
+def cargar_manifiesto(ruta_dataset):
+    with open(os.path.join(ruta_dataset, ARCHIVO_MANIFIESTO)) as archivo:
+        return json.load(archivo)
+
+
+def particiones_para_hexagonos(ruta_dataset, hex_ids=None):
+    """Rutas de las particiones que cubren `hex_ids` (todas si es None)."""
+    manifiesto = cargar_manifiesto(ruta_dataset)
+    existentes = manifiesto['particiones']
+    if hex_ids is None:
+        seleccion = sorted(existentes)
+    else:
+        celdas = str_a_celdas(list(hex_ids))
+        if len(celdas) and resolucion_de(celdas).min() < manifiesto['resolucion_particion']:
+            raise ValueError("Hay hexágonos más gruesos que la resolución de partición del dataset")
+        necesarias = set(celdas_a_str(padres(celdas, manifiesto['resolucion_particion'])))
+        seleccion = sorted(h for h in necesarias if h in existentes)
+    return [os.path.join(_directorio_particion(ruta_dataset, h), 'part-0.parquet') for h in seleccion]
+
+
+def leer_particion(ruta_particion, columnas=None):
+    df = ParquetFile(ruta_particion).to_pandas(columns=columnas)
+    for columna in ('celda', 'celda_anterior'):
+        if columna in df:
+            df[columna] = df[columna].astype(np.uint64)
+    return df
+
+
+def leer_particiones(ruta_dataset, hex_ids=None, columnas=None):
+    """Lee en un solo DataFrame las particiones que cubren `hex_ids`."""
+    rutas = particiones_para_hexagonos(ruta_dataset, hex_ids)
+    if not rutas:
+        return pd.DataFrame(columns=columnas or ['device_id', 'lat', 'lon', 'timestamp', 'celda',
+                                                 'celda_anterior', 'timestamp_anterior'])
+    return pd.concat([leer_particion(r, columnas) for r in rutas], ignore_index=True)
+
+
+if __name__ == "__main__":
+    config = cargar_config()
+    ruta_mobility = config['data']['mobility_file']
+    ruta_dataset = config['data']['mobility_partitioned']
+    resolucion_base, _ = resoluciones_desde_config(config)
+    particiones = particionar_mobility(ruta_mobility, ruta_dataset, resolucion=resolucion_base,
+                                       resolucion_particion=config['partition_resolution'],
+                                       filtros=filtros_desde_config(config))
+    print(f"Dataset particionado en {ruta_dataset}: {len(particiones)} particiones, {sum(particiones.values())} filas")
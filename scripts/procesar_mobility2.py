@@ -1,86 +1,263 @@
 # procesar_mobility2.py
 
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from sklearn.impute import KNNImputer
+import numpy as np
 import pandas as pd
-import h3
-from fastparquet import ParquetFile
-from collections import defaultdict
 from tqdm import tqdm
+from indexado_h3 import latlng_a_celdas, padres, str_a_celdas, resolucion_de
+from agregacion_hex import AlmacenAgregados, codificar_dispositivos, a_segundos
+from sesiones import IntervalosPermanencia
+from vecindad_h3 import suavizar_features
+from imputacion_geografica import ImputadorGeografico
+from almacen_caracteristicas import AlmacenCaracteristicas
+from lector_mobility import LectorMobility, cargar_config, filtros_desde_config, resoluciones_desde_config
+from particionar_mobility import es_dataset_particionado, cargar_manifiesto, particiones_para_hexagonos
 
-def procesar_mobility_completo(ruta_mobility, resolucion_inicial=9, resolucion_reducida=None):
-    # Inicializar contadores para densidad de movilidad, tiempo de permanencia, y métricas adicionales
-    densidad_mobility = defaultdict(int)
-    tiempo_permanencia = defaultdict(list)
-    tiempo_permanencia_varianza = defaultdict(list)
-    frecuencia_visitas = defaultdict(lambda: defaultdict(int))
-
-    # Usar fastparquet para procesar el archivo en bloques
-    pf = ParquetFile(ruta_mobility)
-    total_bloques = len(pf.row_groups)  # Obtener número total de bloques para la barra de progreso
-
-    # Procesar cada bloque con una barra de progreso
-    for chunk in tqdm(pf.iter_row_groups(columns=['device_id', 'lat', 'lon', 'timestamp']), total=total_bloques, desc="Procesando bloques"):
-        # Convertir coordenadas a índice H3
-        chunk['hex_id'] = chunk.apply(lambda row: h3.latlng_to_cell(row['lat'], row['lon'], resolucion_inicial), axis=1)
-
-        # Reducir resolución de hexágonos si se especifica
-        if resolucion_reducida:
-            chunk['hex_id'] = chunk['hex_id'].apply(lambda x: h3.cell_to_parent(x, resolucion_reducida))
-
-        # Calcular densidad de movilidad (dispositivos únicos por hexágono)
-        densidad_por_hex = chunk.groupby('hex_id')['device_id'].nunique()
-        for hex_id, densidad in densidad_por_hex.items():
-            densidad_mobility[hex_id] += densidad
-
-        # Calcular tiempo de permanencia en hexágonos
-        chunk = chunk.sort_values(by=['device_id', 'timestamp'])
-        chunk['time_diff'] = chunk.groupby('device_id')['timestamp'].diff()
-        chunk['same_hex'] = chunk['hex_id'] == chunk.groupby('device_id')['hex_id'].shift()
-        tiempos_por_hex = chunk[chunk['same_hex']].groupby('hex_id')['time_diff'].mean()
-        tiempos_varianza_por_hex = chunk[chunk['same_hex']].groupby('hex_id')['time_diff'].var()
-
-        for hex_id, tiempo in tiempos_por_hex.items():
-            tiempo_permanencia[hex_id].append(tiempo)
-
-        for hex_id, varianza in tiempos_varianza_por_hex.items():
-            tiempo_permanencia_varianza[hex_id].append(varianza)
-
-        # Calcular frecuencia de visitas por dispositivo
-        visitas_por_hex = chunk.groupby(['hex_id', 'device_id']).size()
-        for (hex_id, device_id), visitas in visitas_por_hex.items():
-            frecuencia_visitas[hex_id][device_id] += visitas
-
-    # Promediar el tiempo de permanencia y varianza
-    tiempo_permanencia_promedio = {hex_id: sum(tiempos) / len(tiempos) for hex_id, tiempos in tiempo_permanencia.items()}
-    tiempo_permanencia_varianza_promedio = {hex_id: sum(varianzas) / len(varianzas) for hex_id, varianzas in tiempo_permanencia_varianza.items()}
-
-    # Calcular la frecuencia media de visitas por hexágono
-    frecuencia_visitas_media = {hex_id: sum(visitas.values()) / len(visitas) for hex_id, visitas in frecuencia_visitas.items()}
-
-    # Convertir resultados a DataFrames
-    df_densidad = pd.DataFrame(list(densidad_mobility.items()), columns=['hex_id', 'mobility_density'])
-    df_tiempo = pd.DataFrame(list(tiempo_permanencia_promedio.items()), columns=['hex_id', 'avg_time_in_hex'])
-    df_varianza = pd.DataFrame(list(tiempo_permanencia_varianza_promedio.items()), columns=['hex_id', 'time_in_hex_variance'])
-    df_frecuencia = pd.DataFrame(list(frecuencia_visitas_media.items()), columns=['hex_id', 'avg_visits_per_device'])
-
-    # Unir resultados en un solo DataFrame
-    df_features = df_densidad.merge(df_tiempo, on='hex_id', how='outer')\
-                              .merge(df_varianza, on='hex_id', how='outer')\
-                              .merge(df_frecuencia, on='hex_id', how='outer')
-
-    # Imputación de valores faltantes con KNN Imputer
-    imputer = KNNImputer(n_neighbors=5)
-    df_features.iloc[:, 1:] = imputer.fit_transform(df_features.iloc[:, 1:])
 
+def _reducir(celdas, resolucion_origen, resolucion_destino):
+    # Lleva celdas uint64 a una resolución más gruesa; 0 (sin celda) se conserva
+    if resolucion_destino is None or resolucion_destino == resolucion_origen:
+        return celdas
+    validas = celdas != 0
+    resultado = celdas.copy()
+    resultado[validas] = padres(celdas[validas], resolucion_destino)
+    return resultado
+
+
+def _en_celdas_filtro(celdas, celdas_filtro):
+    # Celdas que descienden de algún hexágono pedido o, en resoluciones más gruesas
+    # que él, que lo contienen
+    celdas = np.asarray(celdas, dtype=np.uint64)
+    resoluciones = resolucion_de(celdas)
+    mascara = np.zeros(len(celdas), dtype=bool)
+    for resolucion_filtro in np.unique(resolucion_de(celdas_filtro)).tolist():
+        filtro = celdas_filtro[resolucion_de(celdas_filtro) == resolucion_filtro]
+        finas = (resoluciones >= resolucion_filtro) & (celdas != 0)
+        mascara[finas] |= np.isin(padres(celdas[finas], resolucion_filtro), filtro)
+        for resolucion in np.unique(resoluciones[~finas & (celdas != 0)]).tolist():
+            gruesas = resoluciones == resolucion
+            mascara[gruesas] |= np.isin(celdas[gruesas], padres(filtro, resolucion))
+    return mascara
+
+
+def _agregar_bloque(chunk, resolucion_base, resoluciones, modo_densidad, precision_hll, resolucion_dataset=None,
+                    celdas_filtro=None):
+    # Agregados del bloque en cada resolución de `resoluciones` (de la más fina a la
+    # más gruesa): se sesioniza una vez en la resolución base y los niveles gruesos
+    # se obtienen subiendo la tabla de intervalos por celdas padre. Con `celdas_filtro`
+    # se sesioniza el bloque completo y solo se agregan los intervalos de esas celdas;
+    # las fronteras salen de todos los intervalos para no unir estadías interrumpidas
+    anteriores = None
+    if 'celda' in chunk:
+        # Dataset particionado: la celda y la del punto anterior vienen precalculadas
+        if resolucion_base > resolucion_dataset:
+            raise ValueError(f"El dataset particionado tiene resolución {resolucion_dataset}, menor que {resolucion_base}")
+        celdas = _reducir(chunk['celda'].to_numpy(dtype=np.uint64), resolucion_dataset, resolucion_base)
+        anteriores = _reducir(chunk['celda_anterior'].to_numpy(dtype=np.uint64), resolucion_dataset, resolucion_base)
+    else:
+        # Convertir coordenadas a índice H3 en una sola pasada
+        celdas = latlng_a_celdas(chunk['lat'].to_numpy(), chunk['lon'].to_numpy(), resolucion_base)
+
+    dispositivos, cod_disp = codificar_dispositivos(chunk['device_id'].to_numpy())
+    tiempos_anteriores = chunk.get('timestamp_anterior')
+    intervalos = IntervalosPermanencia.desde_puntos(
+        cod_disp, celdas, a_segundos(chunk['timestamp']), anteriores,
+        None if tiempos_anteriores is None else a_segundos(tiempos_anteriores))
+
+    # Densidad, tiempo de permanencia y visitas por dispositivo del bloque en cada nivel
+    almacenes, resolucion_actual = [], resolucion_base
+    for resolucion in resoluciones:
+        if resolucion != resolucion_actual:
+            intervalos, resolucion_actual = intervalos.reducir(resolucion), resolucion
+        mascara = None if celdas_filtro is None else _en_celdas_filtro(intervalos.celda, celdas_filtro)
+        almacenes.append(AlmacenAgregados.desde_intervalos(intervalos, dispositivos, modo_densidad, precision_hll,
+                                                           con_fronteras=anteriores is None, mascara=mascara))
+    return almacenes
+
+
+def _filtrar_por_celdas(chunk, celdas_filtro):
+    # Filas cuya celda (o alguno de sus padres) está en el conjunto de hexágonos pedido
+    return chunk[_en_celdas_filtro(chunk['celda'].to_numpy(dtype=np.uint64), celdas_filtro)]
+
+
+def _procesar_row_group(tarea, resolucion_base, resoluciones, modo_densidad, precision_hll,
+                        resolucion_dataset=None, celdas_filtro=None):
+    # Trabajo de cada proceso: lee un row group (del archivo o de una partición) y
+    # devuelve sus agregados parciales por resolución
+    lector, indice = tarea
+    chunk = lector.leer_row_group(indice)
+    if celdas_filtro is not None and resolucion_dataset is not None:
+        # Las filas particionadas traen su punto anterior: se pueden descartar antes de sesionizar
+        chunk, celdas_filtro = _filtrar_por_celdas(chunk, celdas_filtro), None
+    return _agregar_bloque(chunk, resolucion_base, resoluciones, modo_densidad, precision_hll, resolucion_dataset,
+                           celdas_filtro)
+
+
+def agregar_piramide_mobility(ruta_mobility, resoluciones=(7, 8, 9, 10), resolucion_base=None, bloques_por_reduccion=32,
+                              modo_densidad='exacto', precision_hll=12, n_procesos=1, filtros=None, almacenes=None):
+    """
+    Agregados combinables (AlmacenAgregados) de un archivo o dataset de movilidad
+    para varias resoluciones en una sola lectura. Devuelve {resolución: almacén}.
+
+    Con `filtros['hex_ids']` solo se devuelven los hexágonos pedidos, sus
+    descendientes y sus padres, con las mismas métricas que sin filtro. Sobre el
+    dataset particionado solo se leen las particiones que los cubren; sobre el
+    archivo crudo se lee todo (salvo bbox y rango de tiempo), porque la
+    permanencia de un dispositivo depende de sus puntos fuera de los hexágonos.
+    """
+    resoluciones = sorted(set(resoluciones), reverse=True)
+    resolucion_base = resoluciones[0] if resolucion_base is None else resolucion_base
+    if resolucion_base < resoluciones[0]:
+        raise ValueError("La resolución base debe ser al menos la más fina de la pirámide")
+    # Agregados parciales por bloque; se reducen en lotes para acotar la memoria
+    almacenes = dict(almacenes or {})
+    almacenes = [almacenes.get(r, AlmacenAgregados()) for r in resoluciones]
+    parciales = []
+    filtros = dict(filtros or {})
+
+    resolucion_dataset = None
+    celdas_filtro = None
+    hex_ids = filtros.pop('hex_ids', None)
+    if hex_ids is not None:
+        celdas_filtro = np.sort(str_a_celdas(list(hex_ids)))
+    if es_dataset_particionado(ruta_mobility):
+        # Dataset particionado por celda padre: solo se leen las particiones que cubren
+        # los hexágonos pedidos y se usa la celda precalculada en lugar de lat/lon
+        resolucion_dataset = cargar_manifiesto(ruta_mobility)['resolucion']
+        tareas = []
+        for ruta_particion in particiones_para_hexagonos(ruta_mobility, hex_ids):
+            lector = LectorMobility(ruta_particion, columnas=['device_id', 'timestamp', 'celda', 'celda_anterior',
+                                                              'timestamp_anterior'], **filtros)
+            tareas += [(lector, indice) for indice in lector.row_groups_candidatos()]
+    else:
+        # Leer solo los row groups que pueden cumplir los filtros (bbox, rango de tiempo); los
+        # hexágonos se aplican sobre los intervalos ya sesionizados
+        lector = LectorMobility(ruta_mobility, columnas=['device_id', 'lat', 'lon', 'timestamp'], **filtros)
+        tareas = [(lector, indice) for indice in lector.row_groups_candidatos()]
+    total_bloques = len(tareas)  # Obtener número total de bloques para la barra de progreso
+
+    trabajo = partial(_procesar_row_group, resolucion_base=resolucion_base, resoluciones=resoluciones,
+                      modo_densidad=modo_densidad, precision_hll=precision_hll,
+                      resolucion_dataset=resolucion_dataset, celdas_filtro=celdas_filtro)
+    if n_procesos > 1:
+        # Cada row group se procesa en un proceso del pool; map conserva el orden de los
+        # bloques, así que la reducción es determinista. Las permanencias que cruzan
+        # row groups se recuperan al cerrar las fronteras de dispositivos, lo que exige
+        # que cada row group cubra un tramo de tiempo contiguo por dispositivo.
+        ejecutor = ProcessPoolExecutor(max_workers=n_procesos)
+        resultados = ejecutor.map(trabajo, tareas)
+    else:
+        ejecutor = None
+        resultados = map(trabajo, tareas)
+
+    def _reducir_lote():
+        reducidos = [AlmacenAgregados.combinar_todos([almacen] + [p[nivel] for p in parciales])
+                     for nivel, almacen in enumerate(almacenes)]
+        # Cerrar las fronteras en cada lote detecta row groups solapados en el tiempo
+        # antes de seguir combinando resultados y deja un segmento por dispositivo
+        for almacen in reducidos:
+            almacen.cerrar_fronteras()
+        return reducidos
+
+    try:
+        # Procesar cada bloque con una barra de progreso
+        for parcial in tqdm(resultados, total=total_bloques, desc="Procesando bloques"):
+            parciales.append(parcial)
+            if len(parciales) >= bloques_por_reduccion:
+                almacenes = _reducir_lote()
+                parciales = []
+    finally:
+        if ejecutor is not None:
+            ejecutor.shutdown()
+
+    return dict(zip(resoluciones, _reducir_lote()))
+
+
+def agregar_mobility(ruta_mobility, resolucion_inicial=9, resolucion_reducida=None, bloques_por_reduccion=32,
+                     modo_densidad='exacto', precision_hll=12, n_procesos=1, filtros=None, almacen=None):
+    """Agregados combinables (AlmacenAgregados) de un archivo o dataset de movilidad."""
+    resolucion = resolucion_reducida or resolucion_inicial
+    almacenes = agregar_piramide_mobility(ruta_mobility, [resolucion], resolucion_inicial, bloques_por_reduccion,
+                                          modo_densidad, precision_hll, n_procesos, filtros,
+                                          None if almacen is None else {resolucion: almacen})
+    return almacenes[resolucion]
+
+
+def imputar_features(df_features, metodo='geografico'):
+    if metodo == 'geografico':
+        # Cada faltante se llena con sus hexágonos observados más cercanos en el mapa
+        return ImputadorGeografico(n_vecinos=5).fit_transform(df_features)
+    if metodo != 'knn':
+        raise ValueError(f"Método de imputación desconocido: {metodo}")
+    # Imputación de valores faltantes con KNN Imputer (en el espacio de características).
+    # Las columnas sin ningún valor (p. ej. anillos sin vecinos observados) quedan en 0:
+    # KNNImputer las descartaría, y keep_empty_features no existe en scikit-learn 0.24
+    columnas = df_features.columns[1:]
+    vacias = df_features[columnas].isna().all()
+    imputables = list(columnas[~vacias.to_numpy()])
+    if imputables:
+        df_features[imputables] = KNNImputer(n_neighbors=5).fit_transform(df_features[imputables])
+    df_features[list(columnas[vacias.to_numpy()])] = 0.0
     return df_features
 
+
+def procesar_mobility_completo(ruta_mobility, resolucion_inicial=9, resolucion_reducida=None, bloques_por_reduccion=32,
+                               modo_densidad='exacto', precision_hll=12, n_procesos=1, filtros=None, k_vecindad=0):
+    almacen = agregar_mobility(ruta_mobility, resolucion_inicial, resolucion_reducida, bloques_por_reduccion,
+                               modo_densidad, precision_hll, n_procesos, filtros)
+
+    # Promedios por hexágono en un solo DataFrame, más los agregados de sus anillos
+    # vecinos (sobre los valores observados, antes de imputar)
+    df_features = suavizar_features(almacen.a_dataframe(), k_vecindad)
+
+    return imputar_features(df_features)
+
+
+def procesar_piramide_mobility(ruta_mobility, resoluciones=(7, 8, 9, 10), bloques_por_reduccion=32,
+                               modo_densidad='exacto', precision_hll=12, n_procesos=1, filtros=None, k_vecindad=0):
+    """Tabla larga de características por (resolution, hex_id) calculada en una sola lectura."""
+    almacenes = agregar_piramide_mobility(ruta_mobility, resoluciones, None, bloques_por_reduccion, modo_densidad,
+                                          precision_hll, n_procesos, filtros)
+    niveles = []
+    for resolucion in sorted(almacenes):
+        df_nivel = imputar_features(suavizar_features(almacenes[resolucion].a_dataframe(), k_vecindad))
+        df_nivel.insert(0, 'resolution', resolucion)
+        niveles.append(df_nivel)
+    return pd.concat(niveles, ignore_index=True)
+
 if __name__ == "__main__":
-    ruta_mobility = './data/mobility_data.parquet'
-    # Ajustar resolución inicial y reducida
-    resolucion_inicial = 9
-    resolucion_reducida = 8  # Cambiar a None si no deseas reducir
-    features_mobility = procesar_mobility_completo(ruta_mobility, resolucion_inicial, resolucion_reducida)
+    config = cargar_config()
+    resoluciones = config['pyramid_resolutions']
+    resolucion_base, resolucion_features = resoluciones_desde_config(config)
+    ruta_mobility = config['data']['mobility_file']
+    ruta_particionada = config['data']['mobility_partitioned']
+    # El dataset particionado solo sirve si su celda precalculada es al menos tan fina
+    # como la resolución base de la pirámide
+    if es_dataset_particionado(ruta_particionada):
+        resolucion_dataset = cargar_manifiesto(ruta_particionada)['resolucion']
+        if resolucion_dataset >= resolucion_base:
+            ruta_mobility = ruta_particionada
+        else:
+            print(f"El dataset particionado {ruta_particionada} tiene resolución {resolucion_dataset}, menor que la "
+                  f"base {resolucion_base}; se ignora (vuelva a ejecutar particionar_mobility.py)")
+    print(f"Leyendo movilidad desde {ruta_mobility} (resolución base {resolucion_base})")
+    filtros = filtros_desde_config(config)
+    n_procesos = os.cpu_count() or 1
+    # Una sola lectura para todas las resoluciones de la pirámide
+    piramide = procesar_piramide_mobility(ruta_mobility, resoluciones, n_procesos=n_procesos, filtros=filtros,
+                                          k_vecindad=config.get('neighborhood_k', 0))
+    piramide.to_parquet(config['data']['features_mobility_pyramid'], index=False)
+    features_mobility = piramide[piramide['resolution'] == resolucion_features].drop(columns='resolution')
     print("Características de movilidad calculadas:\n", features_mobility.head())
+    # Registrar la versión en el almacén de características, con su origen y parámetros
+    almacen = AlmacenCaracteristicas(config['data']['feature_store'])
+    version = almacen.escribir('mobility', features_mobility, origen=[f"archivo:{os.path.abspath(ruta_mobility)}"],
+                               parametros={'resolution': resolucion_features, 'base_resolution': resolucion_base,
+                                           'neighborhood_k': config.get('neighborhood_k', 0),
+                                           'lector': config.get('mobility_reader')})
+    print(f"Características de movilidad guardadas en el almacén (versión {version})")
     # Guardar las características de movilidad en un archivo CSV para su posterior uso
     features_mobility.to_csv('./data/features_mobility.csv', index=False)
-
@@ -0,0 +1,283 @@
+# servicio_costo_vida.py
+
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import List
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel
+from agrupador_lotes import AgrupadorLotes
+from artefacto_modelo import ArtefactoModelo
+from indexado_h3 import latlng_a_celdas, resolucion_de, str_a_celdas
+
+COLUMNA_CELDA = 'celda'
+RUTA_ARTEFACTO = os.environ.get('COSTO_VIDA_MODELO', './data/modelo_lightgbm')
+RUTA_TABLA = os.environ.get('COSTO_VIDA_TABLA', './data/tabla_caracteristicas.arrow')
+OBJETIVO_P99_MS = float(os.environ.get('COSTO_VIDA_P99_MS', '10'))
+# Micro-lotes de las consultas de un hexágono; MAX_LOTE=1 los desactiva
+MAX_ESPERA_MS = float(os.environ.get('COSTO_VIDA_MAX_ESPERA_MS', '2'))
+MAX_LOTE = int(os.environ.get('COSTO_VIDA_MAX_LOTE', '256'))
+
+
+def exportar_tabla_caracteristicas(rutas_csv, ruta_salida, columnas):
+    """
+    Escribe la tabla de características por hexágono (las `columnas` del modelo)
+    como archivo Arrow IPC sin compresión, con la celda uint64 como clave, para
+    poder mapearlo en memoria sin copias. Si un hex_id aparece en varios CSV se
+    conserva la primera fila.
+    """
+    df = pd.concat([pd.read_csv(ruta) for ruta in rutas_csv], ignore_index=True).drop_duplicates('hex_id')
+    # pa.array desde numpy conserva los NaN como valores (sin máscara de nulos), lo que permite leer sin copia
+    arreglos = [pa.array(str_a_celdas(df['hex_id']))] + [pa.array(df[c].to_numpy(dtype=np.float64)) for c in columnas]
+    tabla = pa.Table.from_arrays(arreglos, names=[COLUMNA_CELDA] + list(columnas))
+    temporal = ruta_salida + '.tmp'
+    with pa.OSFile(temporal, 'wb') as archivo, pa.ipc.new_file(archivo, tabla.schema) as escritor:
+        escritor.write_table(tabla, max_chunksize=max(len(df), 1))
+    os.replace(temporal, ruta_salida)
+    return len(df)
+
+
+class TablaCaracteristicas:
+    """
+    Características por hexágono mapeadas en memoria desde el archivo Arrow, con
+    un diccionario celda -> fila para ubicar cada hexágono en O(1).
+    """
+
+    def __init__(self, celdas, columnas):
+        self.celdas = np.asarray(celdas, dtype=np.uint64)
+        self.columnas = columnas  # nombre -> arreglo float64 (vista sobre el mapa de memoria)
+        self.resolucion = int(resolucion_de(self.celdas[:1])[0]) if len(self.celdas) else None
+        self._fila = dict(zip(self.celdas.tolist(), range(len(self.celdas))))
+
+    @classmethod
+    def cargar(cls, ruta, columnas):
+        tabla = pa.ipc.open_file(pa.memory_map(ruta, 'r')).read_all()
+        faltantes = [c for c in columnas if c not in tabla.column_names]
+        if faltantes:
+            raise ValueError(f"Faltan columnas en la tabla de características: {faltantes}")
+        vista = lambda c: tabla.column(c).combine_chunks().to_numpy(zero_copy_only=True)
+        return cls(vista(COLUMNA_CELDA), {c: vista(c) for c in columnas})
+
+    def __len__(self):
+        return len(self.celdas)
+
+    def filas(self, celdas):
+        """Fila de cada celda en la tabla, -1 si no está."""
+        return np.fromiter((self._fila.get(c, -1) for c in celdas), dtype=np.int64, count=len(celdas))
+
+    def matriz(self, filas, columnas):
+        X = np.empty((len(filas), len(columnas)), dtype=np.float64)
+        for j, columna in enumerate(columnas):
+            X[:, j] = self.columnas[columna][filas]
+        return X
+
+
+class CacheLRU:
+    """Caché de predicciones por celda; descarta la usada hace más tiempo al llenarse."""
+
+    def __init__(self, capacidad=100_000):
+        self.capacidad = capacidad
+        self._datos = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        valor = self._datos.get(clave)
+        if valor is None:
+            self.fallos += 1
+            return None
+        self._datos.move_to_end(clave)
+        self.aciertos += 1
+        return valor
+
+    def guardar(self, clave, valor):
+        if self.capacidad <= 0:
+            return
+        self._datos[clave] = valor
+        self._datos.move_to_end(clave)
+        if len(self._datos) > self.capacidad:
+            self._datos.popitem(last=False)
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class RegistroLatencias:
+    """Últimas `capacidad` latencias (ms) en un búfer circular, para percentiles baratos."""
+
+    def __init__(self, capacidad=10_000):
+        self._valores = np.zeros(capacidad, dtype=np.float64)
+        self._n = 0
+
+    def registrar(self, milisegundos):
+        self._valores[self._n % len(self._valores)] = milisegundos
+        self._n += 1
+
+    def percentiles(self, qs=(50, 95, 99)):
+        valores = self._valores[:min(self._n, len(self._valores))]
+        if not len(valores):
+            return {f"p{q}": None for q in qs}
+        return {f"p{q}": float(v) for q, v in zip(qs, np.percentile(valores, qs))}
+
+    @property
+    def total(self):
+        return self._n
+
+
+class ServicioCostoVida:
+    """
+    Predicción de costo de vida por celda: busca las filas en la tabla, arma la
+    matriz de las celdas que no están en caché y la predice en una sola llamada.
+    """
+
+    def __init__(self, artefacto, tabla, capacidad_cache=100_000):
+        self.artefacto = artefacto
+        self.tabla = tabla
+        self.cache = CacheLRU(capacidad_cache)
+
+    @classmethod
+    def cargar(cls, ruta_artefacto=RUTA_ARTEFACTO, ruta_tabla=RUTA_TABLA, capacidad_cache=100_000):
+        artefacto = ArtefactoModelo.cargar(ruta_artefacto)
+        return cls(artefacto, TablaCaracteristicas.cargar(ruta_tabla, artefacto.columnas), capacidad_cache)
+
+    def predecir_celdas(self, celdas):
+        """Predicción de cada celda (lista de enteros); NaN para las que no están en la tabla."""
+        predicciones = np.full(len(celdas), np.nan)
+        pendientes = []
+        for i, celda in enumerate(celdas):
+            valor = self.cache.obtener(celda)
+            if valor is None:
+                pendientes.append(i)
+            else:
+                predicciones[i] = valor
+        if pendientes:
+            filas = self.tabla.filas([celdas[i] for i in pendientes])
+            encontradas = filas >= 0
+            if encontradas.any():
+                X = self.artefacto.escalar(self.tabla.matriz(filas[encontradas], self.artefacto.columnas))
+                # Lotes pequeños: un hilo evita el costo de levantar el pool de OpenMP
+                valores = self.artefacto.booster.predict(X, num_threads=1 if len(X) < 1000 else 0)
+                for i, valor in zip(np.asarray(pendientes)[encontradas].tolist(), valores.tolist()):
+                    predicciones[i] = valor
+                    self.cache.guardar(celdas[i], valor)
+        return predicciones
+
+
+class SolicitudLote(BaseModel):
+    hex_ids: List[str]
+
+
+def _celda(hex_id):
+    try:
+        celda = int(hex_id, 16)
+    except ValueError:
+        celda = 0
+    if not 0 < celda < 2 ** 64:
+        raise HTTPException(status_code=400, detail=f"hex_id inválido: {hex_id}")
+    return celda
+
+
+def _resultado(hex_id, valor):
+    if np.isnan(valor):
+        raise HTTPException(status_code=404, detail=f"No hay características para el hexágono {hex_id}")
+    return {"hex_id": hex_id, "cost_of_living": valor}
+
+
+def crear_app(cargar_servicio=ServicioCostoVida.cargar, objetivo_p99_ms=OBJETIVO_P99_MS,
+              max_espera_ms=MAX_ESPERA_MS, max_lote=MAX_LOTE):
+    """
+    Aplicación FastAPI de predicción. `cargar_servicio` se llama una sola vez al
+    arrancar. Los endpoints son async y sin E/S: cada consulta es una búsqueda en
+    el diccionario y una predicción vectorizada dentro del event loop. Con
+    `max_lote` > 1 las consultas concurrentes de un hexágono se juntan en un lote
+    (hasta `max_espera_ms`) y se predicen con una sola llamada al booster.
+    """
+    estado = {}
+    latencias = RegistroLatencias()
+
+    @asynccontextmanager
+    async def ciclo_de_vida(app):
+        servicio = estado['servicio'] = cargar_servicio()
+        if max_lote > 1:
+            estado['agrupador'] = AgrupadorLotes(servicio.predecir_celdas, max_espera_ms, max_lote)
+            estado['agrupador'].iniciar()
+        yield
+        if 'agrupador' in estado:
+            await estado['agrupador'].detener()
+        estado.clear()
+
+    async def predecir_celda(celda):
+        if 'agrupador' in estado:
+            return await estado['agrupador'].enviar(celda)
+        return estado['servicio'].predecir_celdas([celda])[0]
+
+    app = FastAPI(lifespan=ciclo_de_vida)
+
+    @app.middleware("http")
+    async def medir_latencia(request: Request, call_next):
+        inicio = time.perf_counter()
+        respuesta = await call_next(request)
+        if request.url.path.startswith("/cost-of-living"):
+            latencias.registrar((time.perf_counter() - inicio) * 1000)
+        return respuesta
+
+    @app.get("/cost-of-living")
+    async def costo_vida(hex_id: str):
+        return _resultado(hex_id, await predecir_celda(_celda(hex_id)))
+
+    @app.post("/cost-of-living")
+    async def costo_vida_lote(solicitud: SolicitudLote):
+        celdas = [_celda(h) for h in solicitud.hex_ids]
+        valores = estado['servicio'].predecir_celdas(celdas)
+        return {
+            "predictions": [{"hex_id": h, "cost_of_living": v}
+                            for h, v in zip(solicitud.hex_ids, valores.tolist()) if not np.isnan(v)],
+            "missing": [h for h, v in zip(solicitud.hex_ids, valores.tolist()) if np.isnan(v)],
+        }
+
+    @app.get("/cost-of-living/latlon")
+    async def costo_vida_latlon(lat: float, lon: float):
+        servicio = estado['servicio']
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise HTTPException(status_code=400, detail="Coordenadas fuera de rango")
+        if servicio.tabla.resolucion is None:
+            # Tabla vacía: no hay resolución con la cual ubicar las coordenadas
+            raise HTTPException(status_code=503, detail="No hay tabla de características cargada")
+        celda = int(latlng_a_celdas([lat], [lon], servicio.tabla.resolucion)[0])
+        return _resultado(format(celda, 'x'), await predecir_celda(celda))
+
+    @app.get("/metrics")
+    async def metricas():
+        servicio = estado['servicio']
+        percentiles = latencias.percentiles()
+        return {
+            "requests": latencias.total,
+            "latency_ms": percentiles,
+            "p99_target_ms": objetivo_p99_ms,
+            "p99_within_target": percentiles["p99"] is None or percentiles["p99"] <= objetivo_p99_ms,
+            "cache": {"size": len(servicio.cache), "hits": servicio.cache.aciertos, "misses": servicio.cache.fallos},
+            "hexes": len(servicio.tabla),
+            "batching": estado['agrupador'].metricas() if 'agrupador' in estado else None,
+        }
+
+    return app
+
+
+# uvicorn --app-dir scripts servicio_costo_vida:app  (desde la raíz del repositorio)
+app = crear_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # Exportar la tabla de características de train y test con las columnas del modelo
+    artefacto = ArtefactoModelo.cargar(RUTA_ARTEFACTO)
+    n = exportar_tabla_caracteristicas(['./data/train_enriched.csv', './data/test_enriched.csv'], RUTA_TABLA,
+                                       artefacto.columnas)
+    print(f"Tabla de características con {n} hexágonos guardada en {RUTA_TABLA}")
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,204 @@
+# sesiones.py
+
+import numpy as np
+import pandas as pd
+from indexado_h3 import celdas_a_str, padres
+from estadisticas_streaming import combinar_momentos
+
+# Horario nocturno local (los datos son de Ecuador, UTC-5)
+DESFASE_UTC_HORAS = -5
+HORA_INICIO_NOCHE = 22
+HORA_FIN_NOCHE = 6
+
+
+def es_nocturno(tiempos):
+    """Marca los timestamps (segundos epoch) que caen entre HORA_INICIO_NOCHE y HORA_FIN_NOCHE locales."""
+    hora = ((np.asarray(tiempos, dtype=np.float64) + DESFASE_UTC_HORAS * 3600) % 86400) // 3600
+    return (hora >= HORA_INICIO_NOCHE) | (hora < HORA_FIN_NOCHE)
+
+
+def orden_por_dispositivo(dispositivos, tiempos):
+    """
+    Permutación que agrupa los puntos por dispositivo en orden temporal, o None si
+    ya vienen así (dataset particionado o bloques ordenados). `dispositivos` son
+    códigos enteros densos, como los de codificar_dispositivos.
+    """
+    if len(dispositivos) < 2:
+        return None
+    cambio = dispositivos[1:] != dispositivos[:-1]
+    if not (tiempos[1:] < tiempos[:-1])[~cambio].any():
+        # Cada dispositivo debe aparecer en un único tramo contiguo
+        primeros = np.concatenate((dispositivos[:1], dispositivos[1:][cambio]))
+        if np.bincount(primeros).max() <= 1:
+            return None
+    return np.lexsort((tiempos, dispositivos))
+
+
+class IntervalosPermanencia:
+    """
+    Tabla de permanencias: cada fila es una estadía ininterrumpida de un
+    dispositivo en una celda (entrada, salida y puntos observados). Además de los
+    puntos, cada intervalo lleva los momentos (n, media, M2) de los pasos entre
+    puntos consecutivos, con los que se reproducen exactamente las métricas de
+    tiempo de permanencia por celda.
+
+    `continua` marca los intervalos que siguen una estadía iniciada en otro
+    bloque (solo se conoce si los puntos traen la celda del punto anterior).
+    `celda_previa` y `tiempo_previo` describen el punto del dispositivo justo
+    antes de la entrada (celda 0 si no se conoce), y permiten llevar la tabla a
+    resoluciones más gruesas sin volver a los puntos.
+    """
+
+    COLUMNAS = ('dispositivo', 'celda', 'entrada', 'salida', 'n_puntos', 'n_nocturnos', 'n_pasos', 'media_paso',
+                'm2_paso', 'continua', 'celda_previa', 'tiempo_previo')
+
+    def __init__(self, **arreglos):
+        for columna in self.COLUMNAS:
+            setattr(self, columna, arreglos[columna])
+
+    def __len__(self):
+        return len(self.dispositivo)
+
+    @classmethod
+    def desde_puntos(cls, dispositivos, celdas, tiempos, celdas_anteriores=None, tiempos_anteriores=None):
+        """
+        Sesioniza en una pasada lineal sobre arreglos NumPy. Solo se ordena si los
+        puntos no vienen agrupados por dispositivo y en orden temporal.
+        """
+        dispositivos = np.asarray(dispositivos)
+        celdas = np.asarray(celdas, dtype=np.uint64)
+        tiempos = np.asarray(tiempos, dtype=np.float64)
+        orden = orden_por_dispositivo(dispositivos, tiempos)
+        if orden is not None:
+            dispositivos, celdas, tiempos = dispositivos[orden], celdas[orden], tiempos[orden]
+            if celdas_anteriores is not None:
+                celdas_anteriores = np.asarray(celdas_anteriores)[orden]
+                tiempos_anteriores = np.asarray(tiempos_anteriores)[orden]
+
+        n = len(dispositivos)
+        if n == 0:
+            return cls(dispositivo=dispositivos, celda=celdas, entrada=tiempos, salida=tiempos,
+                       n_puntos=np.zeros(0, dtype=np.int64), n_nocturnos=np.zeros(0, dtype=np.int64),
+                       n_pasos=np.zeros(0, dtype=np.int64), media_paso=tiempos, m2_paso=tiempos,
+                       continua=np.zeros(0, dtype=bool), celda_previa=celdas, tiempo_previo=tiempos)
+        nuevo_dispositivo = np.ones(n, dtype=bool)
+        nuevo_dispositivo[1:] = dispositivos[1:] != dispositivos[:-1]
+        if celdas_anteriores is None:
+            # Se entra a una celda al cambiar de dispositivo o de celda
+            entra = nuevo_dispositivo.copy()
+            entra[1:] |= celdas[1:] != celdas[:-1]
+            paso = np.empty(n)
+            paso[0] = 0.0
+            paso[1:] = tiempos[1:] - tiempos[:-1]
+            celdas_anteriores = np.where(nuevo_dispositivo, np.uint64(0), np.roll(celdas, 1))
+            tiempos_anteriores = np.where(nuevo_dispositivo, tiempos, np.roll(tiempos, 1))
+        else:
+            # El punto anterior de cada dispositivo ya está enlazado (dataset particionado)
+            celdas_anteriores = np.asarray(celdas_anteriores, dtype=np.uint64)
+            tiempos_anteriores = np.asarray(tiempos_anteriores, dtype=np.float64)
+            entra = celdas_anteriores != celdas
+            paso = tiempos - tiempos_anteriores
+        corte = entra | nuevo_dispositivo
+        inicio = np.flatnonzero(corte)
+        intervalo = np.cumsum(corte) - 1
+
+        n_puntos = np.diff(np.append(inicio, n))
+        permanece = ~entra
+        n_pasos = np.add.reduceat(permanece.astype(np.int64), inicio)
+        suma = np.add.reduceat(np.where(permanece, paso, 0.0), inicio)
+        media = np.divide(suma, n_pasos, out=np.zeros(len(inicio)), where=n_pasos > 0)
+        m2 = np.add.reduceat(np.where(permanece, (paso - media[intervalo]) ** 2, 0.0), inicio)
+
+        return cls(
+            dispositivo=dispositivos[inicio],
+            celda=celdas[inicio],
+            entrada=tiempos[inicio],
+            salida=tiempos[inicio + n_puntos - 1],
+            n_puntos=n_puntos,
+            n_nocturnos=np.add.reduceat(es_nocturno(tiempos).astype(np.int64), inicio),
+            n_pasos=n_pasos,
+            media_paso=media,
+            m2_paso=m2,
+            continua=~entra[inicio],
+            celda_previa=celdas_anteriores[inicio],
+            tiempo_previo=tiempos_anteriores[inicio],
+        )
+
+    def seleccionar(self, mascara):
+        """Subtabla con los intervalos marcados en `mascara` (o en un arreglo de índices)."""
+        return IntervalosPermanencia(**{columna: getattr(self, columna)[mascara] for columna in self.COLUMNAS})
+
+    def reducir(self, resolucion):
+        """
+        Lleva la tabla a una resolución más gruesa: los intervalos consecutivos de un
+        dispositivo cuyas celdas comparten padre se unen en una sola estadía, y el
+        salto entre ellos pasa a contar como tiempo de permanencia.
+        """
+        if len(self) == 0:
+            return self
+        celda = padres(self.celda, resolucion)
+        conocida = self.celda_previa != 0
+        celda_previa = np.zeros(len(self), dtype=np.uint64)
+        celda_previa[conocida] = padres(self.celda_previa[conocida], resolucion)
+
+        # El punto previo cae en la misma celda gruesa: la estadía viene de antes
+        enlaza = conocida & (celda_previa == celda)
+        mismo_dispositivo = np.zeros(len(self), dtype=bool)
+        mismo_dispositivo[1:] = self.dispositivo[1:] == self.dispositivo[:-1]
+        corte = ~(enlaza & mismo_dispositivo)
+        inicio = np.flatnonzero(corte)
+        grupo = np.cumsum(corte) - 1
+        fin = np.append(inicio[1:], len(self)) - 1
+
+        # Momentos de cada intervalo más el salto desde el punto previo cuando se
+        # enlaza (los intervalos `continua` ya incluyen ese paso)
+        salto = enlaza & ~self.continua
+        n_grupos = len(inicio)
+        n_pasos, media, m2 = combinar_momentos(
+            np.concatenate((grupo, grupo[salto])),
+            np.concatenate((self.n_pasos, np.ones(salto.sum(), dtype=np.int64))),
+            np.concatenate((self.media_paso, (self.entrada - self.tiempo_previo)[salto])),
+            np.concatenate((self.m2_paso, np.zeros(salto.sum()))),
+            n_grupos,
+        )
+        return IntervalosPermanencia(
+            dispositivo=self.dispositivo[inicio],
+            celda=celda[inicio],
+            entrada=self.entrada[inicio],
+            salida=self.salida[fin],
+            n_puntos=np.add.reduceat(self.n_puntos, inicio),
+            n_nocturnos=np.add.reduceat(self.n_nocturnos, inicio),
+            n_pasos=n_pasos,
+            media_paso=media,
+            m2_paso=m2,
+            continua=enlaza[inicio],
+            celda_previa=celda_previa[inicio],
+            tiempo_previo=self.tiempo_previo[inicio],
+        )
+
+    def por_celda(self, celdas):
+        """
+        Resume los intervalos en las celdas de `celdas` (arreglo ordenado): puntos,
+        puntos nocturnos, visitas y momentos del tiempo de permanencia.
+        """
+        n = len(celdas)
+        grupo = np.searchsorted(celdas, self.celda)
+        n_permanencias, media, m2 = combinar_momentos(grupo, self.n_pasos, self.media_paso, self.m2_paso, n)
+        return {
+            'puntos': np.bincount(grupo, weights=self.n_puntos, minlength=n).astype(np.int64),
+            'puntos_nocturnos': np.bincount(grupo, weights=self.n_nocturnos, minlength=n).astype(np.int64),
+            'n_visitas': np.bincount(grupo, weights=~self.continua, minlength=n).astype(np.int64),
+            'n_permanencias': n_permanencias,
+            'media_permanencia': media,
+            'm2_permanencia': m2,
+        }
+
+    def a_dataframe(self, dispositivos=None):
+        """Tabla (device, hex, enter_ts, exit_ts, n_points); `dispositivos` traduce los códigos a ids."""
+        return pd.DataFrame({
+            'device': self.dispositivo if dispositivos is None else np.asarray(dispositivos)[self.dispositivo],
+            'hex': celdas_a_str(self.celda),
+            'enter_ts': self.entrada,
+            'exit_ts': self.salida,
+            'n_points': self.n_puntos,
+        })
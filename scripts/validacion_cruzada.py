@@ -0,0 +1,79 @@
+# validacion_cruzada.py
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import lightgbm as lgb
+from sklearn.model_selection import GroupKFold
+from indexado_h3 import str_a_celdas, padres
+from datasets_lightgbm import datasets_en_cache, cargar_datasets
+
+
+def pliegues_espaciales(hex_ids, n_pliegues=5, resolucion_grupo=6):
+    """
+    Pliegue de cada fila, agrupando los hexágonos por su celda padre a
+    `resolucion_grupo`: hexágonos vecinos caen en el mismo pliegue y no se filtra
+    información espacial entre entrenamiento y validación.
+    """
+    grupos = padres(str_a_celdas(list(hex_ids)), resolucion_grupo)
+    if len(np.unique(grupos)) < n_pliegues:
+        raise ValueError(f"Hay menos celdas a resolución {resolucion_grupo} que pliegues ({n_pliegues})")
+    pliegues = np.empty(len(grupos), dtype=np.int64)
+    for pliegue, (_, indices) in enumerate(GroupKFold(n_splits=n_pliegues).split(grupos, groups=grupos)):
+        pliegues[indices] = pliegue
+    return pliegues
+
+
+def _filas(datos, mascara):
+    return datos[mascara] if not hasattr(datos, 'iloc') else datos.iloc[np.flatnonzero(mascara)]
+
+
+def particiones_pliegues(X, y, pliegues):
+    """Lista (X_train, y_train, X_valid, y_valid) de cada pliegue, en orden."""
+    return [(_filas(X, pliegues != k), _filas(y, pliegues != k), _filas(X, pliegues == k), _filas(y, pliegues == k))
+            for k in np.unique(pliegues)]
+
+
+def _entrenar_pliegue(tarea):
+    # Entrena con los Datasets binarios del pliegue y predice su validación
+    pliegue, ruta_train, ruta_valid, X_valid, parametros, num_boost_round, parametros_binning = tarea
+    entrenamiento, _ = cargar_datasets(ruta_train, ruta_valid, parametros_binning)
+    modelo = lgb.train(parametros, entrenamiento, num_boost_round=num_boost_round)
+    return pliegue, modelo.predict(X_valid)
+
+
+def predicciones_fuera_de_pliegue(X, y, pliegues, parametros, num_boost_round, n_procesos=None,
+                                  directorio_cache=None, parametros_binning=None):
+    """
+    Predicción de cada fila con el modelo entrenado sin su pliegue, con un número
+    fijo de rondas. Los pliegues se entrenan en paralelo sobre los Datasets
+    binarios en caché (los mismos que usa la búsqueda). Devuelve las predicciones
+    fuera de pliegue y el RMSE de cada pliegue.
+    """
+    particiones = particiones_pliegues(X, y, pliegues)
+    n_procesos = min(n_procesos or os.cpu_count() or 1, len(particiones))
+    parametros = {'objective': 'regression', 'verbosity': -1, **parametros,
+                  'num_threads': max(1, (os.cpu_count() or 1) // n_procesos)}
+    parametros.pop('n_estimators', None)
+
+    temporal = tempfile.TemporaryDirectory() if directorio_cache is None else None
+    try:
+        tareas = []
+        for pliegue, particion in zip(np.unique(pliegues), particiones):
+            rutas = datasets_en_cache(*particion, directorio_cache or temporal.name, parametros_binning)
+            tareas.append((pliegue, *rutas, particion[2], parametros, num_boost_round, parametros_binning))
+        with ProcessPoolExecutor(max_workers=n_procesos) as ejecutor:
+            resultados = dict(ejecutor.map(_entrenar_pliegue, tareas))
+    finally:
+        if temporal is not None:
+            temporal.cleanup()
+
+    oof = np.empty(len(pliegues))
+    rmse_pliegues = []
+    y = np.asarray(y, dtype=np.float64)
+    for pliegue in np.unique(pliegues):
+        mascara = pliegues == pliegue
+        oof[mascara] = resultados[pliegue]
+        rmse_pliegues.append(float(np.sqrt(np.mean((y[mascara] - oof[mascara]) ** 2))))
+    return oof, rmse_pliegues
@@ -0,0 +1,116 @@
+# vecindad_h3.py
+
+import re
+import numpy as np
+import pandas as pd
+import h3.api.basic_int as h3_int
+from scipy import sparse
+from indexado_h3 import str_a_celdas
+
+ESTADISTICAS_VECINDAD = ('sum', 'mean', 'max')
+_PATRON_COLUMNA_VECINDAD = re.compile(r'_k\d+_(sum|mean|max)$')
+
+
+def es_columna_vecindad(columna):
+    """True para las columnas generadas por suavizar_features (p. ej. 'visits_k2_mean')."""
+    return bool(_PATRON_COLUMNA_VECINDAD.search(columna))
+
+
+class IndiceAdyacencia:
+    """
+    Adyacencia H3 entre celdas observadas como matrices CSR, una por anillo
+    (distancia exacta 1..k). Se construye una sola vez con grid_ring y luego cada
+    agregación de vecindad es un producto disperso sobre todas las columnas.
+    Los vecinos no observados no forman parte del índice.
+    """
+
+    def __init__(self, celdas, anillos):
+        self.celdas = celdas
+        self.anillos = anillos
+
+    @property
+    def k(self):
+        return len(self.anillos)
+
+    @classmethod
+    def construir(cls, celdas, k=1):
+        celdas = np.asarray(celdas, dtype=np.uint64)
+        if (celdas[1:] <= celdas[:-1]).any():
+            raise ValueError("Las celdas del índice deben venir ordenadas y sin repetir")
+        n = len(celdas)
+        anillos = []
+        for distancia in range(1, k + 1):
+            filas, vecinos = [], []
+            for fila, celda in enumerate(celdas.tolist()):
+                anillo = h3_int.grid_ring(celda, distancia)
+                filas.append(np.full(len(anillo), fila, dtype=np.int64))
+                vecinos.append(np.asarray(anillo, dtype=np.uint64))
+            filas = np.concatenate(filas) if filas else np.empty(0, dtype=np.int64)
+            vecinos = np.concatenate(vecinos) if vecinos else np.empty(0, dtype=np.uint64)
+            # Quedarse con los vecinos que también son celdas observadas
+            columna = np.minimum(np.searchsorted(celdas, vecinos), max(n - 1, 0))
+            observado = (celdas[columna] == vecinos) if n else np.zeros(0, dtype=bool)
+            anillos.append(sparse.csr_matrix((np.ones(observado.sum()), (filas[observado], columna[observado])),
+                                             shape=(n, n)))
+        return cls(celdas, anillos)
+
+    def disco(self, radio, pesos=None):
+        """Matriz de los anillos 1..radio; `pesos[d-1]` pondera el anillo d (1 por defecto)."""
+        pesos = [1.0] * radio if pesos is None else pesos
+        return sum(self.anillos[d] * pesos[d] for d in range(radio)).tocsr()
+
+    def agregar(self, valores, radio, pesos=None):
+        """
+        Suma ponderada, media ponderada y máximo de `valores` (n x f) sobre los
+        vecinos hasta `radio`, ignorando NaN. Sin vecinos observados queda NaN.
+        """
+        valores = np.asarray(valores, dtype=np.float64)
+        matriz = self.disco(radio, pesos)
+        presente = ~np.isnan(valores)
+        suma = matriz @ np.where(presente, valores, 0.0)
+        peso_total = matriz @ presente.astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media = np.where(peso_total > 0, suma / peso_total, np.nan)
+        suma = np.where(peso_total > 0, suma, np.nan)
+
+        # Máximo por fila: reduceat sobre los valores de los vecinos en orden CSR
+        maximo = np.full(valores.shape, np.nan)
+        con_vecinos = np.flatnonzero(np.diff(matriz.indptr) > 0)
+        if len(con_vecinos):
+            with np.errstate(invalid='ignore'):
+                maximo[con_vecinos] = np.fmax.reduceat(valores[matriz.indices], matriz.indptr[con_vecinos], axis=0)
+        return suma, media, maximo
+
+
+def suavizar_features(df_features, k=2, columnas=None, pesos=None, indice=None):
+    """
+    Agrega a la tabla de características (hex_id + columnas numéricas) la suma,
+    media y máximo de cada característica en los anillos 1..r de cada hexágono,
+    para r = 1..k, como columnas '<feature>_k<r>_<estadística>'. `pesos[d-1]`
+    pondera el anillo d en suma y media (por defecto 1/d).
+    """
+    if k <= 0:
+        return df_features
+    columnas = [c for c in df_features.columns if c != 'hex_id' and not es_columna_vecindad(c)] \
+        if columnas is None else list(columnas)
+    pesos = [1.0 / d for d in range(1, k + 1)] if pesos is None else pesos
+
+    celdas = str_a_celdas(df_features['hex_id'].tolist())
+    orden = np.argsort(celdas, kind='stable')
+    if indice is None:
+        indice = IndiceAdyacencia.construir(celdas[orden], k)
+    elif indice.k < k or not np.array_equal(indice.celdas, celdas[orden]):
+        raise ValueError("El índice de adyacencia no corresponde a estos hexágonos")
+    valores = df_features[columnas].to_numpy(dtype=np.float64)[orden]
+
+    nuevas = {}
+    posicion = np.empty_like(orden)
+    posicion[orden] = np.arange(len(orden))
+    for radio in range(1, k + 1):
+        resultados = dict(zip(ESTADISTICAS_VECINDAD, indice.agregar(valores, radio, pesos)))
+        for estadistica in ESTADISTICAS_VECINDAD:
+            # Volver al orden original de las filas
+            matriz = resultados[estadistica][posicion]
+            for j, columna in enumerate(columnas):
+                nuevas[f"{columna}_k{radio}_{estadistica}"] = matriz[:, j]
+    return pd.concat([df_features, pd.DataFrame(nuevas, index=df_features.index)], axis=1)
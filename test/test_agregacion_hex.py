@@ -0,0 +1,83 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from agregacion_hex import AlmacenAgregados, a_segundos
+
+
+class TestAlmacenAgregados(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        n = 2000
+        self.celdas = rng.choice(np.array([0x8866d14d05fffff, 0x8866d14d29fffff, 0x888f2b983dfffff], dtype=np.uint64), n)
+        self.dispositivos = np.array([f"d{i}" for i in rng.integers(0, 50, n)], dtype=object)
+        self.tiempos = np.sort(rng.integers(0, 10 ** 6, n))
+
+    def test_bloque_igual_a_pandas(self):
+        almacen = AlmacenAgregados.desde_bloque(self.celdas, self.dispositivos, self.tiempos)
+        df = pd.DataFrame({'hex_id': self.celdas, 'device_id': self.dispositivos, 'timestamp': self.tiempos})
+        df = df.sort_values(by=['device_id', 'timestamp'], kind='stable')
+        df['time_diff'] = df.groupby('device_id')['timestamp'].diff()
+        df['same_hex'] = df['hex_id'] == df.groupby('device_id')['hex_id'].shift()
+        esperado_media = df[df['same_hex']].groupby('hex_id')['time_diff'].mean()
+        esperado_var = df[df['same_hex']].groupby('hex_id')['time_diff'].var()
+        esperado_densidad = df.groupby('hex_id')['device_id'].nunique()
+
+        np.testing.assert_array_equal(almacen.celdas, esperado_densidad.index.to_numpy(np.uint64))
+        df_almacen = almacen.a_dataframe()
+        np.testing.assert_array_equal(df_almacen['mobility_density'], esperado_densidad.to_numpy())
+        np.testing.assert_allclose(df_almacen['avg_time_in_hex'], esperado_media.to_numpy())
+        np.testing.assert_allclose(df_almacen['time_in_hex_variance'], esperado_var.to_numpy())
+
+    def test_densidad_exacta_entre_bloques(self):
+        completo = AlmacenAgregados.desde_bloque(self.celdas, self.dispositivos, self.tiempos).a_dataframe()
+        partes = [AlmacenAgregados.desde_bloque(self.celdas[i:i + 500], self.dispositivos[i:i + 500], self.tiempos[i:i + 500])
+                  for i in range(0, len(self.celdas), 500)]
+        combinado = AlmacenAgregados.combinar_todos(partes).a_dataframe()
+
+        # Un dispositivo visto en varios bloques se cuenta una sola vez
+        pd.testing.assert_series_equal(combinado['mobility_density'], completo['mobility_density'])
+        pd.testing.assert_series_equal(combinado['avg_visits_per_device'], completo['avg_visits_per_device'])
+
+    def test_bloques_en_cualquier_tamano_y_orden(self):
+        esperado = AlmacenAgregados.desde_bloque(self.celdas, self.dispositivos, self.tiempos).a_dataframe()
+        rng = np.random.default_rng(7)
+        for tamano in (1, 37, 500):
+            inicios = rng.permutation(np.arange(0, len(self.celdas), tamano))
+            partes = [AlmacenAgregados.desde_bloque(self.celdas[i:i + tamano], self.dispositivos[i:i + tamano],
+                                                    self.tiempos[i:i + tamano]) for i in inicios]
+            resultado = AlmacenAgregados.combinar_todos(partes).a_dataframe()
+            pd.testing.assert_series_equal(resultado['avg_time_in_hex'], esperado['avg_time_in_hex'])
+            pd.testing.assert_series_equal(resultado['time_in_hex_variance'], esperado['time_in_hex_variance'],
+                                           rtol=1e-9)
+
+    def test_bloques_solapados_en_el_tiempo_fallan(self):
+        # Filas repartidas al azar: cada bloque intercala tramos de tiempo de los demás
+        bloque = np.random.default_rng(11).integers(0, 4, len(self.celdas))
+        partes = [AlmacenAgregados.desde_bloque(self.celdas[bloque == b], self.dispositivos[bloque == b],
+                                                self.tiempos[bloque == b]) for b in range(4)]
+        with self.assertRaisesRegex(ValueError, 'solapados'):
+            AlmacenAgregados.combinar_todos(partes).a_dataframe()
+
+    def test_segundos_de_fechas_con_zona_horaria(self):
+        fechas = pd.Series(pd.to_datetime(self.tiempos, unit='s', utc=True)).dt.tz_convert('America/Guayaquil')
+        np.testing.assert_array_equal(a_segundos(fechas), self.tiempos)
+        np.testing.assert_array_equal(a_segundos(fechas.to_numpy()), self.tiempos)
+        esperado = AlmacenAgregados.desde_bloque(self.celdas, self.dispositivos, self.tiempos).a_dataframe()
+        resultado = AlmacenAgregados.desde_bloque(self.celdas, self.dispositivos, fechas).a_dataframe()
+        pd.testing.assert_frame_equal(resultado, esperado)
+
+    def test_a_dataframe(self):
+        df = AlmacenAgregados.desde_bloque(self.celdas, self.dispositivos, self.tiempos).a_dataframe()
+        self.assertEqual(list(df['hex_id']), ['8866d14d05fffff', '8866d14d29fffff', '888f2b983dfffff'])
+        self.assertTrue((df['avg_visits_per_device'] >= 1).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
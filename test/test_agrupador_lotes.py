@@ -0,0 +1,77 @@
+import asyncio
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from agrupador_lotes import AgrupadorLotes
+
+
+class TestAgrupadorLotes(unittest.TestCase):
+
+    def _ejecutar(self, corrutina):
+        return asyncio.run(corrutina)
+
+    def test_solicitudes_concurrentes_en_lotes(self):
+        llamadas = []
+
+        def cuadrados(elementos):
+            llamadas.append(len(elementos))
+            return [e * e for e in elementos]
+
+        async def escenario():
+            agrupador = AgrupadorLotes(cuadrados, max_espera_ms=50, max_lote=32)
+            agrupador.iniciar()
+            resultados = await asyncio.gather(*(agrupador.enviar(i) for i in range(100)))
+            metricas = agrupador.metricas()
+            await agrupador.detener()
+            return resultados, metricas
+
+        resultados, metricas = self._ejecutar(escenario())
+        self.assertEqual(resultados, [i * i for i in range(100)])
+        self.assertEqual(llamadas, [32, 32, 32, 4])
+        self.assertEqual(metricas['batches'], 4)
+        self.assertEqual(metricas['max_queue_depth'], 100)
+        self.assertEqual(metricas['queue_depth'], 0)
+
+    def test_espera_maxima_despacha_lote_incompleto(self):
+        async def escenario():
+            agrupador = AgrupadorLotes(lambda elementos: elementos, max_espera_ms=5, max_lote=1000)
+            agrupador.iniciar()
+            inicio = time.perf_counter()
+            resultado = await agrupador.enviar('a')
+            demora = time.perf_counter() - inicio
+            await agrupador.detener()
+            return resultado, demora
+
+        resultado, demora = self._ejecutar(escenario())
+        self.assertEqual(resultado, 'a')
+        self.assertLess(demora, 1.0)
+
+    def test_error_se_propaga_a_todo_el_lote(self):
+        def falla(elementos):
+            raise KeyError('sin datos')
+
+        async def escenario():
+            agrupador = AgrupadorLotes(falla, max_espera_ms=5, max_lote=8)
+            agrupador.iniciar()
+            resultados = await asyncio.gather(*(agrupador.enviar(i) for i in range(3)), return_exceptions=True)
+            # El agrupador sigue atendiendo después de un error
+            agrupador.funcion_lote = lambda elementos: elementos
+            siguiente = await agrupador.enviar(7)
+            await agrupador.detener()
+            return resultados, siguiente
+
+        resultados, siguiente = self._ejecutar(escenario())
+        self.assertTrue(all(isinstance(r, KeyError) for r in resultados))
+        self.assertEqual(siguiente, 7)
+
+    def test_requiere_iniciar(self):
+        with self.assertRaises(RuntimeError):
+            self._ejecutar(AgrupadorLotes(list).enviar(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
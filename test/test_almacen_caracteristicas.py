@@ -0,0 +1,117 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import h3
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from almacen_caracteristicas import (AlmacenCaracteristicas, referencia, unir_tabla, tabla_por_celda,
+                                     enriquecer_conjuntos, unir_tablas_externo)
+from imputacion_geografica import ImputadorGeografico
+from indexado_h3 import celdas_a_str
+
+
+class TestAlmacenCaracteristicas(unittest.TestCase):
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.almacen = AlmacenCaracteristicas(self.directorio.name)
+        hex_ids = sorted(h3.grid_disk(h3.latlng_to_cell(-2.17, -79.92, 8), 3), reverse=True)
+        rng = np.random.default_rng(2)
+        self.df = pd.DataFrame({'hex_id': hex_ids, 'densidad': rng.integers(0, 100, len(hex_ids)),
+                                'tiempo': rng.normal(size=len(hex_ids)), 'zona': ['a', 'b'] * (len(hex_ids) // 2) + ['c']})
+        self.df.loc[3, 'tiempo'] = np.nan
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    def test_escribir_y_leer_con_tipos(self):
+        self.assertEqual(self.almacen.escribir('mobility', self.df), 1)
+        leido = self.almacen.leer('mobility').set_index('hex_id').loc[self.df['hex_id']].reset_index()
+        pd.testing.assert_frame_equal(leido, self.df, check_dtype=False)
+        self.assertEqual(leido['densidad'].dtype, np.int64)
+        esquema = self.almacen.version('mobility')['esquema']
+        self.assertEqual((esquema['celda'], esquema['densidad'], esquema['tiempo']), ('uint64', 'int64', 'double'))
+
+    def test_proyeccion_y_lectura_sin_copia(self):
+        self.almacen.escribir('mobility', self.df)
+        tabla = self.almacen.tabla('mobility', ['tiempo'])
+        self.assertEqual(tabla.column_names, ['celda', 'tiempo'])
+        celdas, columnas = self.almacen.columnas('mobility', ['tiempo'])
+        self.assertTrue(np.all(np.diff(celdas.astype(np.float64)) > 0))
+        self.assertFalse(columnas['tiempo'].flags.owndata)  # vista del mapa de memoria
+        self.assertEqual(np.isnan(columnas['tiempo']).sum(), 1)
+        with self.assertRaises(KeyError):
+            self.almacen.tabla('mobility', ['no_existe'])
+
+    def test_versiones_y_linaje(self):
+        self.assertEqual(self.almacen.escribir('mobility', self.df), 1)
+        self.assertEqual(self.almacen.escribir('mobility', self.df), 1)  # sin cambios no hay versión nueva
+        cambiado = self.df.assign(tiempo=self.df['tiempo'] * 2)
+        self.assertEqual(self.almacen.escribir('mobility', cambiado), 2)
+        self.almacen.escribir('integradas', cambiado, origen=[referencia('mobility', 2)], parametros={'k': 2})
+
+        recargado = AlmacenCaracteristicas(self.directorio.name)
+        self.assertEqual([v['version'] for v in recargado.versiones('mobility')], [1, 2])
+        linaje = recargado.linaje('integradas')
+        self.assertEqual([(e['nombre'], e['version']) for e in linaje], [('integradas', 1), ('mobility', 2)])
+        self.assertEqual(linaje[0]['parametros'], {'k': 2})
+        np.testing.assert_allclose(recargado.leer('mobility', ['tiempo'], version=1)['tiempo'].sort_values(),
+                                   self.df['tiempo'].sort_values())
+
+    def test_hex_repetidos(self):
+        with self.assertRaises(ValueError):
+            self.almacen.escribir('mobility', pd.concat([self.df, self.df[:1]]))
+
+    def test_union_indexada_igual_a_merge(self):
+        self.almacen.escribir('mobility', self.df)
+        otro = h3.latlng_to_cell(40.0, -3.7, 8)
+        consulta = pd.DataFrame({'hex_id': list(self.df['hex_id'][::-2]) + [otro], 'y': 1.0})
+        esperado = consulta.merge(self.df, on='hex_id', how='left')
+        unido = self.almacen.unir(consulta, 'mobility')
+        pd.testing.assert_frame_equal(unido, esperado, check_dtype=False)
+        self.assertTrue(np.isnan(unido['densidad'].iloc[-1]))
+        pd.testing.assert_frame_equal(unir_tabla(consulta, self.df), esperado, check_dtype=False)
+
+    def test_union_externa_igual_a_merge(self):
+        izquierda = self.df.iloc[::2].drop(columns='tiempo')
+        derecha = self.df.iloc[:10][['hex_id', 'tiempo']].assign(nueva=np.arange(10))
+        celdas, columnas = unir_tablas_externo(*tabla_por_celda(izquierda), *tabla_por_celda(derecha))
+        unido = pd.DataFrame({'hex_id': celdas_a_str(celdas), **columnas})
+        esperado = izquierda.merge(derecha, on='hex_id', how='outer')
+        esperado = esperado.set_index('hex_id').loc[unido['hex_id']].reset_index()
+        pd.testing.assert_frame_equal(unido, esperado, check_dtype=False)
+
+    def test_enriquecer_train_y_test_en_una_llamada(self):
+        numericas = self.df.drop(columns='zona')
+        celdas, columnas = tabla_por_celda(numericas[4:])  # los 4 primeros hexágonos quedan sin datos
+        train = pd.DataFrame({'hex_id': self.df['hex_id'][::2], 'y': 1.0})
+        test = pd.DataFrame({'hex_id': self.df['hex_id'][1::3], 'y': 0.0})
+
+        (train_sin, test_sin), unicas, X, encontradas = enriquecer_conjuntos([train, test], celdas, columnas)
+        for parte, original in ((train_sin, train), (test_sin, test)):
+            pd.testing.assert_frame_equal(parte, original.merge(numericas[4:], on='hex_id', how='left'),
+                                          check_dtype=False)
+        self.assertEqual((~encontradas).sum(), len(set(self.df['hex_id'][:4]) & set(celdas_a_str(unicas))))
+
+        # Con imputación, igual que imputar la tabla unida con el imputador ajustado
+        imputador = ImputadorGeografico(n_vecinos=3).fit(numericas[4:])
+        (train_imp, test_imp), _, _, _ = enriquecer_conjuntos([train, test], celdas, columnas, imputador)
+        for parte, sin_imputar in ((train_imp, train_sin), (test_imp, test_sin)):
+            pd.testing.assert_frame_equal(parte, imputador.transform(sin_imputar), check_dtype=False)
+            self.assertFalse(parte[['densidad', 'tiempo']].isna().any().any())
+
+    def test_importar_csv(self):
+        ruta = os.path.join(self.directorio.name, 'features.csv')
+        self.df.to_csv(ruta, index=False)
+        self.assertEqual(self.almacen.importar_csv('csv', ruta), 1)
+        self.assertEqual(self.almacen.importar_csv('csv', ruta), 1)
+        self.assertTrue(self.almacen.version('csv')['origen'][0].startswith('archivo:'))
+
+
+if __name__ == '__main__':
+    unittest.main()
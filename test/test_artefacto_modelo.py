@@ -0,0 +1,57 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+import lightgbm as lgb
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from artefacto_modelo import ArtefactoModelo, predecir_lote
+
+
+class TestArtefactoModelo(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.df = pd.DataFrame({'hex_id': [f"h{i}" for i in range(300)],
+                                'a': rng.normal(50, 10, 300), 'b': rng.normal(size=300),
+                                'c': rng.uniform(size=300)})
+        y = 0.1 * self.df['a'] + self.df['b'] + rng.normal(0, 0.1, 300)
+        self.X = self.df[['a', 'b', 'c']].copy()
+        self.scaler = StandardScaler()
+        self.X[['a', 'b']] = self.scaler.fit_transform(self.X[['a', 'b']])
+        self.modelo = lgb.LGBMRegressor(n_estimators=30, verbosity=-1).fit(self.X, y)
+        self.artefacto = ArtefactoModelo.desde_entrenamiento(self.modelo, self.X, self.scaler, ['a', 'b'],
+                                                            metadatos={'rmse_cv': 0.1})
+
+    def test_predice_como_el_modelo_sobre_datos_escalados(self):
+        # Las filas crudas se escalan igual que en el entrenamiento
+        np.testing.assert_allclose(self.artefacto.predict(self.df), self.modelo.predict(self.X))
+
+    def test_guardar_y_cargar(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            self.artefacto.guardar(directorio)
+            cargado = ArtefactoModelo.cargar(directorio)
+        self.assertEqual(cargado.columnas, ['a', 'b', 'c'])
+        self.assertEqual(cargado.huella, self.artefacto.huella)
+        self.assertEqual(cargado.metadatos, {'rmse_cv': 0.1})
+        np.testing.assert_allclose(cargado.predict(self.df), self.artefacto.predict(self.df))
+
+    def test_orden_de_columnas_y_faltantes(self):
+        desordenado = self.df[['c', 'hex_id', 'b', 'a']]
+        np.testing.assert_allclose(self.artefacto.predict(desordenado), self.artefacto.predict(self.df))
+        with self.assertRaises(ValueError):
+            self.artefacto.predict(self.df.drop(columns=['b']))
+
+    def test_predecir_lote(self):
+        salida = predecir_lote(self.artefacto, self.df)
+        self.assertEqual(list(salida.columns), ['hex_id', 'cost_of_living'])
+        self.assertEqual(salida['hex_id'].tolist(), self.df['hex_id'].tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
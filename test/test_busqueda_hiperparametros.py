@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from busqueda_hiperparametros import BusquedaASHA, muestrear_configuracion, peldanos_asha
+
+ESPACIO = {'num_leaves': [7, 15, 31], 'learning_rate': [0.01, 0.05, 0.1], 'min_child_samples': [5, 20],
+           'n_estimators': [100, 200]}
+
+
+class TestBusquedaASHA(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        X = rng.normal(size=(400, 5))
+        y = X[:, 0] * 2 + np.sin(X[:, 1]) + rng.normal(0, 0.1, 400)
+        self.datos = (X[:300], y[:300], X[300:], y[300:])
+        self.directorio = tempfile.TemporaryDirectory()
+        self.ruta_registro = os.path.join(self.directorio.name, 'ensayos.jsonl')
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    def test_peldanos_y_muestreo(self):
+        self.assertEqual(peldanos_asha(25, 500, 3), [25, 75, 225, 500])
+        configuracion = muestrear_configuracion(ESPACIO, 5)
+        self.assertEqual(configuracion, muestrear_configuracion(ESPACIO, 5))
+        for nombre, valor in configuracion.items():
+            self.assertIn(valor, ESPACIO[nombre])
+
+    def test_busqueda_y_reanudacion(self):
+        busqueda = BusquedaASHA(ESPACIO, n_configuraciones=12, presupuesto_min=10, presupuesto_max=90, eta=3,
+                                n_procesos=2, ruta_registro=self.ruta_registro)
+        parametros, rmse = busqueda.ejecutar(*self.datos)
+        self.assertLess(rmse, 1.0)
+        self.assertNotIn('num_threads', parametros)
+        self.assertLessEqual(parametros['n_estimators'], 90)
+
+        # Todas las configuraciones corren el primer peldaño y cada vez menos llegan a los siguientes
+        por_peldano = [sum(1 for (_, p) in busqueda.resultados if p == k) for k in range(len(busqueda.peldanos))]
+        self.assertEqual(por_peldano[0], 12)
+        self.assertTrue(all(a >= b for a, b in zip(por_peldano, por_peldano[1:])))
+
+        with open(self.ruta_registro) as archivo:
+            lineas = len(archivo.readlines())
+        self.assertEqual(lineas, len(busqueda.resultados))
+
+        # Reanudar con el mismo registro no repite ensayos
+        reanudada = BusquedaASHA(ESPACIO, n_configuraciones=12, presupuesto_min=10, presupuesto_max=90, eta=3,
+                                 n_procesos=1, ruta_registro=self.ruta_registro)
+        self.assertEqual(reanudada.ejecutar(*self.datos), (parametros, rmse))
+        with open(self.ruta_registro) as archivo:
+            self.assertEqual(len(archivo.readlines()), lineas)
+
+
+if __name__ == '__main__':
+    unittest.main()
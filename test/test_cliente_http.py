@@ -0,0 +1,274 @@
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cliente_http import CacheContenido, CacheDisco, ClienteHTTP, ClienteHTTPAsync, CubetaTokens, clave_solicitud, paginas
+
+
+class _Stub(BaseHTTPRequestHandler):
+    # HTTP/1.1 para que el cliente pueda reutilizar la conexión
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, estado, cuerpo):
+        datos = json.dumps(cuerpo).encode()
+        self.send_response(estado)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _registrar(self):
+        servidor = self.server
+        servidor.solicitudes.append((self.command, self.path, self.headers.get('API-KEY')))
+        servidor.puertos.add(self.client_address[1])
+
+    def do_GET(self):
+        self._registrar()
+        servidor = self.server
+        if self.path.startswith('/v1/s1/e1/resources/measurement'):
+            servidor.mediciones += 1
+            if servidor.mediciones <= 2:
+                self._responder(503, {'detail': 'ocupado'})
+            elif servidor.mediciones == 3:
+                self._responder(200, {'distance': 'failed to measure', 'time': '2 hours'})
+            else:
+                self._responder(200, {'distance': '10 AU', 'time': '2 hours'})
+        elif self.path.startswith('/v1/s1/e2/resources/stars'):
+            pagina = int(self.path.split('page=')[1].split('&')[0]) if 'page=' in self.path else 1
+            with servidor.candado:
+                servidor.en_vuelo += 1
+                servidor.max_en_vuelo = max(servidor.max_en_vuelo, servidor.en_vuelo)
+            time.sleep(0.05)
+            with servidor.candado:
+                servidor.en_vuelo -= 1
+            estrellas = [{'id': i, 'resonance': i} for i in range(3 * pagina - 2, min(3 * pagina, 31) + 1)]
+            datos = json.dumps(estrellas).encode()
+            self.send_response(200)
+            self.send_header('x-total-count', '31')
+            self.send_header('Content-Length', str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+        elif self.path.startswith('/v1/pokemon/'):
+            # Todos los Pokémon pesan lo mismo: un solo cuerpo en la caché direccionada por contenido
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            datos = json.dumps({'height': 7}).encode()
+            self.send_response(200)
+            self.send_header('ETag', '"v1"')
+            self.send_header('Content-Length', str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+        elif self.path.startswith('/v1/siempre-falla'):
+            self._responder(500, {'detail': 'error'})
+        else:
+            self._responder(200, {'ruta': self.path})
+
+    def do_POST(self):
+        self._registrar()
+        longitud = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(longitud)
+        self._responder(503, {'detail': 'no disponible'})
+
+
+class TestClienteHTTP(unittest.TestCase):
+
+    def setUp(self):
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), _Stub)
+        self.servidor.solicitudes, self.servidor.puertos, self.servidor.mediciones = [], set(), 0
+        self.servidor.candado, self.servidor.en_vuelo, self.servidor.max_en_vuelo = threading.Lock(), 0, 0
+        self.hilo = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+        self.hilo.start()
+        self.puerto = self.servidor.server_address[1]
+        self.cliente = ClienteHTTP(base_url=f'http://127.0.0.1:{self.puerto}/v1/', api_key='clave', espera_base=0.001,
+                                   reintentos=4, http2=False, semilla=0)
+
+    def tearDown(self):
+        self.cliente.cerrar()
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def test_reintenta_5xx_y_mediciones_fallidas(self):
+        fallida = lambda r: 'failed to measure' in r.json()['distance']
+        respuesta = self.cliente.get('s1/e1/resources/measurement', reintentar_si=fallida)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['distance'], '10 AU')
+        self.assertEqual(self.servidor.mediciones, 4)
+        estadisticas = self.cliente.estadisticas()[f'GET 127.0.0.1:{self.puerto}/v1/s1/e1/resources/measurement']
+        self.assertEqual((estadisticas['solicitudes'], estadisticas['reintentos'], estadisticas['errores']), (4, 3, 3))
+        self.assertIsNotNone(estadisticas['latencia_p95_ms'])
+
+    def test_agota_reintentos_y_devuelve_la_ultima_respuesta(self):
+        respuesta = self.cliente.get('siempre-falla')
+        self.assertEqual(respuesta.status_code, 500)
+        self.assertEqual(len(self.servidor.solicitudes), 5)
+
+    def test_post_no_se_reintenta_salvo_idempotente(self):
+        self.assertEqual(self.cliente.post('s1/e1/solution', json={'speed': 5}).status_code, 503)
+        self.assertEqual(len(self.servidor.solicitudes), 1)
+        self.cliente.post('s1/e1/solution', json={'speed': 5}, idempotente=True)
+        self.assertEqual(len(self.servidor.solicitudes), 1 + 5)
+
+    def test_conexion_reutilizada_y_api_key_solo_para_la_api(self):
+        for pagina in range(5):
+            self.cliente.get('s1/e2/resources/stars', params={'page': pagina})
+        # Otro host (mismo servidor con otro nombre): no recibe la API-KEY
+        self.cliente.get(f'http://localhost:{self.puerto}/api/people/')
+        claves = [clave for _, _, clave in self.servidor.solicitudes]
+        self.assertEqual(claves, ['clave'] * 5 + [None])
+        self.assertEqual(self.servidor.solicitudes[2][1], '/v1/s1/e2/resources/stars?page=2')
+        # Las cinco solicitudes a la API usaron una sola conexión keep-alive
+        self.assertEqual(len(self.servidor.puertos), 2)
+
+    def test_error_de_red_se_relanza_tras_los_reintentos(self):
+        cliente = ClienteHTTP(base_url='http://127.0.0.1:9/', espera_base=0.001, reintentos=2, http2=False)
+        with self.assertRaises(Exception):
+            cliente.get('nada')
+        self.assertEqual(list(cliente.estadisticas().values())[0]['errores'], 3)
+
+    def test_servidor_mudo_falla_dentro_del_timeout(self):
+        # Acepta la conexión (backlog del socket) y nunca responde
+        mudo = socket.socket()
+        mudo.bind(('127.0.0.1', 0))
+        mudo.listen(8)
+        cliente = ClienteHTTP(base_url=f'http://127.0.0.1:{mudo.getsockname()[1]}/', timeout_lectura=0.5,
+                              reintentos=1, espera_base=0.001, http2=False)
+        inicio = time.perf_counter()
+        try:
+            with self.assertRaises(requests.Timeout):
+                cliente.get('nada')
+        finally:
+            cliente.cerrar()
+            mudo.close()
+        # Dos intentos de 0.5 s cada uno
+        self.assertLess(time.perf_counter() - inicio, 2.0)
+        self.assertEqual(list(cliente.estadisticas().values())[0]['errores'], 2)
+
+    def test_reporte(self):
+        self.cliente.get('s1/e2/resources/stars')
+        self.assertIn('GET 127.0.0.1', self.cliente.reporte())
+
+    def test_paginas_concurrentes(self):
+        async def recorrer(concurrencia):
+            suma, paginas_vistas = 0, []
+            async with ClienteHTTPAsync(base_url=f'http://127.0.0.1:{self.puerto}/v1/', api_key='clave',
+                                        concurrencia=concurrencia, http2=False) as cliente_async:
+                async for pagina, estrellas in paginas(cliente_async, 's1/e2/resources/stars', {'sort-by': 'id'}):
+                    paginas_vistas.append(pagina)
+                    suma += sum(e['resonance'] for e in estrellas)
+            return suma, paginas_vistas
+
+        inicio = time.perf_counter()
+        suma, paginas_vistas = asyncio.run(recorrer(concurrencia=4))
+        duracion = time.perf_counter() - inicio
+        self.assertEqual(suma, sum(range(1, 32)))
+        self.assertEqual(paginas_vistas[0], 1)
+        self.assertEqual(sorted(paginas_vistas), list(range(1, 12)))
+        self.assertLessEqual(self.servidor.max_en_vuelo, 4)
+        self.assertGreater(self.servidor.max_en_vuelo, 1)
+        # 1 + 10 páginas de 50 ms: de a una tardarían más de medio segundo
+        self.assertLess(duracion, 0.45)
+        self.assertTrue(all(clave == 'clave' for _, _, clave in self.servidor.solicitudes))
+
+    def test_get_json_usa_la_cache_en_disco(self):
+        async def consultar(cache):
+            async with ClienteHTTPAsync(base_url=f'http://127.0.0.1:{self.puerto}/v1/', api_key='clave',
+                                        http2=False) as cliente_async:
+                return await asyncio.gather(*(cliente_async.get_json('s1/e3/resources/oracle-rolodex',
+                                                                     params={'name': n}, cache=cache)
+                                              for n in ['Luke', 'Leia']))
+
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'cache.sqlite')
+            cache = CacheDisco(ruta)
+            primera = asyncio.run(consultar(cache))
+            cache.cerrar()
+            # Una segunda ejecución (otra conexión a la base) no vuelve a consultar la API
+            cache = CacheDisco(ruta)
+            self.assertEqual(asyncio.run(consultar(cache)), primera)
+            cache.cerrar()
+        self.assertEqual(len(self.servidor.solicitudes), 2)
+        self.assertEqual(primera[0]['ruta'], '/v1/s1/e3/resources/oracle-rolodex?name=Luke')
+
+    def test_cache_por_contenido_con_revalidacion(self):
+        ahora = [1000.0]
+
+        async def consultar(cache):
+            async with ClienteHTTPAsync(base_url=f'http://127.0.0.1:{self.puerto}/v1/', api_key='clave',
+                                        http2=False) as cliente_async:
+                return await asyncio.gather(*(cliente_async.get_json_revalidado(f'pokemon/{n}/', cache)
+                                              for n in range(1, 6)))
+
+        with tempfile.TemporaryDirectory() as directorio:
+            cache = CacheContenido(os.path.join(directorio, 'cache.sqlite'), ttl=60, reloj=lambda: ahora[0])
+            self.assertEqual(asyncio.run(consultar(cache)), [{'height': 7}] * 5)
+            self.assertEqual(cache.descargas, 5)
+            self.assertEqual(cache._conexion.execute("SELECT COUNT(*) FROM contenidos").fetchone()[0], 1)
+            # Frescas: sin solicitudes
+            asyncio.run(consultar(cache))
+            self.assertEqual((cache.aciertos, len(self.servidor.solicitudes)), (5, 5))
+            # Vencidas: solicitud condicional y 304, sin volver a descargar
+            ahora[0] += 120
+            self.assertEqual(asyncio.run(consultar(cache)), [{'height': 7}] * 5)
+            self.assertEqual((cache.revalidadas, cache.descargas, len(self.servidor.solicitudes)), (5, 5, 10))
+            self.assertTrue(cache.entrada(f'http://127.0.0.1:{self.puerto}/v1/pokemon/1/')['fresca'])
+            self.assertEqual(cache.purgar_huerfanos(), 0)
+            cache.cerrar()
+
+
+class TestCacheDisco(unittest.TestCase):
+
+    def test_vencimiento_y_purga(self):
+        ahora = [1000.0]
+        with tempfile.TemporaryDirectory() as directorio:
+            cache = CacheDisco(os.path.join(directorio, 'sub', 'cache.sqlite'), ttl=60, reloj=lambda: ahora[0])
+            clave = clave_solicitud('https://swapi.dev/api/people/', {'page': 2})
+            self.assertEqual(clave, 'https://swapi.dev/api/people/?page=2')
+            cache.guardar(clave, {'results': [1, 2]})
+            cache.guardar('corta', [1], ttl=5)
+            self.assertEqual(cache.obtener(clave), {'results': [1, 2]})
+            ahora[0] += 10
+            self.assertIsNone(cache.obtener('corta'))
+            self.assertEqual(cache.purgar(), 1)
+            ahora[0] += 60
+            self.assertIsNone(cache.obtener(clave))
+            self.assertEqual((cache.aciertos, cache.fallos), (1, 2))
+            cache.cerrar()
+
+
+class TestCubetaTokens(unittest.TestCase):
+
+    def test_limita_la_tasa_tras_la_rafaga(self):
+        async def consumir(cubeta, n):
+            inicio = time.monotonic()
+            for _ in range(n):
+                await cubeta.adquirir()
+            return time.monotonic() - inicio
+
+        # Ráfaga de 5 inmediata; las 5 siguientes a 50 por segundo
+        self.assertLess(asyncio.run(consumir(CubetaTokens(50, capacidad=5), 5)), 0.02)
+        self.assertGreaterEqual(asyncio.run(consumir(CubetaTokens(50, capacidad=5), 10)), 0.09)
+
+    def test_tasa_invalida(self):
+        with self.assertRaises(ValueError):
+            CubetaTokens(0)
+
+
+if __name__ == '__main__':
+    unittest.main()
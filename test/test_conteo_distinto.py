@@ -0,0 +1,70 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from conteo_distinto import ConteoDistintoExacto, ConteoDistintoHLL, crear_conteo
+
+
+class TestConteoDistinto(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.celdas = rng.choice(np.array([10, 20, 30], dtype=np.uint64), 60000)
+        # Dispositivos: hash uint64 de 20000 identificadores, repetidos
+        self.dispositivos = rng.integers(0, 2 ** 63, 20000, dtype=np.uint64)[rng.integers(0, 20000, 60000)]
+        self.esperado = np.array([len(np.unique(self.dispositivos[self.celdas == c])) for c in (10, 20, 30)])
+        self.consulta = np.array([10, 20, 30], dtype=np.uint64)
+
+    def _partes(self, modo, **kwargs):
+        return [crear_conteo(self.celdas[i:i + 7000], self.dispositivos[i:i + 7000], modo, **kwargs)
+                for i in range(0, len(self.celdas), 7000)]
+
+    def test_exacto(self):
+        conteo = ConteoDistintoExacto.combinar_todos(self._partes('exacto'))
+        np.testing.assert_array_equal(conteo.estimar(self.consulta), self.esperado)
+
+    def test_celda_ausente(self):
+        conteo = ConteoDistintoExacto.desde_pares(self.celdas, self.dispositivos)
+        np.testing.assert_array_equal(conteo.estimar(np.array([5, 20], dtype=np.uint64)), [0, self.esperado[1]])
+        hll = ConteoDistintoHLL.desde_pares(self.celdas, self.dispositivos)
+        self.assertEqual(hll.estimar(np.array([5], dtype=np.uint64))[0], 0)
+
+    def test_hll_combinado_igual_a_una_pasada(self):
+        combinado = ConteoDistintoHLL.combinar_todos(self._partes('hll', precision=12))
+        una_pasada = ConteoDistintoHLL.desde_pares(self.celdas, self.dispositivos, 12)
+        for nombre, arreglo in una_pasada.a_arreglos().items():
+            np.testing.assert_array_equal(combinado.a_arreglos()[nombre], arreglo)
+        error = np.abs(combinado.estimar(self.consulta) - self.esperado) / self.esperado
+        self.assertLess(error.max(), 0.05, "Error de HyperLogLog mayor al esperado para precisión 12")
+
+    def test_hll_celdas_chicas_dispersas(self):
+        # Muchas celdas con pocos dispositivos: sin filas densas de 4 KiB y con la misma estimación
+        rng = np.random.default_rng(3)
+        celdas = rng.integers(1, 5000, 50000).astype(np.uint64)
+        dispositivos = rng.integers(0, 2 ** 63, 50000, dtype=np.uint64)
+        exacto = ConteoDistintoExacto.desde_pares(celdas, dispositivos)
+        partes = [ConteoDistintoHLL.desde_pares(celdas[i:i + 10000], dispositivos[i:i + 10000])
+                  for i in range(0, 50000, 10000)]
+        hll = ConteoDistintoHLL.combinar_todos(partes)
+        self.assertEqual(len(hll.celdas), 0)
+        self.assertLess(hll.memoria(), exacto.celdas.nbytes + exacto.dispositivos.nbytes)
+        consulta = np.unique(celdas)
+        # Conteo lineal: casi exacto en celdas chicas (solo colisiones de registro)
+        diferencia = np.abs(hll.estimar(consulta) - exacto.estimar(consulta))
+        self.assertLessEqual(diferencia.max(), 3)
+        # Una celda grande pasa a registros densos
+        grande = ConteoDistintoHLL.desde_pares(np.full(len(self.dispositivos), 7, dtype=np.uint64), self.dispositivos)
+        self.assertEqual((len(grande.celdas), len(grande.celdas_dispersas)), (1, 0))
+
+    def test_hll_precision_distinta_falla(self):
+        with self.assertRaises(ValueError):
+            ConteoDistintoHLL.combinar_todos([ConteoDistintoHLL.desde_pares(self.celdas, self.dispositivos, 10),
+                                              ConteoDistintoHLL.desde_pares(self.celdas, self.dispositivos, 12)])
+
+
+if __name__ == '__main__':
+    unittest.main()
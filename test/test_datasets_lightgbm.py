@@ -0,0 +1,45 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from datasets_lightgbm import datasets_en_cache, cargar_datasets
+
+
+class TestDatasetsLightGBM(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        X = pd.DataFrame(rng.normal(size=(200, 3)), columns=['a', 'b', 'c'])
+        y = X['a'] + rng.normal(0, 0.1, 200)
+        self.datos = (X[:150], y[:150], X[150:], y[150:])
+        self.directorio = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    def test_binarios_reutilizados(self):
+        rutas = datasets_en_cache(*self.datos, self.directorio.name)
+        modificado = [os.path.getmtime(r) for r in rutas]
+        self.assertEqual(datasets_en_cache(*self.datos, self.directorio.name), rutas)
+        self.assertEqual([os.path.getmtime(r) for r in rutas], modificado)
+
+        entrenamiento, validacion = cargar_datasets(*rutas)
+        self.assertEqual(entrenamiento.num_data(), 150)
+        self.assertEqual(validacion.num_data(), 50)
+        self.assertEqual(entrenamiento.get_feature_name(), ['a', 'b', 'c'])
+
+    def test_clave_depende_de_datos_y_binning(self):
+        rutas = datasets_en_cache(*self.datos, self.directorio.name)
+        self.assertNotEqual(datasets_en_cache(*self.datos, self.directorio.name, {'max_bin': 63}), rutas)
+        X_train, y_train, X_valid, y_valid = self.datos
+        self.assertNotEqual(datasets_en_cache(X_train, y_train * 2, X_valid, y_valid, self.directorio.name), rutas)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+import h3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from imputacion_geografica import ImputadorGeografico, centroides_celdas
+from indexado_h3 import str_a_celdas
+
+
+def _haversine(a, b):
+    dlat, dlon = b[:, 0] - a[0], b[:, 1] - a[1]
+    return 2 * np.arcsin(np.sqrt(np.sin(dlat / 2) ** 2 + np.cos(a[0]) * np.cos(b[:, 0]) * np.sin(dlon / 2) ** 2))
+
+
+class TestImputadorGeografico(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(6)
+        self.hex_ids = sorted(h3.grid_disk(h3.latlng_to_cell(-2.17, -79.9, 8), 4))
+        n = len(self.hex_ids)
+        self.df = pd.DataFrame({'hex_id': self.hex_ids, 'cost_of_living': rng.random(n),
+                                'visits': rng.random(n) * 100, 'night_share': rng.random(n)})
+        self.faltantes = rng.choice(n, 12, replace=False)
+        self.df.loc[self.faltantes, ['visits', 'night_share']] = np.nan
+        self.df.loc[self.faltantes[:4], 'cost_of_living'] = np.nan
+
+    def test_media_de_los_vecinos_mas_cercanos(self):
+        resultado = ImputadorGeografico(n_vecinos=5).fit_transform(self.df)
+        puntos = centroides_celdas(str_a_celdas(self.hex_ids))
+        observados = np.setdiff1d(np.arange(len(self.df)), self.faltantes)
+        for fila in self.faltantes:
+            distancias = _haversine(puntos[fila], puntos[observados])
+            cercanos = observados[np.argsort(distancias, kind='stable')[:5]]
+            self.assertAlmostEqual(resultado.loc[fila, 'visits'], self.df.loc[cercanos, 'visits'].mean())
+        self.assertFalse(resultado[['visits', 'night_share']].isna().any().any())
+        # Los observados no cambian y la variable objetivo no se imputa
+        pd.testing.assert_frame_equal(resultado.loc[observados], self.df.loc[observados])
+        self.assertEqual(resultado['cost_of_living'].isna().sum(), 4)
+
+    def test_mismo_valor_en_train_y_test(self):
+        imputador = ImputadorGeografico().fit(self.df)
+        train = self.df.iloc[::2].reset_index(drop=True)
+        test = self.df.iloc[1::2].reset_index(drop=True)
+        completo = imputador.transform(self.df).set_index('hex_id')
+        for parte in (imputador.transform(train), imputador.transform(test)):
+            pd.testing.assert_frame_equal(parte.set_index('hex_id'), completo.loc[parte['hex_id']])
+
+
+if __name__ == '__main__':
+    unittest.main()
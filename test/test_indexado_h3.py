@@ -0,0 +1,74 @@
+import os
+import sys
+import unittest
+
+import h3
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from indexado_h3 import (latlng_a_celdas, padres, celdas_multiresolucion, celdas_a_str,
+                         str_a_celdas, indexar_dataframe)
+
+
+class TestIndexadoH3(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.lat = rng.uniform(-34.0, 19.0, size=500)
+        self.lon = rng.uniform(-99.0, -58.0, size=500)
+
+    def test_celdas_iguales_a_h3(self):
+        celdas = celdas_a_str(latlng_a_celdas(self.lat, self.lon, 9))
+        esperado = [h3.latlng_to_cell(la, lo, 9) for la, lo in zip(self.lat, self.lon)]
+        self.assertEqual(list(celdas), esperado)
+
+    def test_padres_por_bits(self):
+        celdas = latlng_a_celdas(self.lat, self.lon, 10)
+        for resolucion in (0, 5, 8, 10):
+            esperado = [h3.cell_to_parent(h, resolucion) for h in celdas_a_str(celdas)]
+            self.assertEqual(list(celdas_a_str(padres(celdas, resolucion))), esperado)
+
+    def test_padre_de_resolucion_mayor_falla(self):
+        celdas = latlng_a_celdas(self.lat, self.lon, 7)
+        with self.assertRaises(ValueError):
+            padres(celdas, 8)
+
+    def test_multiresolucion(self):
+        por_resolucion = celdas_multiresolucion(self.lat, self.lon, [8, 9, 7])
+        self.assertEqual(sorted(por_resolucion), [7, 8, 9])
+        finas = [h3.latlng_to_cell(la, lo, 9) for la, lo in zip(self.lat, self.lon)]
+        for resolucion, celdas in por_resolucion.items():
+            # Las resoluciones gruesas siguen la jerarquía lógica de H3 (padre de la celda fina)
+            esperado = [h3.cell_to_parent(h, resolucion) for h in finas]
+            self.assertEqual(list(celdas_a_str(celdas)), esperado)
+
+    def test_ida_y_vuelta_texto(self):
+        celdas = latlng_a_celdas(self.lat, self.lon, 9)
+        np.testing.assert_array_equal(str_a_celdas(celdas_a_str(celdas)), celdas)
+
+    def test_texto_de_ancho_fijo_y_variable(self):
+        textos = list(celdas_a_str(latlng_a_celdas(self.lat, self.lon, 8)))
+        esperado = np.array([int(h, 16) for h in textos], dtype=np.uint64)
+        # Serie de texto de Arrow (atajo vectorizado), objetos y una porción con desplazamiento
+        serie = pd.Series(textos, dtype='string[pyarrow]')
+        np.testing.assert_array_equal(str_a_celdas(serie), esperado)
+        np.testing.assert_array_equal(str_a_celdas(np.array(textos, dtype=object)), esperado)
+        np.testing.assert_array_equal(str_a_celdas(serie[7:]), esperado[7:])
+        # Largos distintos y mayúsculas pasan por el camino general
+        np.testing.assert_array_equal(str_a_celdas(['ff', '8A2B', textos[0].upper()]),
+                                      np.array([255, 0x8A2B, esperado[0]], dtype=np.uint64))
+        for invalidos in (['zz'], ['8f', None]):
+            with self.assertRaises(ValueError):
+                str_a_celdas(invalidos)
+
+    def test_indexar_dataframe(self):
+        df = pd.DataFrame({'lat': self.lat, 'lon': self.lon})
+        df = indexar_dataframe(df, 9, 8)
+        esperado = [h3.cell_to_parent(h3.latlng_to_cell(la, lo, 9), 8) for la, lo in zip(self.lat, self.lon)]
+        self.assertEqual(df['hex_id'].tolist(), esperado)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from fastparquet import write
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from lector_mobility import LectorMobility, cargar_mobility
+from indexado_h3 import latlng_a_celdas, padres, celdas_a_str
+
+
+class TestLectorMobility(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        n = 4000
+        self.df = pd.DataFrame({
+            'device_id': [f"d{i}" for i in rng.integers(0, 40, n)],
+            'lat': -12.05 + rng.normal(0, 0.02, n),
+            'lon': -77.05 + rng.normal(0, 0.02, n),
+            'timestamp': np.arange(n, dtype=np.int64) * 60 + 1_700_000_000,
+        })
+        self.directorio = tempfile.TemporaryDirectory()
+        self.ruta = os.path.join(self.directorio.name, 'mobility.parquet')
+        write(self.ruta, self.df, row_group_offsets=1000)
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    def test_poda_por_rango_de_tiempo(self):
+        inicio, fin = 1_700_000_000 + 1000 * 60, 1_700_000_000 + 1500 * 60
+        lector = LectorMobility(self.ruta, rango_tiempo=(inicio, fin))
+        self.assertEqual(lector.row_groups_candidatos(), [1])
+        self.assertEqual(len(lector.leer()), 501)
+
+    def test_timestamps_con_zona_horaria(self):
+        df = self.df.copy()
+        df['timestamp'] = pd.to_datetime(df['timestamp'] * 10 ** 9, utc=True).dt.tz_convert('America/Lima')
+        ruta = os.path.join(self.directorio.name, 'mobility_tz.parquet')
+        write(ruta, df, row_group_offsets=1000)
+        inicio, fin = 1_700_000_000 + 1000 * 60, 1_700_000_000 + 1500 * 60
+        leido = LectorMobility(ruta, rango_tiempo=(inicio, fin)).leer()
+        # Los timestamps se compactan a epoch UTC, no a la hora local
+        np.testing.assert_array_equal(leido['timestamp'], self.df['timestamp'][1000:1501])
+
+    def test_filtro_bbox_y_tipos(self):
+        lector = LectorMobility(self.ruta, bbox=(-12.06, -77.06, -12.04, -77.04), columnas=['device_id', 'lat'])
+        df = lector.leer()
+        esperado = self.df['lat'].between(-12.06, -12.04) & self.df['lon'].between(-77.06, -77.04)
+        self.assertEqual(len(df), esperado.sum())
+        self.assertEqual(list(df.columns), ['device_id', 'lat'])
+        self.assertIsInstance(df['device_id'].dtype, pd.CategoricalDtype)
+
+    def test_filtro_hexagonos_por_celda_base(self):
+        # Un punto está en el hexágono si su celda en la resolución base desciende de él
+        celdas = padres(latlng_a_celdas(self.df['lat'].to_numpy(), self.df['lon'].to_numpy(), 10), 7)
+        hex_ids = celdas_a_str(np.unique(celdas)[:3])
+        df = LectorMobility(self.ruta, hex_ids=hex_ids, resolucion_base=10).leer()
+        self.assertEqual(len(df), np.isin(celdas_a_str(celdas), hex_ids).sum())
+
+    def test_muestreo_por_row_group(self):
+        df = LectorMobility(self.ruta).muestrear(1500, semilla=1)
+        self.assertEqual(len(df), 1500)
+
+    def test_cargar_mobility_desde_config(self):
+        config = {'data': {'mobility_file': self.ruta}, 'mobility_sample_size': 1500,
+                  'mobility_reader': {'columns': ['device_id', 'timestamp'], 'sample_seed': 3}}
+        df = cargar_mobility(config)
+        self.assertEqual(list(df.columns), ['device_id', 'timestamp'])
+        self.assertEqual(len(df), 1500)
+        pd.testing.assert_frame_equal(df, cargar_mobility(config))
+        self.assertEqual(len(cargar_mobility(config, muestra=False)), len(self.df))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from fastparquet import write
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from mobility_incremental import actualizar_features_mobility
+from procesar_mobility2 import procesar_mobility_completo
+
+
+class TestMobilityIncremental(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(21)
+        n = 6000
+        df = pd.DataFrame({
+            'device_id': [f"d{i}" for i in rng.integers(0, 60, n)],
+            'lat': -12.05 + rng.normal(0, 0.01, n),
+            'lon': -77.05 + rng.normal(0, 0.01, n),
+            'timestamp': np.sort(rng.integers(1_700_000_000, 1_700_000_000 + 3 * 86400, n)),
+        })
+        self.directorio = tempfile.TemporaryDirectory()
+        base = self.directorio.name
+        self.ruta_completa = os.path.join(base, 'mobility.parquet')
+        write(self.ruta_completa, df, row_group_offsets=2000)
+        dia = (df['timestamp'] - 1_700_000_000) // 86400
+        self.rutas_dias = []
+        for d in range(3):
+            ruta = os.path.join(base, f"mobility_dia{d}.parquet")
+            write(ruta, df[dia == d].reset_index(drop=True))
+            self.rutas_dias.append(ruta)
+        self.ruta_estado = os.path.join(base, 'estado')
+        self.ruta_salida = os.path.join(base, 'features_mobility.csv')
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    def test_dias_incrementales_igual_a_recalcular(self):
+        for d in range(3):
+            actualizar_features_mobility(self.rutas_dias[:d + 1], self.ruta_estado, self.ruta_salida)
+        esperado = procesar_mobility_completo(self.ruta_completa, 9, 8)
+        resultado = pd.read_csv(self.ruta_salida)
+        pd.testing.assert_frame_equal(resultado, esperado, rtol=1e-9, check_dtype=False)
+
+    def test_vecindad_igual_a_recalcular(self):
+        for d in range(3):
+            actualizar_features_mobility(self.rutas_dias[:d + 1], self.ruta_estado, self.ruta_salida, k_vecindad=1)
+        esperado = procesar_mobility_completo(self.ruta_completa, 9, 8, k_vecindad=1)
+        resultado = pd.read_csv(self.ruta_salida)
+        self.assertIn('mobility_density_k1_mean', resultado)
+        pd.testing.assert_frame_equal(resultado, esperado, rtol=1e-9, check_dtype=False)
+        # Cambiar solo el suavizado reescribe la tabla sin entradas nuevas
+        self.assertIsNotNone(actualizar_features_mobility(self.rutas_dias, self.ruta_estado, self.ruta_salida))
+        self.assertNotIn('mobility_density_k1_mean', pd.read_csv(self.ruta_salida))
+
+    def test_reejecucion_idempotente(self):
+        primera = actualizar_features_mobility(self.rutas_dias, self.ruta_estado, self.ruta_salida)
+        self.assertIsNotNone(primera)
+        self.assertIsNone(actualizar_features_mobility(self.rutas_dias, self.ruta_estado, self.ruta_salida))
+
+    def test_parametros_distintos_fallan(self):
+        actualizar_features_mobility(self.rutas_dias[:1], self.ruta_estado, self.ruta_salida)
+        with self.assertRaises(ValueError):
+            actualizar_features_mobility(self.rutas_dias, self.ruta_estado, self.ruta_salida, resolucion_reducida=7)
+
+
+if __name__ == '__main__':
+    unittest.main()
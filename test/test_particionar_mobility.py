@@ -0,0 +1,89 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from fastparquet import write
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from particionar_mobility import particionar_mobility, particiones_para_hexagonos, leer_particiones
+from procesar_mobility2 import procesar_mobility_completo, procesar_piramide_mobility, agregar_piramide_mobility
+from indexado_h3 import padres, str_a_celdas
+
+
+class TestParticionarMobility(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(9)
+        n = 6000
+        df = pd.DataFrame({
+            'device_id': [f"d{i}" for i in rng.integers(0, 80, n)],
+            'lat': -12.05 + rng.normal(0, 0.015, n),
+            'lon': -77.05 + rng.normal(0, 0.015, n),
+            'timestamp': np.sort(rng.integers(1_700_000_000, 1_700_500_000, n)),
+        })
+        self.directorio = tempfile.TemporaryDirectory()
+        self.ruta = os.path.join(self.directorio.name, 'mobility.parquet')
+        self.ruta_dataset = os.path.join(self.directorio.name, 'mobility_hex')
+        write(self.ruta, df, row_group_offsets=1500)
+        self.df = df
+        self.particiones = particionar_mobility(self.ruta, self.ruta_dataset, resolucion=9, resolucion_particion=6,
+                                                n_cubetas=3)
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    def test_particiones_ordenadas_con_celda(self):
+        self.assertGreater(len(self.particiones), 1)
+        self.assertEqual(sum(self.particiones.values()), 6000)
+        df = leer_particiones(self.ruta_dataset)
+        self.assertEqual(df['celda'].dtype, np.uint64)
+        for ruta in particiones_para_hexagonos(self.ruta_dataset):
+            particion = leer_particiones(self.ruta_dataset, hex_ids=[os.path.basename(os.path.dirname(ruta))[7:]])
+            orden = particion.sort_values(by=['device_id', 'timestamp'], kind='stable').index
+            self.assertTrue((orden == particion.index).all())
+
+    def test_features_iguales_al_archivo_original(self):
+        esperado = procesar_mobility_completo(self.ruta, 9, 8)
+        resultado = procesar_mobility_completo(self.ruta_dataset, 9, 8)
+        pd.testing.assert_frame_equal(resultado, esperado, rtol=1e-9)
+
+    def test_piramide_en_una_lectura(self):
+        piramide = procesar_piramide_mobility(self.ruta_dataset, [7, 8, 9])
+        self.assertEqual(sorted(piramide['resolution'].unique()), [7, 8, 9])
+        # Cada nivel subido por celdas padre coincide con procesar esa resolución por separado
+        for resolucion in (7, 8):
+            nivel = piramide[piramide['resolution'] == resolucion].drop(columns='resolution').reset_index(drop=True)
+            pd.testing.assert_frame_equal(nivel, procesar_mobility_completo(self.ruta, 9, resolucion), rtol=1e-9)
+        # Los niveles más finos tienen más hexágonos
+        hexagonos = piramide.groupby('resolution')['hex_id'].nunique()
+        self.assertTrue((hexagonos.diff().dropna() > 0).all())
+
+    def test_filtro_por_hexagonos_igual_a_sin_filtro(self):
+        completo = {r: a.a_dataframe() for r, a in agregar_piramide_mobility(self.ruta, [7, 8, 9]).items()}
+        hex_ids = list(completo[8].sort_values('visits', ascending=False)['hex_id'][:10])
+        filtro = str_a_celdas(hex_ids)
+        for ruta in (self.ruta_dataset, self.ruta):
+            filtrado = agregar_piramide_mobility(ruta, [7, 8, 9], filtros={'hex_ids': hex_ids})
+            for resolucion in (8, 9):
+                esperado = completo[resolucion]
+                esperado = esperado[np.isin(padres(str_a_celdas(esperado['hex_id']), 8), filtro)]
+                pd.testing.assert_frame_equal(filtrado[resolucion].a_dataframe(), esperado.reset_index(drop=True),
+                                              rtol=1e-9)
+        # En el archivo crudo los padres de los hexágonos pedidos también son exactos
+        esperado = completo[7][np.isin(str_a_celdas(completo[7]['hex_id']), padres(filtro, 7))]
+        pd.testing.assert_frame_equal(filtrado[7].a_dataframe(), esperado.reset_index(drop=True), rtol=1e-9)
+
+    def test_row_groups_solapados_fallan_en_paralelo(self):
+        # Filas desordenadas: cada row group abarca todo el rango de tiempo de cada dispositivo
+        ruta = os.path.join(self.directorio.name, 'desordenado.parquet')
+        write(ruta, self.df.sample(frac=1, random_state=0).reset_index(drop=True), row_group_offsets=1500)
+        with self.assertRaisesRegex(ValueError, 'solapados'):
+            agregar_piramide_mobility(ruta, [8, 9], n_procesos=2, bloques_por_reduccion=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cliente_http import ClienteHTTP
+from planificador_preciso import PlanificadorPreciso, RegistroJSONL, RelojFalso
+
+
+class _Puerta(BaseHTTPRequestHandler):
+    # Puerta simulada: registra el instante de llegada de cada hechizo
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, estado, cuerpo=b''):
+        self.send_response(estado)
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_HEAD(self):
+        self.server.conexiones.add(self.client_address[1])
+        self._responder(405)
+
+    def do_POST(self):
+        llegada = time.time()
+        self.server.conexiones.add(self.client_address[1])
+        palabra = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['spell_word']
+        self.server.llegadas.append((palabra, llegada))
+        self._responder(200, json.dumps({'response': f'{palabra} recibido'}).encode())
+
+
+class TestPlanificadorPreciso(unittest.TestCase):
+
+    def test_proximo_limite(self):
+        self.assertEqual(PlanificadorPreciso.proximo_limite(125.3), 180.0)
+        self.assertEqual(PlanificadorPreciso.proximo_limite(120.0), 180.0)
+        self.assertEqual(PlanificadorPreciso.proximo_limite(120.05, desfase=0.1), 120.1)
+        self.assertEqual(PlanificadorPreciso.proximo_limite(120.2, periodo=0.5), 120.5)
+
+    def test_reloj_falso_compensa_el_rtt(self):
+        reloj = RelojFalso(pared=1000.25)
+        llegadas = []
+
+        def solicitud(rtt):
+            # La solicitud llega al servidor a la mitad del RTT
+            reloj.avanzar(rtt / 2)
+            llegadas.append(reloj.pared())
+            reloj.avanzar(rtt / 2)
+            return 'ok'
+
+        planificador = PlanificadorPreciso(reloj=reloj, calentar=lambda: solicitud(0.08), anticipo_calentamiento=2)
+        resultado, detalle = planificador.ejecutar_en_proximo(lambda: solicitud(0.08), periodo=60)
+        self.assertEqual(resultado, 'ok')
+        self.assertEqual(detalle['objetivo'], 1020.0)
+        self.assertAlmostEqual(detalle['compensacion_ms'], 40, places=6)
+        self.assertAlmostEqual(llegadas[-1], 1020.0, delta=1e-3)
+        self.assertAlmostEqual(detalle['error_llegada_ms'], 0, delta=1)
+
+        # Objetivo a 0.5 s: ya no alcanza el calentamiento de 2 s, se apunta al minuto siguiente
+        reloj.avanzar(1079.5 - reloj.pared())
+        _, detalle = planificador.ejecutar_en_proximo(lambda: solicitud(0.08), periodo=60)
+        self.assertEqual(detalle['objetivo'], 1140.0)
+
+    def test_errores_no_cortan_el_calendario(self):
+        reloj = RelojFalso(pared=10.0)
+
+        def falla():
+            raise ConnectionError("sin red")
+
+        planificador = PlanificadorPreciso(reloj=reloj, calentar=falla)
+        resultado, detalle = planificador.ejecutar_en_proximo(falla, periodo=5)
+        self.assertIsNone(resultado)
+        self.assertIn('sin red', detalle['error'])
+        self.assertIsNone(planificador.rtt)
+
+    def test_puerta_simulada_con_reloj_real(self):
+        servidor = ThreadingHTTPServer(('127.0.0.1', 0), _Puerta)
+        servidor.llegadas, servidor.conexiones = [], set()
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        cliente = ClienteHTTP(base_url=f'http://127.0.0.1:{servidor.server_address[1]}/v1/', api_key='clave',
+                              http2=False)
+        try:
+            planificador = PlanificadorPreciso(calentar=lambda: cliente.solicitud('HEAD', 'door', idempotente=False),
+                                               anticipo_calentamiento=0.05)
+            detalles = []
+            for palabra in ['accio', 'lumos', 'nox']:
+                resultado, detalle = planificador.ejecutar_en_proximo(
+                    lambda: cliente.post('door', json={'spell_word': palabra}).status_code, periodo=0.2)
+                self.assertEqual(resultado, 200)
+                detalles.append(detalle)
+        finally:
+            cliente.cerrar()
+            servidor.shutdown()
+            servidor.server_close()
+
+        self.assertEqual([p for p, _ in servidor.llegadas], ['accio', 'lumos', 'nox'])
+        for (_, llegada), detalle in zip(servidor.llegadas, detalles):
+            self.assertLess(abs(llegada - detalle['objetivo']), 0.01)
+        # Calentamiento e intentos comparten una sola conexión keep-alive
+        self.assertEqual(len(servidor.conexiones), 1)
+
+
+class TestRegistroJSONL(unittest.TestCase):
+
+    def test_bufer_y_volcado(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'intentos.jsonl')
+            with RegistroJSONL(ruta, volcar_cada=3) as log:
+                log.escribir(palabra='accio', estado=400, mensaje='ñ')
+                log.escribir(palabra='lumos', estado=200, mensaje=None)
+                self.assertEqual(os.path.getsize(ruta), 0)
+                log.escribir(palabra='nox', estado=400, mensaje='x')
+                self.assertGreater(os.path.getsize(ruta), 0)
+                log.escribir(palabra='Revelio', estado=200, mensaje='fin')
+            with open(ruta, encoding='utf-8') as archivo:
+                registros = [json.loads(linea) for linea in archivo]
+        self.assertEqual([r['palabra'] for r in registros], ['accio', 'lumos', 'nox', 'Revelio'])
+        self.assertEqual(registros[0]['mensaje'], 'ñ')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import h3
+import numpy as np
+import pandas as pd
+import lightgbm as lgb
+from fastapi.testclient import TestClient
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from artefacto_modelo import ArtefactoModelo
+from servicio_costo_vida import (CacheLRU, ServicioCostoVida, TablaCaracteristicas, crear_app,
+                                 exportar_tabla_caracteristicas)
+
+
+class TestServicioCostoVida(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        hex_ids = list(h3.grid_disk(h3.latlng_to_cell(-0.18, -78.48, 8), 6))
+        self.df = pd.DataFrame({'hex_id': hex_ids, 'a': rng.normal(50, 10, len(hex_ids)),
+                                'b': rng.normal(size=len(hex_ids))})
+        self.df.loc[0, 'b'] = np.nan
+        y = 0.1 * self.df['a'] + self.df['b'].fillna(0)
+        X = self.df[['a', 'b']].copy()
+        scaler = StandardScaler()
+        X[['a']] = scaler.fit_transform(X[['a']])
+        modelo = lgb.LGBMRegressor(n_estimators=20, min_child_samples=5, verbosity=-1).fit(X, y)
+        self.artefacto = ArtefactoModelo.desde_entrenamiento(modelo, X, scaler, ['a'])
+
+        self.directorio = tempfile.TemporaryDirectory()
+        self.ruta_tabla = os.path.join(self.directorio.name, 'tabla.arrow')
+        ruta_csv = os.path.join(self.directorio.name, 'enriched.csv')
+        self.df.to_csv(ruta_csv, index=False)
+        exportar_tabla_caracteristicas([ruta_csv, ruta_csv], self.ruta_tabla, self.artefacto.columnas)
+        self.servicio = ServicioCostoVida(self.artefacto,
+                                          TablaCaracteristicas.cargar(self.ruta_tabla, self.artefacto.columnas))
+        self.esperado = dict(zip(self.df['hex_id'], self.artefacto.predict(self.df)))
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    def test_tabla_mapeada_sin_duplicados(self):
+        tabla = self.servicio.tabla
+        self.assertEqual(len(tabla), len(self.df))
+        self.assertEqual(tabla.resolucion, 8)
+        self.assertTrue(np.isnan(tabla.columnas['b'][0]))
+
+    def test_predicciones_iguales_al_artefacto(self):
+        celdas = [int(h, 16) for h in self.df['hex_id']]
+        np.testing.assert_allclose(self.servicio.predecir_celdas(celdas), self.artefacto.predict(self.df))
+        # Segunda vez desde la caché, con una celda desconocida
+        valores = self.servicio.predecir_celdas(celdas[:3] + [int(h3.latlng_to_cell(40.0, -3.7, 8), 16)])
+        np.testing.assert_allclose(valores[:3], self.artefacto.predict(self.df[:3]))
+        self.assertTrue(np.isnan(valores[3]))
+        self.assertEqual(self.servicio.cache.aciertos, 3)
+
+    def test_cache_lru(self):
+        cache = CacheLRU(2)
+        cache.guardar(1, 0.1)
+        cache.guardar(2, 0.2)
+        cache.obtener(1)
+        cache.guardar(3, 0.3)
+        self.assertIsNone(cache.obtener(2))
+        self.assertEqual((cache.obtener(1), cache.obtener(3)), (0.1, 0.3))
+
+    def test_endpoints(self):
+        hex_id = self.df['hex_id'][4]
+        with TestClient(crear_app(lambda: self.servicio, objetivo_p99_ms=1000)) as cliente:
+            respuesta = cliente.get('/cost-of-living', params={'hex_id': hex_id}).json()
+            self.assertAlmostEqual(respuesta['cost_of_living'], self.esperado[hex_id])
+            self.assertEqual(cliente.get('/cost-of-living', params={'hex_id': 'no-es-hex'}).status_code, 400)
+            desconocido = h3.latlng_to_cell(40.0, -3.7, 8)
+            self.assertEqual(cliente.get('/cost-of-living', params={'hex_id': desconocido}).status_code, 404)
+
+            lote = cliente.post('/cost-of-living', json={'hex_ids': list(self.df['hex_id'][:5]) + [desconocido]}).json()
+            self.assertEqual(lote['missing'], [desconocido])
+            for prediccion in lote['predictions']:
+                self.assertAlmostEqual(prediccion['cost_of_living'], self.esperado[prediccion['hex_id']])
+
+            lat, lon = h3.cell_to_latlng(hex_id)
+            respuesta = cliente.get('/cost-of-living/latlon', params={'lat': lat, 'lon': lon}).json()
+            self.assertEqual(respuesta['hex_id'], hex_id)
+
+            metricas = cliente.get('/metrics').json()
+            self.assertEqual(metricas['requests'], 5)
+            self.assertTrue(metricas['p99_within_target'])
+            self.assertEqual(metricas['hexes'], len(self.df))
+            self.assertEqual(metricas['batching']['items'], 3)
+
+    def test_tabla_vacia(self):
+        tabla = TablaCaracteristicas(np.empty(0, dtype=np.uint64), {c: np.empty(0) for c in self.artefacto.columnas})
+        self.assertIsNone(tabla.resolucion)
+        servicio = ServicioCostoVida(self.artefacto, tabla)
+        with TestClient(crear_app(lambda: servicio, max_lote=1)) as cliente:
+            respuesta = cliente.get('/cost-of-living/latlon', params={'lat': -0.18, 'lon': -78.48})
+            self.assertEqual(respuesta.status_code, 503)
+            hex_id = self.df['hex_id'][4]
+            self.assertEqual(cliente.get('/cost-of-living', params={'hex_id': hex_id}).status_code, 404)
+
+    def test_endpoints_sin_micro_lotes(self):
+        hex_id = self.df['hex_id'][4]
+        with TestClient(crear_app(lambda: self.servicio, max_lote=1)) as cliente:
+            respuesta = cliente.get('/cost-of-living', params={'hex_id': hex_id}).json()
+            self.assertAlmostEqual(respuesta['cost_of_living'], self.esperado[hex_id])
+            self.assertIsNone(cliente.get('/metrics').json()['batching'])
+
+
+if __name__ == '__main__':
+    unittest.main()
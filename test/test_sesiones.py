@@ -0,0 +1,111 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from sesiones import IntervalosPermanencia, es_nocturno, orden_por_dispositivo
+from agregacion_hex import AlmacenAgregados
+from indexado_h3 import padres
+
+A, B = np.uint64(0x8866d14d05fffff), np.uint64(0x8866d14d29fffff)
+
+
+class TestIntervalosPermanencia(unittest.TestCase):
+
+    def test_intervalos_de_una_trayectoria(self):
+        # Dispositivo 0: A, A, B, A; dispositivo 1: B, B
+        dispositivos = np.array([0, 0, 0, 0, 1, 1])
+        celdas = np.array([A, A, B, A, B, B], dtype=np.uint64)
+        tiempos = np.array([0, 10, 20, 50, 5, 35], dtype=np.float64)
+        intervalos = IntervalosPermanencia.desde_puntos(dispositivos, celdas, tiempos)
+
+        df = intervalos.a_dataframe(np.array(['d0', 'd1']))
+        self.assertEqual(list(df['device']), ['d0', 'd0', 'd0', 'd1'])
+        self.assertEqual(list(df['enter_ts']), [0, 20, 50, 5])
+        self.assertEqual(list(df['exit_ts']), [10, 20, 50, 35])
+        self.assertEqual(list(df['n_points']), [2, 1, 1, 2])
+
+        resumen = intervalos.por_celda(np.array([A, B], dtype=np.uint64))
+        np.testing.assert_array_equal(resumen['n_visitas'], [2, 2])
+        np.testing.assert_array_equal(resumen['puntos'], [3, 3])
+        np.testing.assert_allclose(resumen['media_permanencia'], [10, 30])
+
+    def test_desordenado_igual_a_ordenado(self):
+        rng = np.random.default_rng(5)
+        n = 1000
+        dispositivos = rng.integers(0, 20, n)
+        celdas = rng.choice(np.array([A, B], dtype=np.uint64), n)
+        tiempos = rng.permutation(n).astype(np.float64)
+        self.assertIsNotNone(orden_por_dispositivo(dispositivos, tiempos))
+        orden = np.lexsort((tiempos, dispositivos))
+        self.assertIsNone(orden_por_dispositivo(dispositivos[orden], tiempos[orden]))
+
+        desordenado = IntervalosPermanencia.desde_puntos(dispositivos, celdas, tiempos)
+        ordenado = IntervalosPermanencia.desde_puntos(dispositivos[orden], celdas[orden], tiempos[orden])
+        for columna in IntervalosPermanencia.COLUMNAS:
+            np.testing.assert_array_equal(getattr(desordenado, columna), getattr(ordenado, columna))
+
+    def test_punto_anterior_enlazado(self):
+        # Segunda mitad de una estadía cuyo inicio quedó en otro bloque
+        intervalos = IntervalosPermanencia.desde_puntos(
+            np.array([0, 0, 0]), np.array([A, A, B], dtype=np.uint64), np.array([100, 110, 130], dtype=np.float64),
+            celdas_anteriores=np.array([A, A, A], dtype=np.uint64),
+            tiempos_anteriores=np.array([90, 100, 110], dtype=np.float64))
+        np.testing.assert_array_equal(intervalos.continua, [True, False])
+        np.testing.assert_array_equal(intervalos.n_pasos, [2, 0])
+
+    def test_reducir_igual_a_sesionizar_padres(self):
+        rng = np.random.default_rng(8)
+        n = 2000
+        hijos = np.array([0x8966d14d053ffff, 0x8966d14d057ffff, 0x8966d14d29bffff], dtype=np.uint64)
+        dispositivos = np.sort(rng.integers(0, 15, n))
+        celdas = rng.choice(hijos, n)
+        tiempos = rng.integers(0, 10 ** 6, n).astype(np.float64)
+        fino = IntervalosPermanencia.desde_puntos(dispositivos, celdas, tiempos)
+        reducido = fino.reducir(8)
+        directo = IntervalosPermanencia.desde_puntos(dispositivos, padres(celdas, 8), tiempos)
+        for columna in ('dispositivo', 'celda', 'entrada', 'salida', 'n_puntos', 'n_pasos', 'continua'):
+            np.testing.assert_array_equal(getattr(reducido, columna), getattr(directo, columna))
+        np.testing.assert_allclose(reducido.media_paso, directo.media_paso)
+        np.testing.assert_allclose(reducido.m2_paso, directo.m2_paso, rtol=1e-9)
+
+    def test_es_nocturno(self):
+        # 03:00 UTC son las 22:00 en Ecuador; 12:00 UTC son las 07:00
+        np.testing.assert_array_equal(es_nocturno(np.array([3 * 3600, 12 * 3600])), [True, False])
+
+
+class TestFeaturesDesdeIntervalos(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        n = 3000
+        self.celdas = rng.choice(np.array([A, B, np.uint64(0x888f2b983dfffff)], dtype=np.uint64), n, p=[0.6, 0.3, 0.1])
+        self.dispositivos = np.array([f"d{i}" for i in rng.integers(0, 40, n)], dtype=object)
+        self.tiempos = np.sort(rng.integers(0, 30 * 86400, n))
+
+    def test_visitas_igual_a_pandas(self):
+        df = pd.DataFrame({'hex_id': self.celdas, 'device_id': self.dispositivos, 'timestamp': self.tiempos})
+        df = df.sort_values(by=['device_id', 'timestamp'], kind='stable')
+        df['entra'] = df['hex_id'] != df.groupby('device_id')['hex_id'].shift()
+        esperado = df[df['entra']].groupby('hex_id').size().to_numpy()
+
+        features = AlmacenAgregados.desde_bloque(self.celdas, self.dispositivos, self.tiempos).a_dataframe()
+        np.testing.assert_array_equal(features['visits'], esperado)
+        self.assertTrue(features['night_share'].between(0, 1).all())
+        self.assertTrue((features['return_frequency'] >= 0).all())
+
+    def test_visitas_entre_bloques(self):
+        esperado = AlmacenAgregados.desde_bloque(self.celdas, self.dispositivos, self.tiempos).a_dataframe()
+        partes = [AlmacenAgregados.desde_bloque(self.celdas[i:i + 250], self.dispositivos[i:i + 250],
+                                                self.tiempos[i:i + 250]) for i in range(0, len(self.celdas), 250)]
+        resultado = AlmacenAgregados.combinar_todos(partes[::-1]).a_dataframe()
+        for columna in ('visits', 'night_share', 'return_frequency'):
+            pd.testing.assert_series_equal(resultado[columna], esperado[columna])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+import h3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from validacion_cruzada import pliegues_espaciales, particiones_pliegues, predicciones_fuera_de_pliegue
+
+
+class TestValidacionCruzada(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(12)
+        self.hex_ids = sorted(h3.grid_disk(h3.latlng_to_cell(-2.17, -79.9, 8), 9))
+        n = len(self.hex_ids)
+        self.X = pd.DataFrame(rng.normal(size=(n, 3)), columns=['a', 'b', 'c'])
+        self.y = pd.Series(self.X['a'] * 2 + rng.normal(0, 0.1, n))
+
+    def test_pliegues_agrupados_por_padre(self):
+        pliegues = pliegues_espaciales(self.hex_ids, n_pliegues=4, resolucion_grupo=6)
+        padres = np.array([h3.cell_to_parent(h, 6) for h in self.hex_ids])
+        for padre in np.unique(padres):
+            self.assertEqual(len(np.unique(pliegues[padres == padre])), 1)
+        self.assertEqual(sorted(np.unique(pliegues)), [0, 1, 2, 3])
+        with self.assertRaises(ValueError):
+            pliegues_espaciales(self.hex_ids, n_pliegues=50, resolucion_grupo=6)
+
+    def test_predicciones_fuera_de_pliegue(self):
+        pliegues = pliegues_espaciales(self.hex_ids, n_pliegues=3, resolucion_grupo=7)
+        particiones = particiones_pliegues(self.X, self.y, pliegues)
+        self.assertEqual(sum(len(p[2]) for p in particiones), len(self.X))
+
+        with tempfile.TemporaryDirectory() as directorio:
+            oof, rmse_pliegues = predicciones_fuera_de_pliegue(
+                self.X, self.y, pliegues, {'num_leaves': 7, 'min_child_samples': 5}, 60, n_procesos=2,
+                directorio_cache=directorio)
+            # Una caché binaria (entrenamiento y validación) por pliegue
+            self.assertEqual(len(os.listdir(directorio)), 2 * 3)
+        self.assertEqual(len(oof), len(self.X))
+        self.assertEqual(len(rmse_pliegues), 3)
+        rmse_total = np.sqrt(np.mean((self.y.to_numpy() - oof) ** 2))
+        self.assertLess(rmse_total, 1.0)
+        self.assertLessEqual(min(rmse_pliegues), rmse_total)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+import h3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from vecindad_h3 import IndiceAdyacencia, suavizar_features, es_columna_vecindad
+from indexado_h3 import str_a_celdas
+
+
+class TestVecindadH3(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(4)
+        centro = h3.latlng_to_cell(-2.17, -79.9, 8)
+        disco = sorted(h3.grid_disk(centro, 3))
+        # Hexágonos observados: una parte del disco, en orden arbitrario
+        self.hex_ids = list(rng.permutation(disco)[:25])
+        self.df = pd.DataFrame({'hex_id': self.hex_ids, 'visits': rng.integers(1, 50, 25).astype(float),
+                                'night_share': rng.random(25)})
+        self.df.loc[3, 'visits'] = np.nan
+
+    def test_igual_a_fuerza_bruta(self):
+        resultado = suavizar_features(self.df, k=2)
+        for i, hex_id in enumerate(self.hex_ids):
+            distancias = np.array([h3.grid_distance(hex_id, otro) for otro in self.hex_ids])
+            for radio in (1, 2):
+                vecinos = (distancias >= 1) & (distancias <= radio) & self.df['visits'].notna().to_numpy()
+                pesos = 1.0 / distancias[vecinos]
+                valores = self.df['visits'].to_numpy()[vecinos]
+                if not vecinos.any():
+                    self.assertTrue(np.isnan(resultado.loc[i, f'visits_k{radio}_mean']))
+                    continue
+                self.assertAlmostEqual(resultado.loc[i, f'visits_k{radio}_sum'], np.sum(pesos * valores))
+                self.assertAlmostEqual(resultado.loc[i, f'visits_k{radio}_mean'], np.sum(pesos * valores) / pesos.sum())
+                self.assertEqual(resultado.loc[i, f'visits_k{radio}_max'], valores.max())
+
+    def test_indice_reutilizable(self):
+        indice = IndiceAdyacencia.construir(np.sort(str_a_celdas(self.hex_ids)), k=2)
+        pd.testing.assert_frame_equal(suavizar_features(self.df, k=2, indice=indice), suavizar_features(self.df, k=2))
+        with self.assertRaises(ValueError):
+            suavizar_features(self.df.iloc[1:], k=2, indice=indice)
+
+    def test_columnas_vecindad(self):
+        nuevas = [c for c in suavizar_features(self.df, k=1).columns if es_columna_vecindad(c)]
+        self.assertEqual(len(nuevas), 2 * 3)
+        self.assertFalse(es_columna_vecindad('avg_visits_per_device'))
+
+
+if __name__ == '__main__':
+    unittest.main()